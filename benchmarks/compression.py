@@ -0,0 +1,78 @@
+"""Mede bytes trafegados e latência com e sem compressão das respostas da API.
+
+Uso: python benchmarks/compression.py --database /tmp/bench.db [--requests 300]
+
+Sobe o app num servidor WSGI local e consulta os endpoints de template e
+de listagem de contratos com Accept-Encoding: gzip, alternando
+COMPRESS_ENABLED. A latência inclui a descompressão no cliente.
+"""
+import argparse
+import gzip
+import http.client
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.endpoints import percentile
+from benchmarks.stubs import ServerThread
+
+
+def fetch(conn, path):
+    start = time.perf_counter()
+    conn.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+    response = conn.getresponse()
+    body = response.read()
+    wire_bytes = len(body)
+    if response.getheader('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    return time.perf_counter() - start, wire_bytes, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='contratosmart-bench-')
+    database = os.path.join(tmpdir, 'bench.db')
+    shutil.copyfile(args.database, database)
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    os.environ.setdefault('SESSION_BACKEND', 'memory')
+
+    from src.main import app
+
+    conn = sqlite3.connect(database)
+    template_id = conn.execute('SELECT id FROM contract_templates LIMIT 1').fetchone()[0]
+    # Usuário com a maior quantidade de contratos: o pior caso da listagem
+    user_id = conn.execute('SELECT user_id FROM contracts GROUP BY user_id '
+                           'ORDER BY count(*) DESC LIMIT 1').fetchone()[0]
+    conn.close()
+    paths = {'template': f'/api/templates/{template_id}', 'list_contracts': f'/api/contracts?user_id={user_id}'}
+
+    try:
+        with ServerThread(app) as server:
+            client = http.client.HTTPConnection(server.server.host, server.server.port)
+            print(f"{'endpoint':<16} {'compressão':<10} {'bytes fio':>10} {'bytes JSON':>10} "
+                  f"{'p50 ms':>8} {'p95 ms':>8}")
+            for name, path in paths.items():
+                for enabled in (False, True):
+                    app.config['COMPRESS_ENABLED'] = enabled
+                    for _ in range(10):
+                        fetch(client, path)
+                    samples = [fetch(client, path) for _ in range(args.requests)]
+                    latencies = sorted(s[0] for s in samples)
+                    print(f"{name:<16} {'on' if enabled else 'off':<10} {samples[0][1]:>10} {samples[0][2]:>10} "
+                          f"{percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 95) * 1000:>8.2f}")
+            client.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""Benchmark dos endpoints da API contra uma base sintética.
+
+Uso:
+    DATABASE_URL=sqlite:////tmp/bench.db flask --app src.main seed synthetic --users 100000
+    python benchmarks/endpoints.py --database /tmp/bench.db --output results.json
+    python benchmarks/endpoints.py --database /tmp/bench.db --baseline benchmarks/baseline.json
+
+Cada cenário é executado pelo test client do Flask (sem rede) e por um
+servidor WSGI local multithread. As rotas do Gov.br usam um stub local.
+São registrados p50/p95/p99, vazão e erros por cenário e o pico de RSS
+do processo na execução inteira (ru_maxrss só cresce, então não separa
+cenários). Com --baseline o resultado é comparado e o processo sai com
+código 1 se p95 ou vazão piorarem acima de --threshold ou se a taxa de
+erros aumentar.
+
+O app local roda sem limitador de taxa e com sessões e cache em memória
+ou em arquivos temporários; um 429 num cenário medido interrompe o
+benchmark, porque as latências seriam as das recusas.
+
+Para medir um servidor de produção, suba-o com a mesma base e o stub:
+    DATABASE_URL=sqlite:////tmp/bench.db RATE_LIMIT_ENABLED=0 GOVBR_TOKEN_URL=http://127.0.0.1:5055/token ... \
+        gunicorn -c gunicorn.conf.py src.wsgi:app
+    python benchmarks/endpoints.py --database /tmp/bench.db --url http://127.0.0.1:5000 --stub-port 5055
+O pico de RSS, nesse caso, é o do processo de benchmark, não o do servidor.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.stubs import ServerThread, create_govbr_stub, patch_govbr_urls
+
+
+class Dataset:
+    """Ids de amostra lidos da base de benchmark"""
+
+    def __init__(self, path, seed):
+        conn = sqlite3.connect(path)
+        self.type_ids = [r[0] for r in conn.execute(
+            'SELECT DISTINCT contract_type_id FROM contract_templates')]
+        self.template_ids = [r[0] for r in conn.execute('SELECT id FROM contract_templates')]
+        self.contract_ids = [r[0] for r in conn.execute(
+            'SELECT id FROM contracts ORDER BY random() LIMIT 5000')]
+        self.generated = conn.execute(
+            "SELECT id, user_id, hash_documento FROM contracts WHERE status = 'gerado' "
+            'ORDER BY random() LIMIT 5000').fetchall()
+        self.user_ids = [r[0] for r in conn.execute(
+            'SELECT DISTINCT user_id FROM contracts ORDER BY random() LIMIT 5000')]
+        row = conn.execute('SELECT user_id, contract_type_id, template_id, dados_contrato '
+                           'FROM contracts LIMIT 1').fetchone()
+        conn.close()
+        if not row:
+            raise SystemExit('A base não tem contratos; gere-a com "flask seed synthetic"')
+        self.sample_contract = {
+            'user_id': row[0],
+            'contract_type_id': row[1],
+            'template_id': row[2],
+            'titulo': 'Contrato de benchmark',
+            'dados_contrato': json.loads(row[3]),
+        }
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def choice(self, items):
+        with self.lock:
+            return self.rng.choice(items)
+
+
+class ClientDriver:
+    """Executa requisições pelo test client do Flask"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+        self.logged_in = False
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        return response.status_code, response.get_data()
+
+
+class ServerDriver:
+    """Executa requisições HTTP reais contra um servidor"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.logged_in = False
+
+    def request(self, method, path, body=None):
+        response = self.session.request(method, self.base_url + path, json=body)
+        return response.status_code, response.content
+
+
+def govbr_login(driver):
+    status, body = driver.request('GET', '/api/govbr/auth')
+    state = parse_qs(urlparse(json.loads(body)['auth_url']).query)['state'][0]
+    driver.request('GET', f'/api/govbr/callback?code=bench&state={state}')
+    driver.logged_in = True
+
+
+def ensure_login(driver):
+    if not driver.logged_in:
+        govbr_login(driver)
+
+
+def prepare_callback(driver, data):
+    status, body = driver.request('GET', '/api/govbr/auth')
+    state = parse_qs(urlparse(json.loads(body)['auth_url']).query)['state'][0]
+    return 'GET', f'/api/govbr/callback?code=bench&state={state}', None
+
+
+def prepare_sign(driver, data):
+    ensure_login(driver)
+    contract_id, user_id, hash_documento = data.choice(data.generated)
+    return 'POST', '/api/govbr/sign', {
+        'contract_id': contract_id,
+        'user_id': user_id,
+        'hash_documento': hash_documento,
+        'certificate_id': 'cert-stub-1'
+    }
+
+
+def prepare_create(driver, data):
+    body = dict(data.sample_contract)
+    body['partes'] = [
+        dict(body['dados_contrato']['contratante'], tipo_parte='contratante'),
+        dict(body['dados_contrato']['contratado'], tipo_parte='contratado'),
+    ]
+    return 'POST', '/api/contracts', body
+
+
+def authenticated(method, path):
+    def prepare(driver, data):
+        ensure_login(driver)
+        return method, path, None
+    return prepare
+
+
+# Nome do cenário -> função que devolve (método, caminho, corpo JSON)
+SCENARIOS = {
+    'contract_types': lambda d, data: ('GET', '/api/contract-types', None),
+    'templates_by_type': lambda d, data: (
+        'GET', f'/api/contract-types/{data.choice(data.type_ids)}/templates', None),
+    'template': lambda d, data: ('GET', f'/api/templates/{data.choice(data.template_ids)}', None),
+    'create_contract': prepare_create,
+    'generate_contract': lambda d, data: (
+        'POST', f'/api/contracts/{data.choice(data.contract_ids)}/generate', None),
+    'list_contracts': lambda d, data: ('GET', f'/api/contracts?user_id={data.choice(data.user_ids)}', None),
+    'contract_detail': lambda d, data: ('GET', f'/api/contracts/{data.choice(data.contract_ids)}', None),
+    'govbr_auth': lambda d, data: ('GET', '/api/govbr/auth', None),
+    'govbr_callback': prepare_callback,
+    'govbr_userinfo': authenticated('GET', '/api/govbr/userinfo'),
+    'govbr_certificates': authenticated('GET', '/api/govbr/certificates'),
+    'govbr_sign': prepare_sign,
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_bytes():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def run_worker(driver, data, prepare, iterations):
+    latencies = []
+    errors = 0
+    throttled = 0
+    response_bytes = 0
+    for _ in range(iterations):
+        method, path, body = prepare(driver, data)
+        start = time.perf_counter()
+        status, content = driver.request(method, path, body)
+        latencies.append(time.perf_counter() - start)
+        response_bytes += len(content)
+        if status >= 400:
+            errors += 1
+        if status == 429:
+            throttled += 1
+    return latencies, errors, response_bytes, throttled
+
+
+def run_scenario(make_driver, data, prepare, iterations, concurrency, warmup):
+    drivers = [make_driver() for _ in range(concurrency)]
+    for driver in drivers:
+        run_worker(driver, data, prepare, warmup)
+
+    per_worker = max(1, iterations // concurrency)
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [run_worker(drivers[0], data, prepare, per_worker)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda d: run_worker(d, data, prepare, per_worker), drivers))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(lat for worker in results for lat in worker[0])
+    return {
+        'requests': len(latencies),
+        'errors': sum(worker[1] for worker in results),
+        'throttled': sum(worker[3] for worker in results),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'throughput_rps': len(latencies) / elapsed,
+        'response_bytes_avg': sum(worker[2] for worker in results) / len(latencies),
+    }
+
+
+def error_rate(result):
+    return result['errors'] / result['requests'] if result['requests'] else 0.0
+
+
+def compare(results, baseline, threshold):
+    """Lista os cenários cujo p95 ou vazão pioraram além do limite ou cuja taxa de erros aumentou"""
+    regressions = []
+    for mode, scenarios in results['results'].items():
+        for name, current in scenarios.items():
+            previous = baseline.get('results', {}).get(mode, {}).get(name)
+            if not previous:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+                regressions.append(f"{mode}/{name}: p95 {previous['p95_ms']:.2f}ms -> {current['p95_ms']:.2f}ms")
+            if current['throughput_rps'] < previous['throughput_rps'] * (1 - threshold):
+                regressions.append(f"{mode}/{name}: vazão {previous['throughput_rps']:.0f} -> "
+                                   f"{current['throughput_rps']:.0f} req/s")
+            # Uma rota que passa a falhar rápido melhora p95 e vazão: os erros contam à parte
+            if error_rate(current) > error_rate(previous):
+                regressions.append(f"{mode}/{name}: erros {previous['errors']}/{previous['requests']} -> "
+                                   f"{current['errors']}/{current['requests']}")
+    return regressions
+
+
+def print_table(mode, scenarios):
+    print(f'\n[{mode}]')
+    print(f"{'cenário':<20} {'req':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'req/s':>9}")
+    for name, r in scenarios.items():
+        print(f"{name:<20} {r['requests']:>6} {r['errors']:>5} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['throughput_rps']:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', required=True, help='Base SQLite gerada por "flask seed synthetic"')
+    parser.add_argument('--in-place', action='store_true',
+                        help='Usa a base diretamente em vez de uma cópia temporária')
+    parser.add_argument('--mode', choices=['client', 'server', 'both'], default='both')
+    parser.add_argument('--url', help='Mede um servidor já em execução (ex.: gunicorn) em vez do app local; '
+                                      'a base usada pelo servidor deve ser a mesma de --database')
+    parser.add_argument('--stub-port', type=int, default=0,
+                        help='Porta fixa do stub do Gov.br, para apontar um servidor externo via GOVBR_*_URL')
+    parser.add_argument('--requests', type=int, default=500, help='Requisições por cenário')
+    parser.add_argument('--warmup', type=int, default=20, help='Requisições de aquecimento por worker')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes simultâneos no modo server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Cenários separados por vírgula')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Arquivo JSON para gravar os resultados')
+    parser.add_argument('--baseline', help='Resultados anteriores para comparação')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Piora tolerada (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='contratosmart-bench-')
+    database = args.database
+    if not args.in_place and not args.url:
+        database = os.path.join(tmpdir, 'bench.db')
+        shutil.copyfile(args.database, database)
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(database)}'
+    os.environ.setdefault('SESSION_BACKEND', 'memory')
+    # Nada de estado de produção: sem limitador e com os arquivos auxiliares no diretório temporário
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+    os.environ['DETAIL_CACHE_BACKEND'] = 'memory'
+    os.environ['DETAIL_CACHE_SQLITE_PATH'] = os.path.join(tmpdir, 'detailcache.db')
+    os.environ['SESSION_SQLITE_PATH'] = os.path.join(tmpdir, 'sessions.db')
+    os.environ['RATE_LIMIT_SQLITE_PATH'] = os.path.join(tmpdir, 'ratelimit.db')
+
+    if args.url:
+        app = None
+        args.mode = 'server'
+    else:
+        from src.main import app
+
+    data = Dataset(database, args.seed)
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': os.path.abspath(args.database),
+            'target': args.url or 'in-process',
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'results': {}
+    }
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    modes = ['client', 'server'] if args.mode == 'both' else [args.mode]
+
+    try:
+        with ServerThread(create_govbr_stub(), port=args.stub_port) as stub:
+            if app is not None:
+                patch_govbr_urls(stub.url)
+            else:
+                print(f'Stub do Gov.br em {stub.url}')
+            for mode in modes:
+                if mode == 'client':
+                    server = None
+                    make_driver, concurrency = (lambda: ClientDriver(app)), 1
+                elif args.url:
+                    server = None
+                    make_driver, concurrency = (lambda: ServerDriver(args.url)), args.concurrency
+                else:
+                    server = ServerThread(app).__enter__()
+                    make_driver, concurrency = (lambda: ServerDriver(server.url)), args.concurrency
+                try:
+                    results['results'][mode] = {}
+                    for name in scenarios:
+                        result = run_scenario(make_driver, data, SCENARIOS[name], args.requests,
+                                              concurrency, args.warmup)
+                        if result['throttled']:
+                            raise SystemExit(f"{mode}/{name}: {result['throttled']} respostas 429; "
+                                             'desligue o limitador (RATE_LIMIT_ENABLED=0) no servidor medido')
+                        results['results'][mode][name] = result
+                finally:
+                    if server:
+                        server.__exit__(None, None, None)
+                print_table(mode, results['results'][mode])
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    results['meta']['peak_rss_bytes'] = peak_rss_bytes()
+    print(f"\nPico de RSS do processo: {results['meta']['peak_rss_bytes'] / 2**20:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('\nRegressões acima do limite:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('\nSem regressões em relação ao baseline')
+
+
+if __name__ == '__main__':
+    main()
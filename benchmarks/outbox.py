@@ -0,0 +1,86 @@
+"""Mede vazão e atraso fim a fim da entrega de eventos do outbox.
+
+Uso: python benchmarks/outbox.py --database /tmp/bench.db [--events 2000] [--commit-size 20] [--rate 200]
+
+Sobe um receptor de webhooks local, aponta OUTBOX_WEBHOOKS para ele e muda
+contratos em rascunho para "gerado" em transações de --commit-size
+contratos. O atraso vai de ocorrido_em (gravado no commit) até a chegada
+do evento no receptor.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.endpoints import percentile
+from benchmarks.stubs import ServerThread, create_webhook_sink
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--commit-size', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.2, help='OUTBOX_INTERVAL em segundos')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=0, help='Eventos por segundo gravados (0 = sem limite)')
+    parser.add_argument('--sink-delay', type=float, default=0.0, help='Latência simulada do parceiro')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='contratosmart-bench-')
+    database = os.path.join(tmpdir, 'bench.db')
+    shutil.copyfile(args.database, database)
+
+    sink = create_webhook_sink(delay=args.sink_delay)
+    try:
+        with ServerThread(sink) as sink_server:
+            os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+            os.environ.setdefault('SESSION_BACKEND', 'memory')
+            os.environ['OUTBOX_WEBHOOKS'] = f'{sink_server.url}/webhook'
+            os.environ['OUTBOX_INTERVAL'] = str(args.interval)
+
+            from src.main import app
+            from src.models.user import db, Contract
+
+            app.extensions['outbox'].batch_size = args.batch_size
+            app.extensions['outbox'].concurrency = args.concurrency
+
+            with app.app_context():
+                ids = [row.id for row in db.session.execute(
+                    db.select(Contract.id).where(Contract.status == 'rascunho').limit(args.events)
+                )]
+                start = time.time()
+                for i in range(0, len(ids), args.commit_size):
+                    for contract in Contract.query.filter(Contract.id.in_(ids[i:i + args.commit_size])):
+                        contract.status = 'gerado'
+                    db.session.commit()
+                    if args.rate:
+                        time.sleep(max(0.0, start + (i + args.commit_size) / args.rate - time.time()))
+                written = time.time() - start
+
+            deadline = time.time() + 120
+            while len(sink.received) < len(ids) and time.time() < deadline:
+                time.sleep(0.05)
+            elapsed = max(t for t, _ in sink.received) - start
+
+            lags = sorted(
+                received_at - datetime.fromisoformat(evento['ocorrido_em']).replace(tzinfo=timezone.utc).timestamp()
+                for received_at, evento in sink.received
+            )
+            print(f'eventos: {len(sink.received)}/{len(ids)} em {sink.requests} requisições')
+            print(f'gravação: {written:.2f} s; entrega completa: {elapsed:.2f} s '
+                  f'({len(sink.received) / elapsed:.0f} eventos/s)')
+            print(f'atraso p50 {percentile(lags, 50) * 1000:.0f} ms, p95 {percentile(lags, 95) * 1000:.0f} ms, '
+                  f'máx {lags[-1] * 1000:.0f} ms')
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Compara o custo de sessão em cookie assinado e no servidor.
+
+Uso: python benchmarks/session_cookie.py [--requests 2000]
+
+Simula uma sessão autenticada no Gov.br (tokens e userinfo) e mede, para
+cada backend, o tamanho do cookie enviado a cada requisição e o tempo de
+abrir/salvar a sessão.
+"""
+import argparse
+import os
+import secrets
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session
+
+from src.services.sessions import init_sessions
+
+
+def fake_jwt(size):
+    # Conteúdo aleatório: tokens reais praticamente não comprimem
+    return 'eyJhbGciOiJSUzI1NiJ9.' + secrets.token_urlsafe(size)[:size] + '.' + secrets.token_urlsafe(256)
+
+
+def make_app(backend, tmpdir):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.config['SESSION_BACKEND'] = backend
+    app.config['SESSION_SQLITE_PATH'] = os.path.join(tmpdir, f'{backend}.db')
+    app.config['SESSION_SWEEP_INTERVAL'] = 0
+    init_sessions(app)
+
+    @app.route('/login')
+    def login():
+        session['govbr_access_token'] = fake_jwt(1200)
+        session['govbr_id_token'] = fake_jwt(900)
+        session['govbr_userinfo'] = {
+            'sub': '12345678909',
+            'name': 'Maria da Silva Santos',
+            'email': 'maria@example.com',
+            'email_verified': True,
+            'phone_number': '+5561999999999',
+            'picture': 'https://sso.staging.acesso.gov.br/userinfo/picture',
+            'profile': 'https://servicos.staging.acesso.gov.br/',
+        }
+        return 'ok'
+
+    @app.route('/api')
+    def api():
+        return 'ok' if 'govbr_access_token' in session else 'anon'
+
+    return app
+
+
+def run(backend, requests_count, tmpdir):
+    app = make_app(backend, tmpdir)
+    client = app.test_client()
+    client.get('/login')
+    cookie = client.get_cookie('session')
+    cookie_bytes = len(f'session={cookie.value}')
+
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        client.get('/api')
+    elapsed = time.perf_counter() - start
+    return cookie_bytes, elapsed / requests_count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        print(f"{'backend':<8} {'cookie (bytes)':>15} {'us/request':>12}")
+        for backend in ('cookie', 'memory', 'sqlite'):
+            cookie_bytes, per_request = run(backend, args.requests, tmpdir)
+            print(f'{backend:<8} {cookie_bytes:>15} {per_request:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compara a leitura de system_settings pelo cache em memória e direto do banco.
+
+Uso: python benchmarks/settings.py [--settings 50] [--reads 200000]
+
+Cria um banco temporário com configurações dos quatro tipos e mede o custo
+por leitura de SettingsCache.get, de uma query + get_valor por leitura e o
+tempo de recarga completa do cache.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from src.models.user import db, SystemSetting
+from src.services.settings import init_settings, settings
+
+TIPOS = (('string', 'valor'), ('number', '42'), ('boolean', 'true'), ('json', '{"limite": 10, "ativo": true}'))
+
+
+def per_call(func, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--settings', type=int, default=50)
+    parser.add_argument('--reads', type=int, default=200000)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='contratosmart-bench-')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, 'settings.db')}"
+    app.config['SETTINGS_REFRESH_INTERVAL'] = 0
+    db.init_app(app)
+
+    try:
+        with app.app_context():
+            db.create_all()
+            for i in range(args.settings):
+                tipo, valor = TIPOS[i % len(TIPOS)]
+                db.session.add(SystemSetting(chave=f'config_{i}', valor=valor, tipo=tipo))
+            db.session.commit()
+            init_settings(app)
+
+            chave = f'config_{args.settings - 1}'
+            settings.get(chave)
+            cached = per_call(lambda: settings.get(chave), args.reads)
+            db_reads = max(args.reads // 100, 100)
+            query = per_call(lambda: SystemSetting.query.filter_by(chave=chave).first().get_valor(), db_reads)
+            reload = per_call(settings.reload, 200)
+            check = per_call(settings.check_version, 200)
+
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"{'operação':<28} {'por chamada':>14}")
+    print(f"{'cache get':<28} {cached * 1e9:>11.0f} ns")
+    print(f"{'query + get_valor':<28} {query * 1e6:>11.1f} µs")
+    print(f"{'recarga completa':<28} {reload * 1e6:>11.1f} µs")
+    print(f"{'verificação de versão':<28} {check * 1e6:>11.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
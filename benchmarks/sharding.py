@@ -0,0 +1,109 @@
+"""Mede a vazão de escrita de contratos conforme se adicionam shards.
+
+Uso: python benchmarks/sharding.py [--shards 0,1,2,4,8] [--writers 4] [--duration 5] [--parties 2]
+
+Para cada quantidade de shards (0 = sem sharding, tudo no banco global) cria
+bancos temporários e roda --writers processos que, durante --duration
+segundos, criam contratos com --parties partes para usuários aleatórios, um
+commit por contrato, como POST /contracts. A revisão inicial de cada
+contrato também é gravada. Mostra commits por segundo e quantos commits
+esperaram pelo lock de escrita (database is locked) e foram repetidos.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from src.models.user import db, Contract, ContractParty
+from src.services import revisions  # noqa: F401 (registra a gravação das revisões no flush)
+from src.services.sharding import init_sharding
+
+DADOS = '{"contratante": {"nome_completo": "Ana"}, "contrato": {"valor": 100}}'
+
+
+def create_app(tmpdir, shards):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, 'global.db')}"
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    app.config['SHARD_URLS'] = [f"sqlite:///{os.path.join(tmpdir, f'shard{i}.db')}" for i in range(shards)]
+    db.init_app(app)
+    init_sharding(app)
+    return app
+
+
+def writer(tmpdir, shards, duration, parties, start_at, results):
+    app = create_app(tmpdir, shards)
+    rng = random.Random(os.getpid())
+    commits = retries = 0
+    with app.app_context():
+        time.sleep(max(0.0, start_at - time.time()))
+        deadline = start_at + duration
+        while time.time() < deadline:
+            contract = Contract(user_id=rng.randint(1, 1_000_000), contract_type_id=1, template_id=1,
+                                titulo='Contrato de benchmark', dados_contrato=DADOS)
+            for i in range(parties):
+                contract.parties.append(ContractParty(tipo_parte='contratante', nome_completo=f'Parte {i}'))
+            db.session.add(contract)
+            try:
+                db.session.commit()
+                commits += 1
+            except OperationalError:
+                db.session.rollback()
+                retries += 1
+    results.put((commits, retries))
+
+
+def run(shards, writers, duration, parties):
+    tmpdir = tempfile.mkdtemp(prefix='contratosmart-bench-')
+    try:
+        app = create_app(tmpdir, shards)
+        with app.app_context():
+            db.create_all()
+            # Sem sharding o banco global recebe as escritas: WAL como nos shards
+            db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+            db.session.commit()
+            db.session.remove()
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        start_at = time.time() + 3
+        processes = [
+            context.Process(target=writer, args=(tmpdir, shards, duration, parties, start_at, results))
+            for _ in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return sum(c for c, _ in totals) / duration, sum(r for _, r in totals)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', default='0,1,2,4,8')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--parties', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f'{args.writers} processos de escrita, {args.duration:.0f} s por configuração, CPUs: {os.cpu_count()}')
+    print(f"{'shards':<12} {'commits/s':>10} {'repetidos':>10}")
+    for shards in (int(value) for value in args.shards.split(',')):
+        rate, retries = run(shards, args.writers, args.duration, args.parties)
+        print(f"{shards or 'sem sharding':<12} {rate:>10.0f} {retries:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Servidores locais usados pelos benchmarks (stub do Gov.br/ITI, receptor de webhooks)."""
+import threading
+import time
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+def create_govbr_stub():
+    """Aplicação que imita os endpoints de SSO do Gov.br e de assinatura do ITI"""
+    stub = Flask('govbr_stub')
+
+    @stub.route('/token', methods=['POST'])
+    def token():
+        return jsonify({
+            'access_token': 'stub-access-token-' + request.form.get('code', ''),
+            'id_token': 'stub-id-token',
+            'token_type': 'Bearer',
+            'expires_in': 3600
+        })
+
+    @stub.route('/userinfo', methods=['GET'])
+    def userinfo():
+        return jsonify({
+            'sub': '52998224725',
+            'name': 'Maria da Silva Santos',
+            'email': 'maria@example.com',
+            'email_verified': True
+        })
+
+    @stub.route('/certificados', methods=['GET'])
+    def certificados():
+        return jsonify([{'id': 'cert-stub-1', 'tipo': 'avancada'}])
+
+    @stub.route('/assinar', methods=['POST'])
+    def assinar():
+        data = request.get_json()
+        return jsonify({'signature': 'stub-signature-' + data['hashBase64'][:16]})
+
+    return stub
+
+
+def create_webhook_sink(status_code=200, delay=0.0):
+    """Receptor de webhooks que guarda cada evento com o instante de chegada em `stub.received`"""
+    stub = Flask('webhook_sink')
+    stub.received = []
+    stub.requests = 0
+
+    @stub.route('/webhook', methods=['POST'])
+    def webhook():
+        if delay:
+            time.sleep(delay)
+        stub.requests += 1
+        received_at = time.time()
+        stub.received.extend((received_at, evento) for evento in request.get_json()['eventos'])
+        return '', status_code
+
+    return stub
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ServerThread:
+    """Servidor WSGI multithread rodando em segundo plano numa porta livre"""
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.server = make_server(host, port, app, threaded=True, request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://{self.server.host}:{self.server.port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def patch_govbr_urls(base_url):
+    """Aponta as URLs do módulo govbr para o stub local"""
+    from src.routes import govbr
+
+    govbr.GOVBR_TOKEN_URL = f'{base_url}/token'
+    govbr.GOVBR_USERINFO_URL = f'{base_url}/userinfo'
+    govbr.GOVBR_CERTIFICATES_URL = f'{base_url}/certificados'
+    govbr.GOVBR_SIGNATURE_URL = f'{base_url}/assinar'
@@ -0,0 +1,129 @@
+"""Mede a importação em lote e a latência das consultas de usuários com muitos cadastros.
+
+Uso: python benchmarks/user_directory.py [--users 1000000] [--batch-size 1000] [--repeat 200]
+
+Cria um banco temporário, importa --users usuários por import_users (como
+POST /users/import e "flask users import") e mede via test client, com
+--repeat requisições cada: primeira página, página no meio da listagem pelo
+cursor (comparada ao OFFSET equivalente), busca por prefixo de e-mail e de
+nome (primeira e segunda página) e consulta por CPF. Mostra p50 e p95 em ms
+e o plano de consulta de cada busca.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func, select, text
+
+from src.models.user import db, User
+from src.routes.user import user_bp
+from src.services.synthetic_data import CPF_MULTIPLIER, FIRST_NAMES, LAST_NAMES
+from src.services.user_directory import encode_cursor, import_users, init_user_directory, list_users
+from src.utils.cpf import cpf_from_number
+
+
+def create_app(tmpdir):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, 'users.db')}"
+    db.init_app(app)
+    app.register_blueprint(user_bp, url_prefix='/api')
+    with app.app_context():
+        db.create_all()
+    init_user_directory(app)
+    return app
+
+
+def generate(count, rng):
+    for i in range(1, count + 1):
+        nome = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}'
+        yield {
+            'nome_completo': nome,
+            'email': f"{nome.lower().replace(' ', '.')}.{i}@example.com",
+            'cpf': cpf_from_number((i * CPF_MULTIPLIER) % 1_000_000_000),
+            'telefone': f'(11) 9{rng.randrange(1000, 9999)}-{rng.randrange(1000, 9999)}',
+        }
+
+
+def measure(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code, response.get_data(as_text=True))
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='contratosmart-bench-')
+    try:
+        app = create_app(tmpdir)
+        client = app.test_client()
+        with app.app_context():
+            started = time.perf_counter()
+            created, errors = import_users(generate(args.users, random.Random(1)), batch_size=args.batch_size)
+            elapsed = time.perf_counter() - started
+            print(f'importação: {created} usuários em {elapsed:.1f} s ({created / elapsed:.0f}/s), '
+                  f'{len(errors)} rejeitados')
+
+            middle = args.users // 2
+            sample = db.session.get(User, middle)
+            email_prefix = sample.email.split('.')[0][:4]
+            nome_prefix = sample.nome_completo.split(' ')[0]
+            second_page = list_users(cursor=None, nome=nome_prefix)[1]
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+            plans = {
+                'e-mail': select(User.id).where(User.email >= email_prefix, User.email < email_prefix + '~')
+                .order_by(User.email),
+                'nome': select(User.id).where(func.lower(User.nome_completo) >= nome_prefix.lower())
+                .order_by(func.lower(User.nome_completo), User.id),
+                'cpf': select(User.id).where(User.cpf == sample.cpf),
+            }
+            for name, query in plans.items():
+                sql = str(query.compile(db.engine, compile_kwargs={'literal_binds': True}))
+                plan = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+                print(f'plano {name}: ' + '; '.join(row[-1] for row in plan))
+
+        cases = [
+            ('primeira página', '/api/users?limit=50'),
+            ('página no meio (cursor)', f'/api/users?limit=50&cursor={encode_cursor([middle])}'),
+            ('prefixo de e-mail', f'/api/users?limit=50&email={email_prefix}'),
+            ('prefixo de nome', f'/api/users?limit=50&nome={nome_prefix}'),
+            ('prefixo de nome, 2ª página', f'/api/users?limit=50&nome={nome_prefix}&cursor={second_page}'),
+            ('CPF sem pontuação', f"/api/users/by-cpf/{sample.cpf.replace('.', '').replace('-', '')}"),
+        ]
+        print(f"{'consulta':<30} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, url in cases:
+            p50, p95 = measure(client, url, args.repeat)
+            print(f'{name:<30} {p50:>8.2f} {p95:>8.2f}')
+
+        with app.app_context():
+            # Referência: a mesma página do meio por OFFSET percorre todas as linhas anteriores
+            timings = []
+            for _ in range(max(args.repeat // 20, 3)):
+                started = time.perf_counter()
+                db.session.execute(select(User).order_by(User.id).offset(middle).limit(50)).all()
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{'página no meio (OFFSET, SQL)':<30} {statistics.median(timings):>8.2f}")
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
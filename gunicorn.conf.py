@@ -0,0 +1,70 @@
+"""Configuração do Gunicorn para produção.
+
+Uso:
+    SECRET_KEY=... gunicorn -c gunicorn.conf.py src.wsgi:app
+
+Variáveis de ambiente:
+    BIND                   endereço de escuta (padrão 0.0.0.0:5000)
+    WEB_CONCURRENCY        número de processos worker (padrão 2 * CPUs + 1)
+    GUNICORN_THREADS       threads por worker (padrão 4; >1 usa o worker gthread)
+    GUNICORN_PRELOAD       carrega o app no mestre antes do fork (padrão 1)
+    GUNICORN_MAX_REQUESTS  recicla o worker após N requisições (padrão 2000; 0 desliga)
+    GUNICORN_TIMEOUT       segundos até um worker travado ser reiniciado (padrão 60)
+
+Com mais de um worker, defina SECRET_KEY, use SESSION_BACKEND=sqlite (padrão)
+e METRICS_MULTIPROC_DIR para que /metrics agregue todos os processos.
+
+Vazão medida com benchmarks/endpoints.py --url (base de 20 mil usuários,
+8 clientes simultâneos, 400 requisições por cenário, req/s). A máquina
+tinha 1 vCPU, dividida entre o benchmark e o servidor, então o número de
+workers não pode ajudar aqui:
+
+    cenário            dev server (threaded)   gunicorn 3 workers x 4 threads
+    contract_types            293                        235
+    template                  285                        250
+    contract_detail            45                         50
+    list_contracts             13                         14
+    govbr_auth                336                        317
+    govbr_sign                125                        107
+
+Com vários núcleos a vazão cresce com WEB_CONCURRENCY, porque cada
+worker tem seu próprio GIL. Refaça a medição na máquina de produção antes
+de escolher os valores.
+"""
+import multiprocessing
+import os
+
+from src.services import background
+
+# Tarefas periódicas só nos workers: o mestre (que importa o app com preload)
+# apenas as registra, e post_fork as inicia em cada worker
+background.defer_until_fork()
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Reciclagem periódica limita o efeito de vazamentos de memória
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    from src.wsgi import on_worker_start
+
+    on_worker_start()
+
+
+def worker_exit(server, worker):
+    from src.wsgi import on_worker_exit
+
+    on_worker_exit()
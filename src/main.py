@@ -3,18 +3,46 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, session
+from flask import Flask, request, send_from_directory, session
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.contracts import contracts_bp
 from src.routes.seed import seed_bp
 from src.routes.govbr import govbr_bp
+from src.routes.metrics import metrics_bp
+from src.routes.profiles import profiles_bp
+from src.services.sessions import init_sessions
+from src.services.integrity_audit import audit_cli
+from src.services.instrumentation import init_instrumentation
+from src.services.metrics import init_metrics
+from src.services.profiler import init_profiler
+from src.services.static_assets import StaticManifest, static_cli
+from src.services.compression import init_compression
+from src.services.rate_limit import init_rate_limits
+from src.services.idempotency import init_idempotency
+from src.services.settings import init_settings
+from src.services.outbox import init_outbox
+from src.services.sharding import init_sharding, shards_cli
+from src.services.replica import init_replica, replica_cli
+from src.services.pdf import init_pdf
+from src.services.signatures import init_signature_expiry
+from src.services.response_cache import init_detail_cache
+from src.services.user_directory import init_user_directory, users_cli
 import os
 import secrets
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = secrets.token_hex(16)  # Chave secreta para sessões
+# Chave secreta para sessões; com vários workers ela precisa ser a mesma em todos
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(16)
+
+# Sessões no servidor: o cookie carrega apenas um id compacto, não os tokens do Gov.br
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sqlite')  # cookie, memory ou sqlite
+app.config['SESSION_SQLITE_PATH'] = os.environ.get(
+    'SESSION_SQLITE_PATH', os.path.join(os.path.dirname(__file__), 'database', 'sessions.db')
+)
+init_sessions(app)
 
 # Habilitar CORS para todas as rotas
 CORS(app, supports_credentials=True)
@@ -23,14 +51,119 @@ app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(contracts_bp, url_prefix='/api')
 app.register_blueprint(seed_bp, url_prefix='/api')
 app.register_blueprint(govbr_bp, url_prefix='/api/govbr')
+app.register_blueprint(metrics_bp)
+app.register_blueprint(profiles_bp, url_prefix='/api')
+
+# Comandos de linha de comando (flask --app src.main <comando>)
+app.cli.add_command(audit_cli)
+app.cli.add_command(static_cli)
+app.cli.add_command(shards_cli)
+app.cli.add_command(replica_cli)
+app.cli.add_command(users_cli)
 
 # uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
+
+# Sharding opcional: contratos, partes, assinaturas e logs espalhados por usuário entre os bancos de SHARD_URLS
+app.config['SHARD_URLS'] = [url for url in os.environ.get('SHARD_URLS', '').split(',') if url]
+# Shards sendo removidos (os últimos da ordem antiga): seguem acessíveis até `flask shards rebalance` esvaziá-los
+app.config['SHARD_RETIRING_URLS'] = [url for url in os.environ.get('SHARD_RETIRING_URLS', '').split(',') if url]
+init_sharding(app)
+
+# Réplica somente leitura do banco principal para as requisições GET/HEAD; quem escreveu lê do principal por alguns segundos
+app.config['REPLICA_URL'] = os.environ.get('REPLICA_URL') or None
+app.config['REPLICA_STICKY_SECONDS'] = float(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+init_replica(app)
+
+# Server-Timing, contagem de queries e detecção de N+1 (desligado por padrão)
+app.config['INSTRUMENTATION_ENABLED'] = os.environ.get('INSTRUMENTATION_ENABLED', '0') == '1'
+init_instrumentation(app)
+
+# Métricas por rota em /metrics; com vários processos, cada um grava seu snapshot neste diretório
+app.config['METRICS_MULTIPROC_DIR'] = os.environ.get('METRICS_MULTIPROC_DIR')
+init_metrics(app, db)
+
+# Profiling por amostragem: PROFILER_SAMPLE_RATE das requisições ou as que enviam X-Profile: <token>
+app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED', '0') == '1'
+app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('PROFILER_SAMPLE_RATE', '0'))
+app.config['PROFILER_TOKEN'] = os.environ.get('PROFILER_TOKEN')
+app.config['PROFILER_DIR'] = os.environ.get('PROFILER_DIR', os.path.join(os.path.dirname(__file__), 'database', 'profiles'))
+init_profiler(app)
+
+# Compressão gzip/br das respostas JSON da API acima de COMPRESS_MIN_SIZE bytes
+app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', '6'))
+init_compression(app)
+
+# Atrás de proxy reverso, quantos proxies confiáveis repassam X-Forwarded-For/Proto (0 = nenhum);
+# sem isso todos os anônimos teriam o IP do proxy e dividiriam o mesmo balde do limitador
+app.config['PROXY_FIX_X_FOR'] = int(os.environ.get('PROXY_FIX_X_FOR', '0'))
+app.config['PROXY_FIX_X_PROTO'] = int(os.environ.get('PROXY_FIX_X_PROTO', '0'))
+if app.config['PROXY_FIX_X_FOR'] or app.config['PROXY_FIX_X_PROTO']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'],
+                            x_proto=app.config['PROXY_FIX_X_PROTO'])
+
+# Limites de taxa e de concorrência por usuário e por rota, compartilhados entre os workers do host
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite')  # memory ou sqlite
+app.config['RATE_LIMIT_SQLITE_PATH'] = os.environ.get(
+    'RATE_LIMIT_SQLITE_PATH', os.path.join(os.path.dirname(__file__), 'database', 'ratelimit.db')
+)
+app.config['RATE_LIMIT_SWEEP_INTERVAL'] = float(os.environ.get('RATE_LIMIT_SWEEP_INTERVAL', '300'))
+init_rate_limits(app)
+
+# Idempotency-Key em POST /contracts e /govbr/sign: repetições recebem a resposta original
+app.config['IDEMPOTENCY_TTL'] = int(os.environ.get('IDEMPOTENCY_TTL', str(24 * 3600)))
+init_idempotency(app)
+
 with app.app_context():
     db.create_all()
 
+# Listagem de usuários por cursor e busca por prefixo de email/nome; POST /users/import aceita até USER_IMPORT_MAX_ROWS
+app.config['USER_IMPORT_MAX_ROWS'] = int(os.environ.get('USER_IMPORT_MAX_ROWS', '5000'))
+init_user_directory(app)
+
+# Cache em memória de system_settings; mudanças em outros workers chegam em até SETTINGS_REFRESH_INTERVAL s
+app.config['SETTINGS_REFRESH_INTERVAL'] = float(os.environ.get('SETTINGS_REFRESH_INTERVAL', '5'))
+init_settings(app)
+
+# Webhooks de parceiros (contrato gerado/assinado) entregues em segundo plano a partir da tabela outbox_events
+app.config['OUTBOX_WEBHOOKS'] = [url for url in os.environ.get('OUTBOX_WEBHOOKS', '').split(',') if url]
+app.config['OUTBOX_INTERVAL'] = float(os.environ.get('OUTBOX_INTERVAL', '1'))
+init_outbox(app)
+
+# Assinaturas pendentes há mais de SIGNATURE_EXPIRY_SECONDS viram "expirado" em lotes periódicos
+app.config['SIGNATURE_EXPIRY_SECONDS'] = int(os.environ.get('SIGNATURE_EXPIRY_SECONDS', str(7 * 24 * 3600)))
+app.config['SIGNATURE_SWEEP_INTERVAL'] = float(os.environ.get('SIGNATURE_SWEEP_INTERVAL', '300'))
+init_signature_expiry(app)
+
+# PDFs dos contratos gerados, em cache no disco por hash_documento (LRU limitado a PDF_CACHE_MAX_BYTES)
+app.config['PDF_CACHE_DIR'] = os.environ.get(
+    'PDF_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'database', 'pdf_cache')
+)
+app.config['PDF_CACHE_MAX_BYTES'] = int(os.environ.get('PDF_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+app.config['PDF_WORKERS'] = int(os.environ.get('PDF_WORKERS', '2'))
+init_pdf(app)
+
+# Cache das respostas de GET /contracts/<id>, invalidado no commit que altera o contrato, partes ou assinaturas
+app.config['DETAIL_CACHE_ENABLED'] = os.environ.get('DETAIL_CACHE_ENABLED', '1') == '1'
+app.config['DETAIL_CACHE_BACKEND'] = os.environ.get('DETAIL_CACHE_BACKEND', 'memory')  # memory ou sqlite
+app.config['DETAIL_CACHE_SQLITE_PATH'] = os.environ.get(
+    'DETAIL_CACHE_SQLITE_PATH', os.path.join(os.path.dirname(__file__), 'database', 'detailcache.db')
+)
+app.config['DETAIL_CACHE_MAX_ENTRIES'] = int(os.environ.get('DETAIL_CACHE_MAX_ENTRIES', '2048'))
+app.config['DETAIL_CACHE_MAX_BYTES'] = int(os.environ.get('DETAIL_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+init_detail_cache(app)
+
+# Manifesto em memória de static/: ETag, cache imutável e variantes .gz/.br sem I/O por requisição
+app.config['STATIC_MANIFEST'] = os.environ.get('STATIC_MANIFEST', '1') == '1'
+static_manifest = StaticManifest(app.static_folder) if app.config['STATIC_MANIFEST'] and app.static_folder else None
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -38,6 +171,9 @@ def serve(path):
     if static_folder_path is None:
             return "Static folder not configured", 404
 
+    if static_manifest is not None:
+        return static_manifest.serve(path, request)
+
     if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
         return send_from_directory(static_folder_path, path)
     else:
@@ -49,4 +185,5 @@ def serve(path):
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py src.wsgi:app
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG', '1') == '1')
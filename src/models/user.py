@@ -1,8 +1,29 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
 from datetime import datetime
 import json
 
-db = SQLAlchemy()
+# Chave em app.extensions com a fábrica das sessões do db para aquele app
+SESSION_FACTORY = 'db_session_factory'
+
+
+class AppSession(FlaskSession):
+    """Sessão do db que cada app pode trocar pela sua (sharding, réplica de leitura).
+
+    init_sharding/init_replica registram em app.extensions[SESSION_FACTORY] uma
+    função que recebe os argumentos da sessão e devolve a sessão pronta; sem
+    ela é a sessão padrão do Flask-SQLAlchemy.
+    """
+
+    def __new__(cls, db=None, **kwargs):
+        factory = current_app.extensions.get(SESSION_FACTORY)
+        if factory is not None:
+            return factory(db=db, **kwargs)
+        return super().__new__(cls)
+
+
+db = SQLAlchemy(session_options={'class_': AppSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -17,6 +38,11 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
 
+    # Busca por prefixo do nome: lower() só do SQLite (A-Z), igual ao da consulta
+    __table_args__ = (
+        db.Index('ix_users_nome_lower', db.func.lower(nome_completo)),
+    )
+
     # Relacionamentos
     contracts = db.relationship('Contract', backref='user', lazy=True)
     signatures = db.relationship('DigitalSignature', backref='user', lazy=True)
@@ -186,6 +212,11 @@ class ContractParty(db.Model):
 
 class DigitalSignature(db.Model):
     __tablename__ = 'digital_signatures'
+    # Pendentes vencidas e assinaturas de um contrato são achadas pelos índices, sem varrer a tabela
+    __table_args__ = (
+        db.Index('ix_signatures_status_created', 'status', 'created_at'),
+        db.Index('ix_signatures_contract_status', 'contract_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     contract_id = db.Column(db.Integer, db.ForeignKey('contracts.id'), nullable=False)
@@ -222,6 +253,25 @@ class DigitalSignature(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ContractSignatureStats(db.Model):
+    __tablename__ = 'contract_signature_stats'
+
+    contract_id = db.Column(db.Integer, db.ForeignKey('contracts.id'), primary_key=True)
+    pendentes = db.Column(db.Integer, default=0, nullable=False)
+    assinadas = db.Column(db.Integer, default=0, nullable=False)
+    rejeitadas = db.Column(db.Integer, default=0, nullable=False)
+    expiradas = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'pendentes': self.pendentes,
+            'assinadas': self.assinadas,
+            'rejeitadas': self.rejeitadas,
+            'expiradas': self.expiradas,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class SystemSetting(db.Model):
     __tablename__ = 'system_settings'
     
@@ -291,3 +341,90 @@ class ActivityLog(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (db.UniqueConstraint('rota', 'chave', name='uq_idempotency_rota_chave'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    rota = db.Column(db.String(100), nullable=False)
+    chave = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.Enum('processando', 'concluido', name='status_idempotency_enum'), default='processando')
+    status_code = db.Column(db.Integer)
+    corpo_resposta = db.Column(db.Text)
+    mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'rota': self.rota,
+            'chave': self.chave,
+            'status': self.status,
+            'status_code': self.status_code,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+class ContractRevision(db.Model):
+    __tablename__ = 'contract_revisions'
+    __table_args__ = (db.UniqueConstraint('contract_id', 'numero', name='uq_contract_revision_numero'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    contract_id = db.Column(db.Integer, db.ForeignKey('contracts.id'), nullable=False)
+    numero = db.Column(db.Integer, nullable=False)
+    snapshot = db.Column(db.Boolean, default=False, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # JSON comprimido: cópia completa ou delta
+    status = db.Column(db.String(20))
+    hash_documento = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'contract_id': self.contract_id,
+            'numero': self.numero,
+            'snapshot': self.snapshot,
+            'status': self.status,
+            'hash_documento': self.hash_documento,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox_events'
+    __table_args__ = (db.Index('ix_outbox_status_proxima', 'status', 'proxima_tentativa_em'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    destino = db.Column(db.String(500), nullable=False)
+    tipo = db.Column(db.String(50), nullable=False)
+    contract_id = db.Column(db.Integer, db.ForeignKey('contracts.id'))
+    payload = db.Column(db.Text, nullable=False)  # JSON string
+    status = db.Column(db.Enum('pendente', 'entregue', 'falhou', name='status_outbox_enum'), default='pendente')
+    tentativas = db.Column(db.Integer, default=0, nullable=False)
+    proxima_tentativa_em = db.Column(db.DateTime, default=datetime.utcnow)
+    lote = db.Column(db.String(32))
+    ultimo_erro = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    entregue_em = db.Column(db.DateTime)
+
+    def get_payload(self):
+        if self.payload:
+            return json.loads(self.payload)
+        return {}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'destino': self.destino,
+            'tipo': self.tipo,
+            'contract_id': self.contract_id,
+            'payload': self.get_payload(),
+            'status': self.status,
+            'tentativas': self.tentativas,
+            'proxima_tentativa_em': self.proxima_tentativa_em.isoformat() if self.proxima_tentativa_em else None,
+            'ultimo_erro': self.ultimo_erro,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'entregue_em': self.entregue_em.isoformat() if self.entregue_em else None
+        }
@@ -1,7 +1,19 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, ContractType, ContractTemplate, Contract, ContractParty
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context, url_for
+from src.models.user import db, ContractType, ContractTemplate, Contract, ContractParty, ContractRevision
+from src.services.instrumentation import timed
+from src.services.rate_limit import rate_limited
+from src.services.idempotency import idempotent
+from src.services.validation import get_validator
+from src.services.revisions import reconstruct
+from src.services.archive import stream_contracts_zip
+from src.services import response_cache
+from src.services.replica import read_from_primary
+from src.services.rendering import compile_template, placeholder_values, preview_diff
+from src.services.signatures import signature_stats
+from sqlalchemy.orm import defer
 from datetime import datetime
 import hashlib
+import json
 import re
 
 contracts_bp = Blueprint('contracts', __name__)
@@ -54,7 +66,55 @@ def get_template(template_id):
             'error': str(e)
         }), 500
 
+@contracts_bp.route('/templates/<int:template_id>/preview', methods=['POST'])
+def preview_template(template_id):
+    """Pré-visualiza o contrato com os dados do formulário, sem gravar nada.
+
+    Com dados_anteriores, a versao e o agora da resposta anterior (enviado
+    como agora_anterior), devolve só os segmentos afetados pelos campos e pela
+    data/hora alterados; agora fixa a data/hora usada.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        dados = data.get('dados_contrato')
+        anterior = data.get('dados_anteriores')
+        if not isinstance(dados, dict) or (anterior is not None and not isinstance(anterior, dict)):
+            return jsonify({
+                'success': False,
+                'error': 'dados_contrato e dados_anteriores devem ser objetos'
+            }), 400
+        try:
+            agora = datetime.fromisoformat(data['agora']) if data.get('agora') else datetime.now().replace(microsecond=0)
+            agora_anterior = datetime.fromisoformat(data['agora_anterior']) if data.get('agora_anterior') else None
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'agora e agora_anterior devem ser datas ISO 8601'
+            }), 400
+
+        template = db.session.get(ContractTemplate, template_id)
+        if template is None:
+            return jsonify({
+                'success': False,
+                'error': 'Template não encontrado'
+            }), 404
+
+        with timed('render'):
+            preview = preview_diff(template.conteudo_template, dados, agora, anterior, data.get('versao'), agora_anterior)
+        preview['agora'] = agora.isoformat()
+        preview['erros'] = get_validator(template).validate(dados)
+        return jsonify({
+            'success': True,
+            'data': preview
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @contracts_bp.route('/contracts', methods=['POST'])
+@idempotent
 def create_contract():
     """Cria um novo contrato"""
     try:
@@ -69,6 +129,21 @@ def create_contract():
                     'error': f'Campo obrigatório ausente: {field}'
                 }), 400
 
+        # Validar dados e partes contra os campos definidos no template
+        template = db.session.get(ContractTemplate, data['template_id'])
+        if template is None:
+            return jsonify({
+                'success': False,
+                'error': 'Template não encontrado'
+            }), 400
+        errors = get_validator(template).validate(data['dados_contrato'], data.get('partes', []))
+        if errors:
+            return jsonify({
+                'success': False,
+                'error': 'Dados do contrato inválidos',
+                'errors': errors
+            }), 400
+
         # Criar o contrato
         contract = Contract(
             user_id=data['user_id'],
@@ -112,7 +187,48 @@ def create_contract():
             'error': str(e)
         }), 500
 
+@contracts_bp.route('/contracts/validate', methods=['POST'])
+def validate_contracts():
+    """Valida um ou vários contratos contra seus templates sem gravá-los"""
+    try:
+        data = request.get_json()
+        items = data if isinstance(data, list) else [data]
+
+        template_ids = [item.get('template_id') for item in items if isinstance(item, dict)]
+        if any(type(template_id) is not int for template_id in template_ids if template_id is not None):
+            return jsonify({
+                'success': False,
+                'error': 'template_id deve ser um número inteiro'
+            }), 400
+        templates = {
+            t.id: t for t in ContractTemplate.query.filter(ContractTemplate.id.in_(set(template_ids))).all()
+        }
+
+        results = []
+        for item in items:
+            if not isinstance(item, dict) or 'dados_contrato' not in item:
+                errors = [{'campo': 'dados_contrato', 'erro': 'campo obrigatório'}]
+            elif item.get('template_id') not in templates:
+                errors = [{'campo': 'template_id', 'erro': 'template não encontrado'}]
+            else:
+                errors = get_validator(templates[item['template_id']]).validate(
+                    item['dados_contrato'], item.get('partes', [])
+                )
+            results.append({'valid': not errors, 'errors': errors})
+
+        return jsonify({
+            'success': True,
+            'data': results if isinstance(data, list) else results[0]
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @contracts_bp.route('/contracts/<int:contract_id>/generate', methods=['POST'])
+@rate_limited('generate')
 def generate_contract(contract_id):
     """Gera o conteúdo final do contrato baseado no template"""
     try:
@@ -123,25 +239,35 @@ def generate_contract(contract_id):
         dados = contract.get_dados_contrato()
         
         # Gerar conteúdo do contrato
-        conteudo_final = generate_contract_content(template.conteudo_template, dados)
+        with timed('render'):
+            conteudo_final = generate_contract_content(template.conteudo_template, dados)
         
         # Gerar hash do documento
-        hash_documento = hashlib.sha256(conteudo_final.encode('utf-8')).hexdigest()
+        with timed('hash'):
+            hash_documento = hashlib.sha256(conteudo_final.encode('utf-8')).hexdigest()
         
         # Atualizar o contrato
         contract.conteudo_final = conteudo_final
         contract.hash_documento = hash_documento
         contract.status = 'gerado'
+        contract.url_documento = url_for('contracts.get_contract_pdf', contract_id=contract.id)
         contract.updated_at = datetime.utcnow()
         
         db.session.commit()
 
+        # Adianta a renderização do PDF sem esperar por ela; se falhar, GET /pdf renderiza depois
+        try:
+            current_app.extensions['pdf'].submit(hash_documento, conteudo_final, rodape=f'SHA-256 {hash_documento}')
+        except Exception:
+            current_app.logger.exception('Falha ao agendar o PDF do contrato %s', contract.id)
+
         return jsonify({
             'success': True,
             'data': {
                 'contract_id': contract.id,
                 'conteudo_final': conteudo_final,
-                'hash_documento': hash_documento
+                'hash_documento': hash_documento,
+                'url_documento': contract.url_documento
             },
             'message': 'Contrato gerado com sucesso'
         })
@@ -153,20 +279,63 @@ def generate_contract(contract_id):
             'error': str(e)
         }), 500
 
+@contracts_bp.route('/contracts/<int:contract_id>/pdf', methods=['GET'])
+def get_contract_pdf(contract_id):
+    """Retorna o PDF do contrato gerado, renderizado uma vez por hash_documento"""
+    try:
+        contract = db.session.get(Contract, contract_id)
+        if contract is None:
+            return jsonify({
+                'success': False,
+                'error': 'Contrato não encontrado'
+            }), 404
+        if contract.conteudo_final is None or not contract.hash_documento:
+            return jsonify({
+                'success': False,
+                'error': 'Contrato ainda não foi gerado'
+            }), 409
+
+        with timed('render'):
+            path = current_app.extensions['pdf'].get(
+                contract.hash_documento, contract.conteudo_final, rodape=f'SHA-256 {contract.hash_documento}'
+            )
+        response = send_file(path, mimetype='application/pdf', download_name=f'contrato-{contract.id}.pdf',
+                             etag=contract.hash_documento, conditional=True, max_age=0)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @contracts_bp.route('/contracts/<int:contract_id>', methods=['GET'])
 def get_contract(contract_id):
     """Retorna um contrato específico"""
     try:
+        cache = current_app.extensions.get('detail_cache')
+        if cache is not None:
+            entry, token = cache.lookup(contract_id)
+            if entry is not None:
+                return response_cache.respond(entry)
+            # A resposta vai para o cache: montada de uma réplica atrasada, a versão antiga ficaria guardada
+            read_from_primary()
+
         contract = Contract.query.get_or_404(contract_id)
         
         # Incluir as partes do contrato
         contract_data = contract.to_dict()
         contract_data['partes'] = [parte.to_dict() for parte in contract.parties]
-        
-        return jsonify({
-            'success': True,
-            'data': contract_data
-        })
+        contract_data['assinaturas'] = signature_stats(db.session, contract.id).to_dict()
+
+        with timed('json'):
+            response = jsonify({
+                'success': True,
+                'data': contract_data
+            })
+        if cache is None:
+            return response
+        return response_cache.respond(cache.store(contract_id, token, response.get_data()))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -186,9 +355,73 @@ def get_contracts():
 
         contracts = Contract.query.filter_by(user_id=user_id).order_by(Contract.created_at.desc()).all()
         
+        with timed('json'):
+            return jsonify({
+                'success': True,
+                'data': [contract.to_dict() for contract in contracts]
+            })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@contracts_bp.route('/contracts/archive', methods=['GET'])
+@rate_limited('export')
+def get_contracts_archive():
+    """Baixa um ZIP com todos os contratos do usuário, gerado durante o envio"""
+    try:
+        user_id = request.args.get('user_id', type=int)
+        if not user_id:
+            return jsonify({
+                'success': False,
+                'error': 'user_id é obrigatório'
+            }), 400
+
+        filename = f"contratos-{user_id}-{datetime.utcnow().strftime('%Y%m%d')}.zip"
+        return Response(
+            stream_with_context(stream_contracts_zip(user_id)),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Cache-Control': 'no-store'
+            }
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@contracts_bp.route('/contracts/<int:contract_id>/revisions', methods=['GET'])
+def get_contract_revisions(contract_id):
+    """Lista as revisões do contrato, da mais recente para a mais antiga"""
+    try:
+        if db.session.get(Contract, contract_id) is None:
+            return jsonify({
+                'success': False,
+                'error': 'Contrato não encontrado'
+            }), 404
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+
+        pagination = db.paginate(
+            ContractRevision.query
+            .options(defer(ContractRevision.payload))
+            .filter_by(contract_id=contract_id)
+            .order_by(ContractRevision.numero.desc()),
+            page=page, per_page=per_page, max_per_page=100, error_out=False
+        )
+
         return jsonify({
             'success': True,
-            'data': [contract.to_dict() for contract in contracts]
+            'data': [revision.to_dict() for revision in pagination.items],
+            'pagination': {
+                'page': pagination.page,
+                'per_page': pagination.per_page,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
         })
     except Exception as e:
         return jsonify({
@@ -196,41 +429,35 @@ def get_contracts():
             'error': str(e)
         }), 500
 
-def generate_contract_content(template_content, dados):
+@contracts_bp.route('/contracts/<int:contract_id>/revisions/<int:numero>', methods=['GET'])
+def get_contract_revision(contract_id, numero):
+    """Reconstrói os dados e o conteúdo do contrato numa revisão"""
+    try:
+        revision = ContractRevision.query.options(defer(ContractRevision.payload)).filter_by(
+            contract_id=contract_id, numero=numero
+        ).first()
+        if revision is None:
+            return jsonify({
+                'success': False,
+                'error': 'Revisão não encontrada'
+            }), 404
+        document = reconstruct(db.session, contract_id, numero)
+
+        revision_data = revision.to_dict()
+        revision_data['dados_contrato'] = json.loads(document['dados_contrato'] or '{}')
+        revision_data['conteudo_final'] = document['conteudo_final']
+        return jsonify({
+            'success': True,
+            'data': revision_data
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def generate_contract_content(template_content, dados, agora=None):
     """Gera o conteúdo do contrato substituindo placeholders pelos dados"""
-    conteudo = template_content
-    
-    # Substituir placeholders básicos
-    placeholders = {
-        '{{CONTRATANTE_NOME}}': dados.get('contratante', {}).get('nome_completo', ''),
-        '{{CONTRATANTE_CPF}}': dados.get('contratante', {}).get('cpf', ''),
-        '{{CONTRATANTE_RG}}': dados.get('contratante', {}).get('rg', ''),
-        '{{CONTRATANTE_ENDERECO}}': dados.get('contratante', {}).get('endereco', ''),
-        '{{CONTRATANTE_TELEFONE}}': dados.get('contratante', {}).get('telefone', ''),
-        '{{CONTRATANTE_EMAIL}}': dados.get('contratante', {}).get('email', ''),
-        
-        '{{CONTRATADO_NOME}}': dados.get('contratado', {}).get('nome_completo', ''),
-        '{{CONTRATADO_CPF}}': dados.get('contratado', {}).get('cpf', ''),
-        '{{CONTRATADO_RG}}': dados.get('contratado', {}).get('rg', ''),
-        '{{CONTRATADO_ENDERECO}}': dados.get('contratado', {}).get('endereco', ''),
-        '{{CONTRATADO_TELEFONE}}': dados.get('contratado', {}).get('telefone', ''),
-        '{{CONTRATADO_EMAIL}}': dados.get('contratado', {}).get('email', ''),
-        '{{CONTRATADO_PROFISSAO}}': dados.get('contratado', {}).get('profissao', ''),
-        
-        '{{DATA_INICIO}}': dados.get('contrato', {}).get('data_inicio', ''),
-        '{{DATA_FIM}}': dados.get('contrato', {}).get('data_fim', ''),
-        '{{VALOR}}': dados.get('contrato', {}).get('valor', ''),
-        '{{DESCRICAO_SERVICO}}': dados.get('contrato', {}).get('descricao_servico', ''),
-        '{{FORMA_PAGAMENTO}}': dados.get('contrato', {}).get('forma_pagamento', ''),
-        '{{CLAUSULAS_ESPECIAIS}}': dados.get('contrato', {}).get('clausulas_especiais', ''),
-        
-        '{{DATA_ATUAL}}': datetime.now().strftime('%d/%m/%Y'),
-        '{{HORA_ATUAL}}': datetime.now().strftime('%H:%M:%S'),
-    }
-    
-    # Substituir todos os placeholders
-    for placeholder, valor in placeholders.items():
-        conteudo = conteudo.replace(placeholder, str(valor))
-    
-    return conteudo
+    agora = agora or datetime.now()
+    return compile_template(template_content).render(placeholder_values(dados, agora))
 
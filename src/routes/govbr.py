@@ -3,25 +3,49 @@ import requests
 import json
 import os
 import base64
+import functools
 import hashlib
-import time
+from datetime import datetime
 from urllib.parse import urlencode
 from src.models.user import db, DigitalSignature
+from src.services.instrumentation import timed
+from src.services.rate_limit import rate_limited
+from src.services.idempotency import idempotent
+from src.services.sessions import regenerate_session
 
 govbr_bp = Blueprint('govbr', __name__)
 
+
+def govbr_login_required(view):
+    """Recusa com 401 quem não autenticou com o Gov.br, antes de qualquer outro decorador da rota"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'govbr_access_token' not in session:
+            return jsonify({
+                'success': False,
+                'error': 'User not authenticated with Gov.br'
+            }), 401
+        return view(*args, **kwargs)
+
+    return wrapper
+
 # Configurações da API Gov.br
 # Em produção, estas configurações devem vir de variáveis de ambiente ou arquivo de configuração seguro
-GOVBR_CLIENT_ID = "seu-client-id"
-GOVBR_CLIENT_SECRET = "seu-client-secret"
-GOVBR_REDIRECT_URI = "http://localhost:5000/api/govbr/callback"
-GOVBR_AUTH_URL = "https://sso.staging.acesso.gov.br/authorize"
-GOVBR_TOKEN_URL = "https://sso.staging.acesso.gov.br/token"
-GOVBR_USERINFO_URL = "https://sso.staging.acesso.gov.br/userinfo"
-GOVBR_CERTIFICATES_URL = "https://assinatura-api.staging.iti.br/externo/v2/certificados"
-GOVBR_SIGNATURE_URL = "https://assinatura-api.staging.iti.br/externo/v2/assinar"
+GOVBR_CLIENT_ID = os.environ.get('GOVBR_CLIENT_ID', "seu-client-id")
+GOVBR_CLIENT_SECRET = os.environ.get('GOVBR_CLIENT_SECRET', "seu-client-secret")
+GOVBR_REDIRECT_URI = os.environ.get('GOVBR_REDIRECT_URI', "http://localhost:5000/api/govbr/callback")
+GOVBR_AUTH_URL = os.environ.get('GOVBR_AUTH_URL', "https://sso.staging.acesso.gov.br/authorize")
+GOVBR_TOKEN_URL = os.environ.get('GOVBR_TOKEN_URL', "https://sso.staging.acesso.gov.br/token")
+GOVBR_USERINFO_URL = os.environ.get('GOVBR_USERINFO_URL', "https://sso.staging.acesso.gov.br/userinfo")
+GOVBR_CERTIFICATES_URL = os.environ.get(
+    'GOVBR_CERTIFICATES_URL', "https://assinatura-api.staging.iti.br/externo/v2/certificados"
+)
+GOVBR_SIGNATURE_URL = os.environ.get(
+    'GOVBR_SIGNATURE_URL', "https://assinatura-api.staging.iti.br/externo/v2/assinar"
+)
 
 @govbr_bp.route('/auth', methods=['GET'])
+@rate_limited('govbr_auth')
 def auth():
     """Inicia o fluxo de autenticação com o Gov.br"""
     # Parâmetros para a URL de autorização
@@ -47,6 +71,7 @@ def auth():
     })
 
 @govbr_bp.route('/callback', methods=['GET'])
+@rate_limited('govbr_auth')
 def callback():
     """Callback para receber o código de autorização do Gov.br"""
     # Obter o código de autorização e state da URL
@@ -72,6 +97,9 @@ def callback():
     if not userinfo_response.get('success'):
         return jsonify(userinfo_response), 400
     
+    # Novo id de sessão ao autenticar: um id plantado antes do login não vira sessão autenticada
+    regenerate_session(session)
+
     # Armazenar o token e informações do usuário na sessão
     session['govbr_access_token'] = token_response['access_token']
     session['govbr_id_token'] = token_response['id_token']
@@ -109,13 +137,14 @@ def certificates():
         }), 401
     
     try:
-        response = requests.get(
-            GOVBR_CERTIFICATES_URL,
-            headers={
-                'Authorization': f"Bearer {session['govbr_access_token']}",
-                'Content-Type': 'application/json'
-            }
-        )
+        with timed('http'):
+            response = requests.get(
+                GOVBR_CERTIFICATES_URL,
+                headers={
+                    'Authorization': f"Bearer {session['govbr_access_token']}",
+                    'Content-Type': 'application/json'
+                }
+            )
         
         if response.status_code != 200:
             return jsonify({
@@ -136,14 +165,11 @@ def certificates():
         }), 500
 
 @govbr_bp.route('/sign', methods=['POST'])
+@govbr_login_required
+@idempotent
+@rate_limited('sign')
 def sign():
     """Assina um documento usando a API do Gov.br"""
-    if 'govbr_access_token' not in session:
-        return jsonify({
-            'success': False,
-            'error': 'User not authenticated with Gov.br'
-        }), 401
-    
     try:
         data = request.get_json()
         
@@ -163,14 +189,15 @@ def sign():
         }
         
         # Fazer a requisição para a API de assinatura
-        response = requests.post(
-            GOVBR_SIGNATURE_URL,
-            headers={
-                'Authorization': f"Bearer {session['govbr_access_token']}",
-                'Content-Type': 'application/json'
-            },
-            json=signature_data
-        )
+        with timed('http'):
+            response = requests.post(
+                GOVBR_SIGNATURE_URL,
+                headers={
+                    'Authorization': f"Bearer {session['govbr_access_token']}",
+                    'Content-Type': 'application/json'
+                },
+                json=signature_data
+            )
         
         if response.status_code != 200:
             return jsonify({
@@ -186,7 +213,7 @@ def sign():
             user_id=data['user_id'],
             tipo_assinatura='govbr',
             hash_assinatura=signature_result.get('signature'),
-            timestamp_assinatura=time.time(),
+            timestamp_assinatura=datetime.utcnow(),
             ip_address=request.remote_addr,
             user_agent=request.user_agent.string,
             status='assinado'
@@ -195,6 +222,7 @@ def sign():
         # Armazenar informações do certificado
         certificate_info = {
             'certificate_id': data['certificate_id'],
+            'hash_documento': data['hash_documento'],
             'govbr_user_info': session.get('govbr_userinfo'),
             'signature_info': signature_result
         }
@@ -229,14 +257,15 @@ def exchange_code_for_token(code):
         auth = base64.b64encode(f"{GOVBR_CLIENT_ID}:{GOVBR_CLIENT_SECRET}".encode()).decode()
         
         # Fazer a requisição para obter o token
-        response = requests.post(
-            GOVBR_TOKEN_URL,
-            headers={
-                'Authorization': f"Basic {auth}",
-                'Content-Type': 'application/x-www-form-urlencoded'
-            },
-            data=token_data
-        )
+        with timed('http'):
+            response = requests.post(
+                GOVBR_TOKEN_URL,
+                headers={
+                    'Authorization': f"Basic {auth}",
+                    'Content-Type': 'application/x-www-form-urlencoded'
+                },
+                data=token_data
+            )
         
         if response.status_code != 200:
             return {
@@ -262,12 +291,13 @@ def exchange_code_for_token(code):
 def get_user_info(access_token):
     """Obtém informações do usuário usando o token de acesso"""
     try:
-        response = requests.get(
-            GOVBR_USERINFO_URL,
-            headers={
-                'Authorization': f"Bearer {access_token}"
-            }
-        )
+        with timed('http'):
+            response = requests.get(
+                GOVBR_USERINFO_URL,
+                headers={
+                    'Authorization': f"Bearer {access_token}"
+                }
+            )
         
         if response.status_code != 200:
             return {
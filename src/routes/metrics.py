@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from src.services.metrics import registry
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Exposição das métricas no formato texto do Prometheus"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, jsonify, send_from_directory
+from src.services.profiler import is_privileged, list_profiles, profiles_dir, PROFILE_SUFFIX
+
+profiles_bp = Blueprint('profiles', __name__)
+
+def _forbidden():
+    return jsonify({
+        'success': False,
+        'error': 'Token de profiling ausente ou inválido'
+    }), 403
+
+@profiles_bp.route('/profiles', methods=['GET'])
+def get_profiles():
+    """Lista os perfis recentes, opcionalmente filtrados por endpoint (ex.: contracts.get_contracts)"""
+    if not is_privileged(request):
+        return _forbidden()
+
+    limit = request.args.get('limit', 50, type=int)
+    profiles = list_profiles(request.args.get('endpoint'))[:limit]
+    return jsonify({
+        'success': True,
+        'data': profiles
+    })
+
+@profiles_bp.route('/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """Baixa um arquivo pstats (abrir com python -m pstats ou snakeviz)"""
+    if not is_privileged(request):
+        return _forbidden()
+
+    if not name.endswith(PROFILE_SUFFIX) or profiles_dir() is None:
+        return jsonify({
+            'success': False,
+            'error': 'Perfil não encontrado'
+        }), 404
+    return send_from_directory(profiles_dir(), name, as_attachment=True)
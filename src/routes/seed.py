@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify
+import click
 from src.models.user import db, ContractType, ContractTemplate
 
 seed_bp = Blueprint('seed', __name__)
@@ -14,97 +15,14 @@ def seed_initial_data():
                 'message': 'Dados já existem no banco'
             })
 
-        # Criar tipos de contratos
-        contract_types_data = [
-            {
-                'nome': 'Contrato de Prestação de Serviços Gerais',
-                'descricao': 'Modelo padrão para prestação de serviços diversos',
-                'categoria': 'servico'
-            },
-            {
-                'nome': 'Contrato de Namoro',
-                'descricao': 'Acordo de relacionamento amoroso com termos específicos',
-                'categoria': 'namoro'
-            },
-            {
-                'nome': 'Contrato de Cuidador de Pets',
-                'descricao': 'Acordo para cuidados de animais de estimação',
-                'categoria': 'pets'
-            },
-            {
-                'nome': 'Contrato de Pintura Residencial',
-                'descricao': 'Serviços de pintura para residências',
-                'categoria': 'servico'
-            },
-            {
-                'nome': 'Contrato de Serviços de Pedreiro',
-                'descricao': 'Serviços de construção e reforma',
-                'categoria': 'servico'
-            },
-            {
-                'nome': 'Contrato de Serviços Elétricos',
-                'descricao': 'Instalações e manutenções elétricas',
-                'categoria': 'servico'
-            },
-            {
-                'nome': 'Contrato de Aluguel Residencial',
-                'descricao': 'Locação de imóveis residenciais',
-                'categoria': 'aluguel'
-            }
-        ]
-
-        contract_types = []
-        for ct_data in contract_types_data:
-            ct = ContractType(**ct_data)
-            db.session.add(ct)
-            contract_types.append(ct)
-
-        db.session.flush()  # Para obter os IDs
-
-        # Criar templates
-        templates_data = [
-            {
-                'contract_type_id': contract_types[0].id,  # Prestação de Serviços Gerais
-                'nome': 'Template Padrão - Prestação de Serviços',
-                'conteudo_template': get_template_prestacao_servicos(),
-                'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf", "endereco"], "contratado": ["nome_completo", "cpf", "profissao"], "contrato": ["data_inicio", "valor", "descricao_servico"]}',
-                'campos_opcionais': '{"contratante": ["rg", "telefone", "email"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "forma_pagamento", "clausulas_especiais"]}'
-            },
-            {
-                'contract_type_id': contract_types[1].id,  # Namoro
-                'nome': 'Template Padrão - Contrato de Namoro',
-                'conteudo_template': get_template_namoro(),
-                'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf"], "contratado": ["nome_completo", "cpf"], "contrato": ["data_inicio"]}',
-                'campos_opcionais': '{"contratante": ["rg", "telefone", "email", "endereco"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "clausulas_especiais"]}'
-            },
-            {
-                'contract_type_id': contract_types[2].id,  # Cuidador de Pets
-                'nome': 'Template Padrão - Cuidador de Pets',
-                'conteudo_template': get_template_cuidador_pets(),
-                'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf", "endereco"], "contratado": ["nome_completo", "cpf"], "contrato": ["data_inicio", "valor", "descricao_servico"]}',
-                'campos_opcionais': '{"contratante": ["rg", "telefone", "email"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "forma_pagamento", "clausulas_especiais"]}'
-            },
-            {
-                'contract_type_id': contract_types[3].id,  # Pintura
-                'nome': 'Template Padrão - Pintura Residencial',
-                'conteudo_template': get_template_pintura(),
-                'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf", "endereco"], "contratado": ["nome_completo", "cpf", "profissao"], "contrato": ["data_inicio", "valor", "descricao_servico"]}',
-                'campos_opcionais': '{"contratante": ["rg", "telefone", "email"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "forma_pagamento", "clausulas_especiais"]}'
-            }
-        ]
-
-        for template_data in templates_data:
-            template = ContractTemplate(**template_data)
-            db.session.add(template)
-
-        db.session.commit()
+        contract_types_count, templates_count = create_initial_data()
 
         return jsonify({
             'success': True,
             'message': 'Dados iniciais criados com sucesso',
             'data': {
-                'contract_types': len(contract_types_data),
-                'templates': len(templates_data)
+                'contract_types': contract_types_count,
+                'templates': templates_count
             }
         })
 
@@ -115,6 +33,115 @@ def seed_initial_data():
             'error': str(e)
         }), 500
 
+@seed_bp.cli.command('synthetic')
+@click.option('--users', default=1000, show_default=True, help='Quantidade de usuários')
+@click.option('--contracts-per-user', default=5, show_default=True, help='Média de contratos por usuário')
+@click.option('--seed', default=42, show_default=True, help='Semente do gerador')
+@click.option('--batch-size', default=5000, show_default=True, help='Linhas por INSERT em lote')
+@click.option('--defer-indexes/--no-defer-indexes', default=True, show_default=True,
+              help='Recria os índices secundários só ao final da carga')
+def seed_synthetic_command(users, contracts_per_user, seed, batch_size, defer_indexes):
+    """Gera uma massa de dados sintética para testes de desempenho"""
+    from src.services.synthetic_data import generate_synthetic_data
+
+    if ContractType.query.count() == 0:
+        create_initial_data()
+    counts = generate_synthetic_data(
+        users=users, contracts_per_user=contracts_per_user, seed=seed,
+        batch_size=batch_size, defer_indexes=defer_indexes, log=click.echo
+    )
+    for table, count in counts.items():
+        click.echo(f'{table}: {count}')
+
+def create_initial_data():
+    """Cria os tipos de contrato e templates padrão"""
+    # Criar tipos de contratos
+    contract_types_data = [
+        {
+            'nome': 'Contrato de Prestação de Serviços Gerais',
+            'descricao': 'Modelo padrão para prestação de serviços diversos',
+            'categoria': 'servico'
+        },
+        {
+            'nome': 'Contrato de Namoro',
+            'descricao': 'Acordo de relacionamento amoroso com termos específicos',
+            'categoria': 'namoro'
+        },
+        {
+            'nome': 'Contrato de Cuidador de Pets',
+            'descricao': 'Acordo para cuidados de animais de estimação',
+            'categoria': 'pets'
+        },
+        {
+            'nome': 'Contrato de Pintura Residencial',
+            'descricao': 'Serviços de pintura para residências',
+            'categoria': 'servico'
+        },
+        {
+            'nome': 'Contrato de Serviços de Pedreiro',
+            'descricao': 'Serviços de construção e reforma',
+            'categoria': 'servico'
+        },
+        {
+            'nome': 'Contrato de Serviços Elétricos',
+            'descricao': 'Instalações e manutenções elétricas',
+            'categoria': 'servico'
+        },
+        {
+            'nome': 'Contrato de Aluguel Residencial',
+            'descricao': 'Locação de imóveis residenciais',
+            'categoria': 'aluguel'
+        }
+    ]
+
+    contract_types = []
+    for ct_data in contract_types_data:
+        ct = ContractType(**ct_data)
+        db.session.add(ct)
+        contract_types.append(ct)
+
+    db.session.flush()  # Para obter os IDs
+
+    # Criar templates
+    templates_data = [
+        {
+            'contract_type_id': contract_types[0].id,  # Prestação de Serviços Gerais
+            'nome': 'Template Padrão - Prestação de Serviços',
+            'conteudo_template': get_template_prestacao_servicos(),
+            'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf", "endereco"], "contratado": ["nome_completo", "cpf", "profissao"], "contrato": ["data_inicio", "valor", "descricao_servico"]}',
+            'campos_opcionais': '{"contratante": ["rg", "telefone", "email"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "forma_pagamento", "clausulas_especiais"]}'
+        },
+        {
+            'contract_type_id': contract_types[1].id,  # Namoro
+            'nome': 'Template Padrão - Contrato de Namoro',
+            'conteudo_template': get_template_namoro(),
+            'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf"], "contratado": ["nome_completo", "cpf"], "contrato": ["data_inicio"]}',
+            'campos_opcionais': '{"contratante": ["rg", "telefone", "email", "endereco"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "clausulas_especiais"]}'
+        },
+        {
+            'contract_type_id': contract_types[2].id,  # Cuidador de Pets
+            'nome': 'Template Padrão - Cuidador de Pets',
+            'conteudo_template': get_template_cuidador_pets(),
+            'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf", "endereco"], "contratado": ["nome_completo", "cpf"], "contrato": ["data_inicio", "valor", "descricao_servico"]}',
+            'campos_opcionais': '{"contratante": ["rg", "telefone", "email"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "forma_pagamento", "clausulas_especiais"]}'
+        },
+        {
+            'contract_type_id': contract_types[3].id,  # Pintura
+            'nome': 'Template Padrão - Pintura Residencial',
+            'conteudo_template': get_template_pintura(),
+            'campos_obrigatorios': '{"contratante": ["nome_completo", "cpf", "endereco"], "contratado": ["nome_completo", "cpf", "profissao"], "contrato": ["data_inicio", "valor", "descricao_servico"]}',
+            'campos_opcionais': '{"contratante": ["rg", "telefone", "email"], "contratado": ["rg", "telefone", "email", "endereco"], "contrato": ["data_fim", "forma_pagamento", "clausulas_especiais"]}'
+        }
+    ]
+
+    for template_data in templates_data:
+        template = ContractTemplate(**template_data)
+        db.session.add(template)
+
+    db.session.commit()
+
+    return len(contract_types_data), len(templates_data)
+
 def get_template_prestacao_servicos():
     return """
 CONTRATO DE PRESTAÇÃO DE SERVIÇOS
@@ -1,39 +1,174 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy.exc import IntegrityError
 from src.models.user import User, db
+from src.services.user_directory import UserDataError, find_by_cpf, import_users, list_users, user_values
 
 user_bp = Blueprint('user', __name__)
 
+def _not_found():
+    return jsonify({
+        'success': False,
+        'error': 'Usuário não encontrado'
+    }), 404
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    """Lista usuários por páginas (cursor), com busca opcional por prefixo de email ou nome"""
+    try:
+        users, next_cursor = list_users(
+            limit=request.args.get('limit', 50, type=int),
+            cursor=request.args.get('cursor'),
+            email=request.args.get('email'),
+            nome=request.args.get('nome')
+        )
+        return jsonify({
+            'success': True,
+            'data': [user.to_dict() for user in users],
+            'pagination': {
+                'next_cursor': next_cursor
+            }
+        })
+    except UserDataError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
-    
-    data = request.json
-    user = User(username=data['username'], email=data['email'])
-    db.session.add(user)
-    db.session.commit()
-    return jsonify(user.to_dict()), 201
+    """Cadastra um usuário"""
+    try:
+        user = User(**user_values(request.get_json(silent=True)))
+        db.session.add(user)
+        db.session.commit()
+        return jsonify({
+            'success': True,
+            'data': user.to_dict()
+        }), 201
+    except UserDataError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'E-mail ou CPF já cadastrado'
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@user_bp.route('/users/import', methods=['POST'])
+def import_users_route():
+    """Cadastra em lote a lista de usuários do corpo; linhas inválidas ou repetidas voltam em erros"""
+    try:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({
+                'success': False,
+                'error': 'O corpo deve ser uma lista de usuários'
+            }), 400
+        if len(rows) > current_app.config['USER_IMPORT_MAX_ROWS']:
+            return jsonify({
+                'success': False,
+                'error': f"Máximo de {current_app.config['USER_IMPORT_MAX_ROWS']} usuários por envio"
+            }), 413
+
+        created, errors = import_users(rows)
+        return jsonify({
+            'success': True,
+            'data': {
+                'criados': created,
+                'erros': errors
+            }
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@user_bp.route('/users/by-cpf/<cpf>', methods=['GET'])
+def get_user_by_cpf(cpf):
+    """Busca um usuário pelo CPF, com ou sem pontuação"""
+    try:
+        user = find_by_cpf(cpf)
+        if user is None:
+            return _not_found()
+        return jsonify({
+            'success': True,
+            'data': user.to_dict()
+        })
+    except UserDataError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(user.to_dict())
+    """Retorna um usuário"""
+    user = db.session.get(User, user_id)
+    if user is None:
+        return _not_found()
+    return jsonify({
+        'success': True,
+        'data': user.to_dict()
+    })
 
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
-    user = User.query.get_or_404(user_id)
-    data = request.json
-    user.username = data.get('username', user.username)
-    user.email = data.get('email', user.email)
-    db.session.commit()
-    return jsonify(user.to_dict())
+    """Atualiza os campos enviados de um usuário"""
+    try:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return _not_found()
+        for field, value in user_values(request.get_json(silent=True), partial=True).items():
+            setattr(user, field, value)
+        db.session.commit()
+        return jsonify({
+            'success': True,
+            'data': user.to_dict()
+        })
+    except UserDataError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'E-mail ou CPF já cadastrado'
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = db.session.get(User, user_id)
+    if user is None:
+        return _not_found()
     db.session.delete(user)
     db.session.commit()
     return '', 204
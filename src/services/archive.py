@@ -0,0 +1,200 @@
+import json
+import re
+import struct
+import unicodedata
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select
+
+from src.models.user import db, Contract, DigitalSignature
+
+contracts_table = Contract.__table__
+signatures_table = DigitalSignature.__table__
+
+MANIFEST_NAME = 'manifest.jsonl'
+UTF8_FLAG = 0x0800
+DATA_DESCRIPTOR_FLAG = 0x0008
+
+
+class ZipStream:
+    """Gerador de ZIP sequencial: cada método devolve os bytes a enviar.
+
+    Escreve o arquivo sem voltar no fluxo já enviado ao cliente. O diretório
+    central é guardado já empacotado (cerca de 100 bytes por arquivo) e vira
+    ZIP64 quando passa de 65535 arquivos ou de 4 GiB.
+    """
+
+    def __init__(self, compresslevel=6):
+        self.compresslevel = compresslevel
+        self.offset = 0
+        self.count = 0
+        self._central = []
+        self._open = None
+
+    def _local_header(self, name, dos_time, dos_date, flags, crc, csize, usize):
+        return struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, flags, 8, dos_time, dos_date,
+                           crc, csize, usize, len(name), 0) + name
+
+    def _central_record(self, name, dos_time, dos_date, flags, crc, csize, usize, offset):
+        extra = b''
+        if offset > 0xFFFFFFFF:
+            extra = struct.pack('<HHQ', 0x0001, 8, offset)
+            offset = 0xFFFFFFFF
+        self._central.append(struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, 45 if extra else 20, 45 if extra else 20, flags, 8,
+            dos_time, dos_date, crc, csize, usize, len(name), len(extra), 0, 0, 0, 0o100644 << 16, offset
+        ) + name + extra)
+        self.count += 1
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def add(self, name, data, date_time):
+        """Comprime um arquivo inteiro e devolve cabeçalho local + dados"""
+        name = name.encode('utf-8')
+        dos_time, dos_date = _dos_datetime(date_time)
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        crc = zlib.crc32(data)
+        self._central_record(name, dos_time, dos_date, UTF8_FLAG, crc, len(compressed), len(data), self.offset)
+        return self._emit(self._local_header(name, dos_time, dos_date, UTF8_FLAG, crc, len(compressed),
+                                             len(data)) + compressed)
+
+    def start(self, name, date_time):
+        """Inicia um arquivo de tamanho desconhecido; o conteúdo vem por write() e termina com finish()"""
+        name = name.encode('utf-8')
+        dos_time, dos_date = _dos_datetime(date_time)
+        flags = UTF8_FLAG | DATA_DESCRIPTOR_FLAG
+        self._open = {
+            'name': name, 'time': dos_time, 'date': dos_date, 'offset': self.offset, 'crc': 0,
+            'csize': 0, 'usize': 0, 'compressor': zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15),
+        }
+        return self._emit(self._local_header(name, dos_time, dos_date, flags, 0, 0, 0))
+
+    def write(self, data):
+        entry = self._open
+        entry['crc'] = zlib.crc32(data, entry['crc'])
+        entry['usize'] += len(data)
+        compressed = entry['compressor'].compress(data)
+        entry['csize'] += len(compressed)
+        return self._emit(compressed)
+
+    def finish(self):
+        entry, self._open = self._open, None
+        tail = entry['compressor'].flush()
+        entry['csize'] += len(tail)
+        if entry['csize'] > 0xFFFFFFFF or entry['usize'] > 0xFFFFFFFF:
+            raise ValueError('arquivo em streaming maior que 4 GiB')
+        self._central_record(entry['name'], entry['time'], entry['date'], UTF8_FLAG | DATA_DESCRIPTOR_FLAG,
+                             entry['crc'], entry['csize'], entry['usize'], entry['offset'])
+        return self._emit(tail + struct.pack('<IIII', 0x08074b50, entry['crc'], entry['csize'], entry['usize']))
+
+    def close(self):
+        """Diretório central e registros de fim de arquivo, em pedaços"""
+        cd_offset = self.offset
+        central, self._central = self._central, []
+        for start in range(0, len(central), 1000):
+            yield self._emit(b''.join(central[start:start + 1000]))
+        cd_size = self.offset - cd_offset
+        tail = b''
+        if self.count > 0xFFFF or cd_offset > 0xFFFFFFFF or cd_size > 0xFFFFFFFF:
+            tail += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0,
+                                self.count, self.count, cd_size, cd_offset)
+            tail += struct.pack('<IIQI', 0x07064b50, 0, self.offset, 1)
+        tail += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(self.count, 0xFFFF), min(self.count, 0xFFFF),
+                            min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF), 0)
+        yield self._emit(tail)
+
+
+def _dos_datetime(value):
+    value = max(value or datetime.utcnow(), datetime(1980, 1, 1))
+    return ((value.hour << 11) | (value.minute << 5) | (value.second // 2),
+            ((value.year - 1980) << 9) | (value.month << 5) | value.day)
+
+
+def _slug(texto, limite=60):
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii')
+    texto = re.sub(r'[^A-Za-z0-9]+', '-', texto).strip('-').lower()
+    return texto[:limite] or 'contrato'
+
+
+def contract_filename(contract_id, titulo):
+    return f'contratos/{contract_id:08d}-{_slug(titulo)}.txt'
+
+
+def _batches(user_id, columns, batch_size):
+    """Percorre os contratos do usuário em lotes por id (keyset), sem OFFSET"""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns)
+            .where(contracts_table.c.user_id == user_id, contracts_table.c.id > last_id)
+            .order_by(contracts_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def _signatures_by_contract(contract_ids):
+    signatures = {}
+    rows = db.session.execute(
+        select(signatures_table.c.contract_id, signatures_table.c.user_id, signatures_table.c.tipo_assinatura,
+               signatures_table.c.status, signatures_table.c.hash_assinatura,
+               signatures_table.c.timestamp_assinatura)
+        .where(signatures_table.c.contract_id.in_(contract_ids))
+        .order_by(signatures_table.c.id)
+    )
+    for row in rows:
+        signatures.setdefault(row.contract_id, []).append({
+            'user_id': row.user_id,
+            'tipo_assinatura': row.tipo_assinatura,
+            'status': row.status,
+            'hash_assinatura': row.hash_assinatura,
+            'timestamp_assinatura': row.timestamp_assinatura.isoformat() if row.timestamp_assinatura else None,
+        })
+    return signatures
+
+
+def stream_contracts_zip(user_id, batch_size=500, compresslevel=6):
+    """Gera o ZIP com os contratos do usuário em pedaços de bytes.
+
+    Primeira passada: um arquivo por contrato com conteudo_final. Segunda
+    passada: manifest.jsonl com hash_documento e as assinaturas de cada
+    contrato, escrito linha a linha. Só o lote corrente fica em memória,
+    além do diretório central empacotado.
+    """
+    archive = ZipStream(compresslevel)
+    content_columns = (contracts_table.c.id, contracts_table.c.titulo, contracts_table.c.conteudo_final,
+                       contracts_table.c.updated_at)
+    for rows in _batches(user_id, content_columns, batch_size):
+        yield b''.join(
+            archive.add(contract_filename(row.id, row.titulo), row.conteudo_final.encode('utf-8'), row.updated_at)
+            for row in rows if row.conteudo_final is not None
+        )
+
+    manifest_columns = (contracts_table.c.id, contracts_table.c.titulo, contracts_table.c.status,
+                        contracts_table.c.hash_documento, contracts_table.c.conteudo_final.isnot(None).label('gerado'),
+                        contracts_table.c.created_at, contracts_table.c.updated_at)
+    yield archive.start(MANIFEST_NAME, datetime.utcnow())
+    for rows in _batches(user_id, manifest_columns, batch_size):
+        signatures = _signatures_by_contract([row.id for row in rows])
+        lines = []
+        for row in rows:
+            lines.append(json.dumps({
+                'contract_id': row.id,
+                'titulo': row.titulo,
+                'status': row.status,
+                'arquivo': contract_filename(row.id, row.titulo) if row.gerado else None,
+                'hash_documento': row.hash_documento,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+                'assinaturas': signatures.get(row.id, []),
+            }, ensure_ascii=False))
+        yield archive.write(('\n'.join(lines) + '\n').encode('utf-8'))
+    yield archive.finish()
+    yield from archive.close()
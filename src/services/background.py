@@ -0,0 +1,105 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_tasks = []
+_shutdown_hooks = []
+_tasks_lock = threading.Lock()
+_deferred = False
+
+
+class PeriodicTask:
+    """Executa uma função em intervalos fixos numa thread daemon"""
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.func()
+            except Exception:
+                logger.exception('Falha na tarefa periódica %s', self.name)
+
+
+def start_periodic(name, interval, func):
+    """Registra e inicia uma tarefa periódica (só registra se defer_until_fork foi chamado)"""
+    task = PeriodicTask(name, interval, func)
+    with _tasks_lock:
+        _tasks.append(task)
+        deferred = _deferred
+    if not deferred:
+        task.start()
+    return task
+
+
+def defer_until_fork():
+    """Registra as tarefas sem iniciá-las neste processo; restart_after_fork as inicia em cada worker.
+
+    Usado no processo mestre do Gunicorn: com preload ele importa o app, e
+    threads iniciadas ali rodariam uma cópia a mais de cada tarefa e podiam
+    estar com locks adquiridos no momento do fork.
+    """
+    global _deferred
+    with _tasks_lock:
+        _deferred = True
+
+
+def stop_all(timeout=5):
+    """Interrompe todas as tarefas periódicas registradas"""
+    with _tasks_lock:
+        tasks = list(_tasks)
+    for task in tasks:
+        task.stop(timeout)
+
+
+def register_shutdown_hook(func):
+    """Registra uma função chamada no desligamento para esvaziar filas pendentes"""
+    with _tasks_lock:
+        _shutdown_hooks.append(func)
+
+
+def restart_after_fork():
+    """Inicia as threads das tarefas periódicas num processo filho.
+
+    Threads não sobrevivem ao fork: as tarefas registradas no processo
+    mestre (preload) são iniciadas em cada worker, e as registradas daqui em
+    diante já iniciam normalmente.
+    """
+    global _deferred
+    with _tasks_lock:
+        _deferred = False
+        tasks = list(_tasks)
+    for task in tasks:
+        task._thread = None
+        task._stop = threading.Event()
+        task.start()
+
+
+def shutdown(timeout=5):
+    """Para as tarefas periódicas e esvazia as filas registradas"""
+    stop_all(timeout)
+    with _tasks_lock:
+        hooks = list(_shutdown_hooks)
+    for hook in hooks:
+        try:
+            hook()
+        except Exception:
+            logger.exception('Falha ao esvaziar fila no desligamento')
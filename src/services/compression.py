@@ -0,0 +1,64 @@
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+API_BLUEPRINTS = ('contracts', 'govbr', 'seed', 'user')
+
+_SKIP_STATUS = (204, 206, 304)
+
+
+def _encoding_for(req):
+    if brotli is not None and req.accept_encodings['br']:
+        return 'br'
+    if req.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    """Comprime respostas JSON grandes dos blueprints da API"""
+    config = current_app.config
+    if not config['COMPRESS_ENABLED'] or request.blueprint not in config['COMPRESS_BLUEPRINTS']:
+        return response
+    # Respostas em streaming ou já codificadas passam intactas
+    if response.direct_passthrough or response.is_streamed:
+        return response
+    if response.status_code < 200 or response.status_code in _SKIP_STATUS:
+        return response
+    if 'Content-Encoding' in response.headers or response.mimetype not in config['COMPRESS_MIMETYPES']:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding_for(request)
+    if encoding is None or response.calculate_content_length() < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    data = response.get_data()
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=config['COMPRESS_BR_QUALITY'])
+    else:
+        compressed = gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    # A representação comprimida não é byte a byte igual: o ETag forte vira fraco
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Registra a compressão das respostas da API"""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+    app.config.setdefault('COMPRESS_MIMETYPES', ('application/json', 'text/plain', 'text/csv'))
+    app.config.setdefault('COMPRESS_BLUEPRINTS', API_BLUEPRINTS)
+    app.after_request(compress_response)
@@ -0,0 +1,190 @@
+import functools
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db, IdempotencyKey
+from src.services.background import start_periodic
+from src.services.sessions import client_identity
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Respostas transitórias não ficam gravadas: a próxima tentativa executa de novo
+TRANSIENT_STATUS = {401, 403, 408, 409, 425, 429}
+
+
+def request_fingerprint(identity):
+    """Hash de quem faz a requisição, do método, caminho, query string e corpo"""
+    digest = hashlib.sha256()
+    for part in (identity, request.method, request.path, request.query_string.decode('latin-1')):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _load(rota, chave):
+    # Encerra a transação corrente para enxergar o que outros workers gravaram
+    db.session.rollback()
+    return db.session.execute(
+        select(IdempotencyKey).where(IdempotencyKey.rota == rota, IdempotencyKey.chave == chave)
+    ).scalar_one_or_none()
+
+
+def _claim(rota, chave, fingerprint):
+    """Tenta reservar a chave; devolve None se outra requisição já a reservou"""
+    agora = datetime.utcnow()
+    record = IdempotencyKey(
+        rota=rota,
+        chave=chave,
+        fingerprint=fingerprint,
+        status='processando',
+        created_at=agora,
+        expires_at=agora + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+    )
+    db.session.add(record)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return record.id
+
+
+def _take_over(record, fingerprint):
+    """Assume uma chave expirada ou abandonada por um worker que caiu no meio do processamento"""
+    agora = datetime.utcnow()
+    result = db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == record.id, IdempotencyKey.created_at == record.created_at)
+        .values(fingerprint=fingerprint, status='processando', status_code=None,
+                corpo_resposta=None, mimetype=None, created_at=agora,
+                expires_at=agora + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL']))
+    )
+    db.session.commit()
+    return record.id if result.rowcount == 1 else None
+
+
+def _replay(record):
+    response = current_app.response_class(record.corpo_resposta, status=record.status_code,
+                                          mimetype=record.mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _conflict(message, status, retry_after=None):
+    response = jsonify({'success': False, 'error': message})
+    response.status_code = status
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _finish(record_id, response):
+    """Grava a resposta final, ou libera a chave se a resposta for transitória"""
+    db.session.rollback()
+    status = response.status_code
+    if response.is_streamed or status >= 500 or status in TRANSIENT_STATUS:
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
+    else:
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record_id)
+            .values(status='concluido', status_code=status,
+                    corpo_resposta=response.get_data(as_text=True), mimetype=response.mimetype)
+        )
+    db.session.commit()
+
+
+def _release(record_id):
+    db.session.rollback()
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
+    db.session.commit()
+
+
+def idempotent(view):
+    """Suporte ao cabeçalho Idempotency-Key.
+
+    A primeira requisição com uma chave reserva o registro e executa a rota;
+    repetições com o mesmo corpo recebem a resposta gravada e duplicatas
+    simultâneas aguardam a primeira terminar em vez de executar em paralelo.
+    As chaves valem por cliente (client_identity): a mesma chave enviada por
+    outro usuário não enxerga a resposta gravada. Rotas autenticadas devem
+    verificar a sessão antes deste decorador, para não devolver uma resposta
+    gravada a quem não está autenticado.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        chave = request.headers.get(HEADER)
+        if not chave or not current_app.config['IDEMPOTENCY_ENABLED']:
+            return view(*args, **kwargs)
+        if len(chave) > MAX_KEY_LENGTH:
+            return _conflict(f'{HEADER} deve ter no máximo {MAX_KEY_LENGTH} caracteres', 400)
+
+        identity = client_identity()
+        rota = f"{view.__name__}:{hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]}"
+        fingerprint = request_fingerprint(identity)
+        deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT_TIMEOUT']
+        lock_timeout = timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+        interval = 0.05
+        while True:
+            record_id = _claim(rota, chave, fingerprint)
+            if record_id is not None:
+                break
+            record = _load(rota, chave)
+            if record is None:
+                continue
+            agora = datetime.utcnow()
+            if record.expires_at <= agora or (record.status == 'processando' and record.created_at + lock_timeout <= agora):
+                record_id = _take_over(record, fingerprint)
+                if record_id is not None:
+                    logger.warning('Chave de idempotência %s/%s reassumida', rota, chave)
+                    break
+                continue
+            if record.fingerprint != fingerprint:
+                return _conflict(f'{HEADER} já utilizada com outra requisição', 422)
+            if record.status == 'concluido':
+                return _replay(record)
+            if time.monotonic() >= deadline:
+                return _conflict('Requisição com esta chave ainda em processamento', 409, retry_after=1)
+            time.sleep(interval)
+            interval = min(interval * 2, 0.5)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except BaseException:
+            _release(record_id)
+            raise
+        _finish(record_id, response)
+        return response
+
+    return wrapper
+
+
+def sweep_expired(app):
+    """Remove as chaves cujo prazo de retenção já passou"""
+    with app.app_context():
+        result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow()))
+        db.session.commit()
+        return result.rowcount
+
+
+def init_idempotency(app):
+    """Configura a retenção das chaves de idempotência e a limpeza periódica"""
+    app.config.setdefault('IDEMPOTENCY_ENABLED', True)
+    app.config.setdefault('IDEMPOTENCY_TTL', 24 * 3600)
+    app.config.setdefault('IDEMPOTENCY_WAIT_TIMEOUT', 30)
+    app.config.setdefault('IDEMPOTENCY_LOCK_TIMEOUT', 120)
+    app.config.setdefault('IDEMPOTENCY_SWEEP_INTERVAL', 600)
+    if app.config['IDEMPOTENCY_ENABLED'] and app.config['IDEMPOTENCY_SWEEP_INTERVAL']:
+        start_periodic('idempotency-sweeper', app.config['IDEMPOTENCY_SWEEP_INTERVAL'],
+                       lambda: sweep_expired(app))
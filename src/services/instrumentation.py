@@ -0,0 +1,138 @@
+import logging
+import time
+from collections import Counter
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_enabled = False
+_settings = {'slow_query_ms': 100, 'repeated_query_threshold': 10}
+
+# Ordem das métricas no cabeçalho Server-Timing
+CATEGORIES = ('db', 'render', 'hash', 'json', 'http')
+
+
+class RequestMetrics:
+    """Contadores e tempos acumulados de uma requisição"""
+
+    __slots__ = ('started', 'timings', 'query_count', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = dict.fromkeys(CATEGORIES, 0.0)
+        self.query_count = 0
+        self.statements = Counter()
+
+    def server_timing(self):
+        total = (time.perf_counter() - self.started) * 1000
+        parts = [f'app;dur={total:.2f}']
+        for category in CATEGORIES:
+            duration = self.timings[category]
+            if category == 'db':
+                parts.append(f'db;dur={duration * 1000:.2f};desc="{self.query_count} queries"')
+            elif duration:
+                parts.append(f'{category};dur={duration * 1000:.2f}')
+        return ', '.join(parts)
+
+
+def current_metrics():
+    """Retorna as métricas da requisição atual ou None fora de uma requisição instrumentada"""
+    if not _enabled or not has_request_context():
+        return None
+    return g.get('_request_metrics')
+
+
+class _Timer:
+    __slots__ = ('category', 'started')
+
+    def __init__(self, category):
+        self.category = category
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.timings[self.category] += time.perf_counter() - self.started
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(category):
+    """Context manager que acumula o tempo do bloco na categoria da requisição atual"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(category)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['_query_started']
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.timings['db'] += elapsed
+        metrics.query_count += 1
+        metrics.statements[statement] += 1
+    if elapsed * 1000 >= _settings['slow_query_ms']:
+        logger.warning('Query lenta (%.1f ms): %s', elapsed * 1000, statement)
+
+
+def _start_request():
+    g._request_metrics = RequestMetrics()
+
+
+def _finish_request(response):
+    metrics = g.pop('_request_metrics', None)
+    if metrics is None:
+        return response
+
+    response.headers['Server-Timing'] = metrics.server_timing()
+
+    # Mesma query repetida muitas vezes na requisição: provável N+1
+    threshold = _settings['repeated_query_threshold']
+    for statement, count in metrics.statements.items():
+        if count >= threshold:
+            logger.warning('Possível N+1: query executada %d vezes na requisição: %s', count, statement)
+    return response
+
+
+def init_instrumentation(app):
+    """Ativa a instrumentação por requisição se INSTRUMENTATION_ENABLED estiver ligado.
+
+    Desligada, nenhum hook é registrado e timed() devolve um context manager vazio.
+    """
+    global _enabled
+    app.config.setdefault('INSTRUMENTATION_ENABLED', False)
+    app.config.setdefault('INSTRUMENTATION_SLOW_QUERY_MS', 100)
+    app.config.setdefault('INSTRUMENTATION_REPEATED_QUERY_THRESHOLD', 10)
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+
+    _settings['slow_query_ms'] = app.config['INSTRUMENTATION_SLOW_QUERY_MS']
+    _settings['repeated_query_threshold'] = app.config['INSTRUMENTATION_REPEATED_QUERY_THRESHOLD']
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    _enabled = True
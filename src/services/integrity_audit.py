@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from src.models.user import db, Contract, DigitalSignature
+
+audit_cli = AppGroup('audit', help='Auditorias de integridade dos documentos')
+
+
+def _lower_priority():
+    """Reduz a prioridade das threads de hash para não competir com o tráfego (no Linux vale por thread)"""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+def _hash_chunk(rows):
+    """Recalcula o SHA-256 do conteúdo final de cada contrato.
+
+    Roda em threads: o hashlib solta o GIL em documentos acima de 2 KB e o
+    conteúdo não precisa ser serializado e enviado a outro processo.
+    """
+    return [
+        (contract_id, hashlib.sha256(conteudo.encode('utf-8')).hexdigest() if conteudo is not None else None)
+        for contract_id, conteudo in rows
+    ]
+
+
+def _load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'last_id': 0, 'checked': 0, 'mismatches': 0}
+
+
+def _save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _signature_hashes(contract_ids):
+    """Retorna os hashes de documento referenciados nas assinaturas de cada contrato"""
+    rows = db.session.execute(
+        select(DigitalSignature.id, DigitalSignature.contract_id, DigitalSignature.certificado_info)
+        .where(DigitalSignature.contract_id.in_(contract_ids))
+    ).all()
+    result = {}
+    for signature_id, contract_id, certificado_info in rows:
+        info = json.loads(certificado_info) if certificado_info else {}
+        if info.get('hash_documento'):
+            result.setdefault(contract_id, []).append((signature_id, info['hash_documento']))
+    return result
+
+
+def _check_batch(rows, hashes, signatures):
+    """Compara os hashes recalculados e os das assinaturas com o armazenado"""
+    problems = []
+    for contract_id, conteudo, hash_armazenado in rows:
+        hash_calculado = hashes[contract_id]
+        if conteudo is None and hash_armazenado:
+            problems.append({'contract_id': contract_id, 'tipo': 'conteudo_ausente',
+                             'hash_armazenado': hash_armazenado})
+        elif conteudo is not None and not hash_armazenado:
+            problems.append({'contract_id': contract_id, 'tipo': 'hash_ausente',
+                             'hash_calculado': hash_calculado})
+        elif hash_calculado != hash_armazenado:
+            problems.append({'contract_id': contract_id, 'tipo': 'hash_divergente',
+                             'hash_armazenado': hash_armazenado, 'hash_calculado': hash_calculado})
+
+        for signature_id, hash_assinado in signatures.get(contract_id, []):
+            if hash_assinado != hash_armazenado:
+                problems.append({'contract_id': contract_id, 'tipo': 'assinatura_divergente',
+                                 'signature_id': signature_id, 'hash_armazenado': hash_armazenado,
+                                 'hash_assinado': hash_assinado})
+    return problems
+
+
+def run_integrity_audit(report_path, checkpoint_path=None, batch_size=1000, workers=None,
+                        max_rows_per_second=None, restart=False, log=print):
+    """Percorre os contratos em lotes e grava as divergências encontradas.
+
+    O progresso é salvo em checkpoint_path após cada lote, de modo que uma
+    execução interrompida continua de onde parou.
+    """
+    if restart and checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = _load_checkpoint(checkpoint_path)
+    resuming = checkpoint['last_id'] > 0
+    workers = workers or os.cpu_count() or 1
+
+    started = time.monotonic()
+    checked_this_run = 0
+    with ThreadPoolExecutor(max_workers=workers, initializer=_lower_priority) as pool, \
+            open(report_path, 'a' if resuming else 'w') as report:
+        while True:
+            rows = db.session.execute(
+                select(Contract.id, Contract.conteudo_final, Contract.hash_documento)
+                .where(Contract.id > checkpoint['last_id'])
+                .order_by(Contract.id)
+                .limit(batch_size)
+            ).all()
+            # Com sharding cada shard devolve até batch_size linhas: reordena para o keyset continuar válido
+            rows = sorted(rows, key=lambda row: row[0])[:batch_size]
+            if not rows:
+                break
+
+            chunk_size = max(1, len(rows) // workers)
+            chunks = [
+                [(row[0], row[1]) for row in rows[i:i + chunk_size]]
+                for i in range(0, len(rows), chunk_size)
+            ]
+            hashes = {}
+            for result in pool.map(_hash_chunk, chunks):
+                hashes.update(result)
+
+            signatures = _signature_hashes([row[0] for row in rows])
+            # Encerra a transação de leitura entre lotes
+            db.session.rollback()
+
+            problems = _check_batch(rows, hashes, signatures)
+            for problem in problems:
+                report.write(json.dumps(problem) + '\n')
+            report.flush()
+
+            checkpoint['last_id'] = rows[-1][0]
+            checkpoint['checked'] += len(rows)
+            checkpoint['mismatches'] += len(problems)
+            _save_checkpoint(checkpoint_path, checkpoint)
+            checked_this_run += len(rows)
+            log(f"Auditados {checkpoint['checked']} contratos (último id {checkpoint['last_id']}), "
+                f"{checkpoint['mismatches']} divergências")
+
+            # Limita a vazão para não disputar o banco com o tráfego de produção
+            if max_rows_per_second:
+                expected = checked_this_run / max_rows_per_second
+                elapsed = time.monotonic() - started
+                if expected > elapsed:
+                    time.sleep(expected - elapsed)
+
+    return checkpoint
+
+
+@audit_cli.command('integrity')
+@click.option('--report', 'report_path', default='integrity_report.jsonl', show_default=True,
+              help='Arquivo JSONL com as divergências encontradas')
+@click.option('--checkpoint', 'checkpoint_path', default='integrity_checkpoint.json', show_default=True,
+              help='Arquivo de checkpoint para retomar a auditoria')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--workers', type=int, default=None, help='Threads de hash (padrão: núcleos da CPU)')
+@click.option('--max-rate', type=float, default=None, help='Máximo de contratos auditados por segundo')
+@click.option('--restart', is_flag=True, help='Ignora o checkpoint e recomeça do início')
+def integrity_command(report_path, checkpoint_path, batch_size, workers, max_rate, restart):
+    """Recalcula o hash dos contratos e confere as assinaturas"""
+    checkpoint = run_integrity_audit(
+        report_path, checkpoint_path, batch_size=batch_size, workers=workers,
+        max_rows_per_second=max_rate, restart=restart, log=click.echo
+    )
+    click.echo(f"Auditoria concluída: {checkpoint['checked']} contratos, "
+               f"{checkpoint['mismatches']} divergências")
@@ -0,0 +1,382 @@
+import atexit
+import bisect
+import contextlib
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import Response, g, request
+
+from src.services.background import register_shutdown_hook, start_periodic
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Soma dos contadores e histogramas de processos que já terminaram
+RETIRED_FILE = 'retired.json'
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Gauge calculado por uma função no momento da coleta"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._callbacks = []
+
+    def set_function(self, func, **labels):
+        self._callbacks.append((self._key(labels), func))
+
+    def snapshot(self):
+        values = []
+        for key, func in self._callbacks:
+            try:
+                values.append([list(key), float(func())])
+            except Exception:
+                continue
+        return values
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+
+class Registry:
+    """Conjunto de métricas do processo, com agregação entre processos via arquivos.
+
+    Cada processo grava metrics_<pid>_<id aleatório>.json; ao terminar (ou,
+    se morreu sem avisar, na próxima coleta) o arquivo é somado a
+    retired.json e apagado, para o diretório não crescer com os workers
+    reciclados e o pid reutilizado não herdar o arquivo de outro processo.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.multiprocess_dir = None
+        self._file_pid = None
+        self._file_path = None
+        self._retired = False
+
+    def _register(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def snapshot(self):
+        return {
+            'pid': os.getpid(),
+            'metrics': {name: metric.snapshot() for name, metric in self.metrics.items()}
+        }
+
+    def _process_path(self):
+        # Recalculado após o fork: cada processo tem o próprio arquivo
+        if self._file_pid != os.getpid():
+            self._file_pid = os.getpid()
+            name = f'metrics_{self._file_pid}_{uuid.uuid4().hex[:12]}.json'
+            self._file_path = os.path.join(self.multiprocess_dir, name)
+            self._retired = False
+        return self._file_path
+
+    @contextlib.contextmanager
+    def _directory_lock(self, exclusive):
+        with open(os.path.join(self.multiprocess_dir, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, data):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """Grava o snapshot deste processo no diretório compartilhado"""
+        if not self.multiprocess_dir:
+            return
+        path = self._process_path()
+        if self._retired:
+            return
+        self._write(path, self.snapshot())
+
+    def _retire_files(self, paths):
+        """Soma os contadores e histogramas dos arquivos a retired.json e apaga os arquivos"""
+        with self._directory_lock(exclusive=True):
+            retired_path = os.path.join(self.multiprocess_dir, RETIRED_FILE)
+            sources = [(self._read(retired_path) or {'metrics': {}}, False)]
+            for path in paths:
+                data = self._read(path)
+                if data is not None:
+                    sources.append((data, False))
+            merged = self._merge(sources)
+            self._write(retired_path, {
+                'pid': None,
+                'metrics': {name: [[list(key), value] for key, value in values.items()]
+                            for name, values in merged.items()}
+            })
+            for path in paths:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+
+    def retire(self):
+        """Ao encerrar o processo: soma o snapshot final a retired.json e apaga o arquivo do processo"""
+        if not self.multiprocess_dir:
+            return
+        path = self._process_path()
+        if self._retired:
+            return
+        self.flush()
+        self._retire_files([path])
+        self._retired = True
+
+    def collect_dead(self):
+        """Aposenta os arquivos de processos que terminaram sem chamar retire (kill -9, OOM)"""
+        if not self.multiprocess_dir:
+            return 0
+        own = self._process_path()
+        dead = []
+        for path in glob.glob(os.path.join(self.multiprocess_dir, 'metrics_*.json')):
+            if path == own:
+                continue
+            data = self._read(path)
+            if data is not None and not _pid_alive(data['pid']):
+                dead.append(path)
+        if dead:
+            self._retire_files(dead)
+        return len(dead)
+
+    def _snapshots(self):
+        own = self.snapshot()
+        if not self.multiprocess_dir:
+            return [(own, True)]
+        self.collect_dead()
+        snapshots = [(own, True)]
+        own_path = self._process_path()
+        with self._directory_lock(exclusive=False):
+            retired = self._read(os.path.join(self.multiprocess_dir, RETIRED_FILE))
+            if retired is not None:
+                snapshots.append((retired, False))
+            for path in glob.glob(os.path.join(self.multiprocess_dir, 'metrics_*.json')):
+                if path == own_path:
+                    continue
+                data = self._read(path)
+                if data is None or data['pid'] == own['pid']:
+                    continue
+                snapshots.append((data, _pid_alive(data['pid'])))
+        return snapshots
+
+    def _merge(self, snapshots):
+        """Soma os valores por métrica e rótulos: {nome: {rótulos: valor}}"""
+        merged = {name: {} for name in self.metrics}
+        for data, alive in snapshots:
+            for name, values in data['metrics'].items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                # Gauges de processos que já terminaram não valem mais
+                if metric.type_name == 'gauge' and not alive:
+                    continue
+                target = merged[name]
+                for labels, value in values:
+                    key = tuple(labels)
+                    if metric.type_name == 'histogram':
+                        counts, total = value
+                        entry = target.setdefault(key, [[0] * len(counts), 0.0])
+                        entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                        entry[1] += total
+                    else:
+                        target[key] = target.get(key, 0) + value
+        return merged
+
+    def render(self):
+        """Gera o texto no formato de exposição do Prometheus agregando todos os processos"""
+        merged = self._merge(self._snapshots())
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.type_name}')
+            for key, value in sorted(merged[name].items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.type_name == 'histogram':
+                    counts, total = value
+                    cumulative = 0
+                    for bound, count in zip(list(metric.buckets) + ['+Inf'], counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels + [("le", bound)])} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {total}')
+                    lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+
+http_requests_total = registry.counter(
+    'http_requests_total', 'Requisições HTTP por rota e status',
+    ('blueprint', 'route', 'method', 'status')
+)
+http_request_duration_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Latência das requisições HTTP por rota',
+    ('blueprint', 'route', 'method')
+)
+cache_requests_total = registry.counter(
+    'cache_requests_total', 'Consultas a caches por resultado (hit/miss)', ('cache', 'result')
+)
+background_queue_depth = registry.gauge(
+    'background_queue_depth', 'Itens aguardando em filas de segundo plano', ('queue',)
+)
+db_pool_connections = registry.gauge(
+    'db_pool_connections', 'Conexões do pool do SQLAlchemy por estado', ('state',)
+)
+
+
+def record_cache(cache, hit):
+    """Registra um acerto ou falta num cache"""
+    cache_requests_total.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def register_queue(name, depth_func):
+    """Expõe a profundidade de uma fila de segundo plano"""
+    background_queue_depth.set_function(depth_func, queue=name)
+
+
+def _start_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is None:
+        return response
+    blueprint = request.blueprint or 'app'
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    http_request_duration_seconds.observe(
+        time.perf_counter() - started, blueprint=blueprint, route=route, method=request.method
+    )
+    http_requests_total.inc(blueprint=blueprint, route=route, method=request.method,
+                            status=response.status_code)
+    return response
+
+
+def _record_exception(exc):
+    # after_request não roda quando a view levanta exceção não tratada
+    if exc is not None and '_metrics_started' in g:
+        _record_request(Response(status=500))
+
+
+def init_metrics(app, db):
+    """Registra a coleta de métricas por rota e os gauges do pool de conexões"""
+    app.config.setdefault('METRICS_MULTIPROC_DIR', None)
+    app.config.setdefault('METRICS_FLUSH_INTERVAL', 1.0)
+
+    def pool_stat(attr):
+        def read():
+            with app.app_context():
+                return getattr(db.engine.pool, attr)()
+        return read
+
+    for state, attr in (('checked_out', 'checkedout'), ('idle', 'checkedin'),
+                        ('overflow', 'overflow'), ('size', 'size')):
+        db_pool_connections.set_function(pool_stat(attr), state=state)
+
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.teardown_request(_record_exception)
+
+    directory = app.config['METRICS_MULTIPROC_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        registry.multiprocess_dir = directory
+        # Arquivos deixados por uma execução anterior ou por workers que morreram
+        registry.collect_dead()
+        start_periodic('metrics-flush', app.config['METRICS_FLUSH_INTERVAL'], registry.flush)
+        atexit.register(registry.retire)
+        register_shutdown_hook(registry.retire)
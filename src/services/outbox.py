@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+from sqlalchemy import bindparam, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from src.models.user import db, Contract, DigitalSignature, OutboxEvent
+from src.services.background import register_shutdown_hook, start_periodic
+from src.services.metrics import register_queue
+from src.services.sharding import bind_arguments_for, shard_bind_arguments
+
+logger = logging.getLogger(__name__)
+
+outbox = OutboxEvent.__table__
+
+# Mudanças de status do contrato que viram eventos para os parceiros
+CONTRACT_EVENTS = {'gerado': 'contrato.gerado', 'assinado': 'contrato.assinado'}
+
+
+def _contract_event(contract):
+    return {
+        'contract_id': contract.id,
+        'user_id': contract.user_id,
+        'status': contract.status,
+        'hash_documento': contract.hash_documento,
+    }
+
+
+def _signature_event(signature):
+    return {
+        'contract_id': signature.contract_id,
+        'user_id': signature.user_id,
+        'status': 'assinado',
+        'tipo_assinatura': signature.tipo_assinatura,
+        'hash_assinatura': signature.hash_assinatura,
+        'timestamp_assinatura': signature.timestamp_assinatura.isoformat() if signature.timestamp_assinatura else None,
+    }
+
+
+@event.listens_for(Contract.status, 'set', active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    # active_history carrega o status anterior mesmo com o atributo expirado, para que
+    # regravar o mesmo status não conte como mudança
+    return value
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_outbox_events(session, flush_context):
+    """Grava os eventos na mesma transação que a mudança de status que os originou"""
+    if not has_app_context():
+        return
+    destinos = current_app.config.get('OUTBOX_WEBHOOKS')
+    if not destinos:
+        return
+
+    eventos = []
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Contract) and obj.status in CONTRACT_EVENTS:
+            if obj in session.new or inspect(obj).attrs.status.history.has_changes():
+                eventos.append((obj, CONTRACT_EVENTS[obj.status], obj.id, _contract_event(obj)))
+        elif isinstance(obj, DigitalSignature) and obj in session.new and obj.status == 'assinado':
+            eventos.append((obj, 'contrato.assinado', obj.contract_id, _signature_event(obj)))
+    if not eventos:
+        return
+
+    agora = datetime.utcnow()
+    # Com sharding cada evento fica no shard do seu contrato, na mesma transação
+    rows_by_shard = {}
+    for obj, tipo, contract_id, dados in eventos:
+        dados['ocorrido_em'] = agora.isoformat()
+        payload = json.dumps(dict(dados, evento_id=uuid.uuid4().hex, tipo=tipo))
+        bind_arguments = bind_arguments_for(session, obj)
+        rows = rows_by_shard.setdefault(bind_arguments.get('shard_id'), (bind_arguments, []))[1]
+        for destino in destinos:
+            rows.append({
+                'destino': destino, 'tipo': tipo, 'contract_id': contract_id, 'payload': payload,
+                'status': 'pendente', 'tentativas': 0, 'proxima_tentativa_em': agora, 'created_at': agora,
+            })
+    for bind_arguments, rows in rows_by_shard.values():
+        session.connection(bind_arguments=bind_arguments).execute(insert(outbox), rows)
+
+
+class OutboxDispatcher:
+    """Entrega os eventos pendentes em lotes por destino, com concorrência limitada e backoff"""
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config['OUTBOX_BATCH_SIZE']
+        self.concurrency = app.config['OUTBOX_CONCURRENCY']
+        self.max_attempts = app.config['OUTBOX_MAX_ATTEMPTS']
+        self.backoff = app.config['OUTBOX_BACKOFF']
+        self.max_backoff = app.config['OUTBOX_MAX_BACKOFF']
+        self.timeout = app.config['OUTBOX_TIMEOUT']
+        self.depth = 0
+        self._pid = None
+        self._executor = None
+        self._http = None
+
+    def _resources(self):
+        # Threads e conexões não sobrevivem ao fork: recria por processo
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='outbox')
+            self._http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+            self._http.mount('http://', adapter)
+            self._http.mount('https://', adapter)
+            self._pid = os.getpid()
+        return self._executor, self._http
+
+    def _claim(self, limit, bind_arguments):
+        """Reserva até `limit` eventos vencidos; outro processo não os pega antes do fim do prazo"""
+        agora = datetime.utcnow()
+        lote = uuid.uuid4().hex
+        due = (
+            select(outbox.c.id)
+            .where(outbox.c.status == 'pendente', outbox.c.proxima_tentativa_em <= agora)
+            .order_by(outbox.c.id)
+            .limit(limit)
+        )
+        db.session.execute(
+            update(outbox)
+            .where(outbox.c.id.in_(due), outbox.c.status == 'pendente', outbox.c.proxima_tentativa_em <= agora)
+            .values(lote=lote, proxima_tentativa_em=agora + timedelta(seconds=self.timeout * 3)),
+            bind_arguments=bind_arguments
+        )
+        db.session.commit()
+        return db.session.execute(
+            select(outbox.c.id, outbox.c.destino, outbox.c.payload, outbox.c.tentativas)
+            .where(outbox.c.lote == lote)
+            .order_by(outbox.c.id),
+            bind_arguments=bind_arguments
+        ).all()
+
+    def _deliver(self, http, destino, rows):
+        body = '{"eventos":[' + ','.join(row.payload for row in rows) + ']}'
+        try:
+            response = http.post(destino, data=body.encode('utf-8'), timeout=self.timeout,
+                                 headers={'Content-Type': 'application/json'})
+            if 200 <= response.status_code < 300:
+                return rows, None
+            return rows, f'HTTP {response.status_code}'
+        except requests.RequestException as e:
+            return rows, str(e)[:500]
+
+    def _record(self, results, bind_arguments):
+        agora = datetime.utcnow()
+        delivered, failed = [], []
+        for rows, erro in results:
+            if erro is None:
+                delivered.extend({'b_id': row.id} for row in rows)
+                continue
+            logger.warning('Falha ao entregar %d eventos: %s', len(rows), erro)
+            for row in rows:
+                tentativas = row.tentativas + 1
+                espera = min(self.backoff * 2 ** (tentativas - 1), self.max_backoff) * random.uniform(0.8, 1.2)
+                failed.append({
+                    'b_id': row.id,
+                    'b_tentativas': tentativas,
+                    'b_status': 'falhou' if tentativas >= self.max_attempts else 'pendente',
+                    'b_proxima': agora + timedelta(seconds=espera),
+                    'b_erro': erro,
+                })
+        if delivered:
+            db.session.execute(
+                update(outbox).where(outbox.c.id == bindparam('b_id')).values(
+                    status='entregue', tentativas=outbox.c.tentativas + 1, entregue_em=agora,
+                    lote=None, ultimo_erro=None),
+                delivered, bind_arguments=bind_arguments
+            )
+        if failed:
+            db.session.execute(
+                update(outbox).where(outbox.c.id == bindparam('b_id')).values(
+                    status=bindparam('b_status'), tentativas=bindparam('b_tentativas'),
+                    proxima_tentativa_em=bindparam('b_proxima'), ultimo_erro=bindparam('b_erro'), lote=None),
+                failed, bind_arguments=bind_arguments
+            )
+        db.session.commit()
+        return len(delivered)
+
+    def run_once(self):
+        """Entrega tudo o que estiver vencido; devolve a quantidade de eventos entregues"""
+        executor, http = self._resources()
+        limit = self.batch_size * self.concurrency
+        delivered = 0
+        with self.app.app_context():
+            # Os ids de outbox_events são locais a cada shard: reserva e registra shard a shard
+            depth = 0
+            for bind_arguments in shard_bind_arguments(db.session):
+                while True:
+                    rows = self._claim(limit, bind_arguments)
+                    by_destino = {}
+                    for row in rows:
+                        by_destino.setdefault(row.destino, []).append(row)
+                    futures = [
+                        executor.submit(self._deliver, http, destino, group[i:i + self.batch_size])
+                        for destino, group in by_destino.items()
+                        for i in range(0, len(group), self.batch_size)
+                    ]
+                    delivered += self._record([future.result() for future in futures], bind_arguments)
+                    if len(rows) < limit:
+                        break
+                depth += db.session.execute(
+                    select(func.count()).select_from(outbox).where(outbox.c.status == 'pendente'),
+                    bind_arguments=bind_arguments
+                ).scalar()
+            self.depth = depth
+        return delivered
+
+    def close(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._http.close()
+        self._pid = None
+
+
+def init_outbox(app):
+    """Configura os destinos dos webhooks e inicia o despachante em segundo plano"""
+    app.config.setdefault('OUTBOX_WEBHOOKS', [])
+    app.config.setdefault('OUTBOX_INTERVAL', 1.0)
+    app.config.setdefault('OUTBOX_BATCH_SIZE', 100)
+    app.config.setdefault('OUTBOX_CONCURRENCY', 4)
+    app.config.setdefault('OUTBOX_MAX_ATTEMPTS', 8)
+    app.config.setdefault('OUTBOX_BACKOFF', 2.0)
+    app.config.setdefault('OUTBOX_MAX_BACKOFF', 600.0)
+    app.config.setdefault('OUTBOX_TIMEOUT', 5.0)
+    if not app.config['OUTBOX_WEBHOOKS']:
+        return None
+
+    dispatcher = OutboxDispatcher(app)
+    register_queue('outbox', lambda: dispatcher.depth)
+    if app.config['OUTBOX_INTERVAL']:
+        start_periodic('outbox-dispatcher', app.config['OUTBOX_INTERVAL'], dispatcher.run_once)
+    register_shutdown_hook(dispatcher.close)
+    app.extensions['outbox'] = dispatcher
+    return dispatcher
@@ -0,0 +1,309 @@
+import fcntl
+import logging
+import os
+import threading
+import unicodedata
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.services.background import register_shutdown_hook
+from src.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Página A4 em pontos, margens de 2 cm
+PAGE_WIDTH, PAGE_HEIGHT = 595.28, 841.89
+MARGIN = 56.7
+FONT_SIZE, LEADING = 11, 15
+TITLE_SIZE, TITLE_LEADING = 14, 19
+FOOTER_SIZE = 8
+
+# Larguras da Helvetica (AFM padrão, milésimos do corpo) para os caracteres ASCII imprimíveis
+_ASCII_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+WIDTHS = {chr(32 + i): width for i, width in enumerate(_ASCII_WIDTHS)}
+
+
+def _char_width(char):
+    width = WIDTHS.get(char)
+    if width is None:
+        # Letras acentuadas têm a largura da letra base
+        base = unicodedata.normalize('NFD', char)[:1]
+        width = WIDTHS.get(base, 556)
+        WIDTHS[char] = width
+    return width
+
+
+def text_width(text, size):
+    return sum(_char_width(char) for char in text) * size / 1000
+
+
+def wrap(text, size, max_width):
+    """Quebra um parágrafo em linhas que cabem em max_width; palavras maiores que a linha são cortadas"""
+    lines = []
+    line, line_width = '', 0.0
+    space = _char_width(' ') * size / 1000
+    for word in text.split(' '):
+        word_width = text_width(word, size)
+        while word_width > max_width:
+            if line:
+                lines.append(line)
+                line, line_width = '', 0.0
+            cut = len(word)
+            while cut > 1 and text_width(word[:cut], size) > max_width:
+                cut -= 1
+            lines.append(word[:cut])
+            word = word[cut:]
+            word_width = text_width(word, size)
+        if line and line_width + space + word_width > max_width:
+            lines.append(line)
+            line, line_width = word, word_width
+        elif line:
+            line, line_width = f'{line} {word}', line_width + space + word_width
+        else:
+            line, line_width = word, word_width
+    lines.append(line)
+    return lines
+
+
+def _pdf_string(text):
+    raw = text.encode('cp1252', errors='replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'') + b')'
+
+
+def _layout(texto, titulo):
+    """Distribui título e linhas em páginas: lista de [(fonte, tamanho, entrelinha, texto), ...]"""
+    usable = PAGE_WIDTH - 2 * MARGIN
+    bottom = MARGIN + 2 * FOOTER_SIZE
+    pages, page, y = [], [], PAGE_HEIGHT - MARGIN
+
+    def add(font, size, leading, line):
+        nonlocal page, y
+        if y - leading < bottom and page:
+            pages.append(page)
+            page, y = [], PAGE_HEIGHT - MARGIN
+        page.append((font, size, leading, line))
+        y -= leading
+
+    if titulo:
+        for line in wrap(titulo, TITLE_SIZE * 1.08, usable):
+            add('F2', TITLE_SIZE, TITLE_LEADING, line)
+        add('F1', FONT_SIZE, LEADING, '')
+    for paragraph in texto.replace('\r\n', '\n').replace('\t', '    ').split('\n'):
+        for line in wrap(paragraph.rstrip(), FONT_SIZE, usable):
+            add('F1', FONT_SIZE, LEADING, line)
+    pages.append(page)
+    return pages
+
+
+def render_pdf(texto, titulo=None, rodape=None):
+    """Gera um PDF A4 com o texto do contrato em Helvetica (sem dependências nem data, logo determinístico)"""
+    pages = _layout(texto or '', titulo)
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Pages, preenchido depois de conhecer as páginas
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        b'<< /Title ' + _pdf_string(titulo or '') + b' /Producer (ContratoSmart) >>',
+    ]
+    kids = []
+    for number, page in enumerate(pages, start=1):
+        ops = [b'BT', b'%.2f %.2f Td' % (MARGIN, PAGE_HEIGHT - MARGIN)]
+        current = None
+        for font, size, leading, line in page:
+            if (font, size) != current:
+                ops.append(b'/%s %d Tf' % (font.encode('ascii'), size))
+                current = (font, size)
+            ops.append(b'0 %.2f Td %s Tj' % (-leading, _pdf_string(line)))
+        ops.append(b'ET')
+        footer = f'Página {number} de {len(pages)}' + (f' - {rodape}' if rodape else '')
+        ops.append(b'BT /F1 %d Tf %.2f %.2f Td %s Tj ET' % (FOOTER_SIZE, MARGIN, MARGIN, _pdf_string(footer)))
+        content = zlib.compress(b'\n'.join(ops), 6)
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream')
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] '
+                       b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                       % (PAGE_WIDTH, PAGE_HEIGHT, len(objects)))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % len(pages)
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _render_to_file(path, texto, titulo, rodape):
+    """Executa no processo do pool: renderiza e grava o PDF, a menos que outro processo já o tenha feito.
+
+    O flock no arquivo .lock faz os workers do gunicorn esperarem a renderização
+    em andamento em vez de repeti-la. Devolve os bytes gravados (0 se já existia).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(path):
+            return 0
+        data = render_pdf(texto, titulo, rodape)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    try:
+        os.remove(f'{path}.lock')
+    except OSError:
+        pass
+    return len(data)
+
+
+class PdfCache:
+    """PDFs renderizados em disco, um arquivo por hash_documento, com despejo LRU por tamanho total.
+
+    A data de modificação marca o último uso; ao passar de max_bytes os mais
+    antigos são apagados até low_water. Renderizações rodam num pool de
+    processos e pedidos simultâneos do mesmo hash compartilham uma só.
+    """
+
+    def __init__(self, directory, max_bytes, workers=2, timeout=30, low_water=0.9):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.workers = workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._pid = None
+        self._executor = None
+        os.makedirs(directory, exist_ok=True)
+        self._size = self._scan_size()
+
+    def _pool(self):
+        # O pool não sobrevive ao fork dos workers: recria por processo
+        if self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._inflight = {}
+            self._pid = os.getpid()
+        return self._executor
+
+    def _replace_broken_pool(self, broken):
+        # Um processo do pool que morre (OOM, sinal) inutiliza o pool inteiro: troca por um novo
+        if self._executor is broken:
+            logger.warning('Pool de renderização de PDF quebrado, criando outro')
+            broken.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def path(self, hash_documento):
+        return os.path.join(self.directory, hash_documento[:2], f'{hash_documento}.pdf')
+
+    def _entries(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.pdf'):
+                        yield entry
+
+    def _scan_size(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self):
+        """Apaga os PDFs usados há mais tempo até o total ficar abaixo de low_water * max_bytes"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * self.low_water
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        self._size = total
+        return removed
+
+    def _rendered(self, hash_documento, future):
+        with self._lock:
+            self._inflight.pop(hash_documento, None)
+            if future.exception() is None:
+                self._size += future.result()
+                over = self._size > self.max_bytes
+            else:
+                over = False
+        if over:
+            self.evict()
+
+    def submit(self, hash_documento, texto, titulo=None, rodape=None):
+        """Agenda a renderização (ou reaproveita a que está em andamento) e devolve o Future"""
+        with self._lock:
+            executor = self._pool()
+            future = self._inflight.get(hash_documento)
+            if future is not None:
+                return future
+            args = (_render_to_file, self.path(hash_documento), texto, titulo, rodape)
+            try:
+                future = executor.submit(*args)
+            except BrokenProcessPool:
+                self._replace_broken_pool(executor)
+                future = self._executor.submit(*args)
+            self._inflight[hash_documento] = future
+        # Fora do lock: se a renderização já terminou, o callback roda aqui mesmo e pega o lock
+        future.add_done_callback(lambda f: self._rendered(hash_documento, f))
+        return future
+
+    def get(self, hash_documento, texto, titulo=None, rodape=None):
+        """Caminho do PDF do documento, renderizando na primeira vez"""
+        path = self.path(hash_documento)
+        try:
+            # Marca o uso para o LRU
+            os.utime(path)
+            record_cache('pdf', True)
+            return path
+        except FileNotFoundError:
+            record_cache('pdf', False)
+        try:
+            self.submit(hash_documento, texto, titulo, rodape).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # O processo que renderizava morreu: uma nova tentativa, já no pool recriado
+            with self._lock:
+                self._replace_broken_pool(self._executor)
+            self.submit(hash_documento, texto, titulo, rodape).result(timeout=self.timeout)
+        return path
+
+    def close(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._pid = None
+
+
+def init_pdf(app):
+    """Configura o cache de PDFs em disco e o pool de renderização"""
+    app.config.setdefault('PDF_CACHE_DIR', os.path.join(app.root_path, 'database', 'pdf_cache'))
+    app.config.setdefault('PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    app.config.setdefault('PDF_WORKERS', 2)
+    app.config.setdefault('PDF_RENDER_TIMEOUT', 30)
+    cache = PdfCache(app.config['PDF_CACHE_DIR'], app.config['PDF_CACHE_MAX_BYTES'],
+                     workers=app.config['PDF_WORKERS'], timeout=app.config['PDF_RENDER_TIMEOUT'])
+    register_shutdown_hook(cache.close)
+    app.extensions['pdf'] = cache
+    return cache
@@ -0,0 +1,122 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import threading
+import time
+
+from flask import g, request
+
+_settings = {}
+_ring_lock = threading.Lock()
+
+PROFILE_SUFFIX = '.pstats'
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def is_privileged(req):
+    """Confere o token do cabeçalho de profiling"""
+    token = _settings.get('token')
+    provided = req.headers.get(_settings.get('header', 'X-Profile'))
+    return bool(token and provided and hmac.compare_digest(provided, token))
+
+
+def list_profiles(endpoint=None):
+    """Lista os perfis gravados, do mais recente para o mais antigo"""
+    directory = _settings.get('dir')
+    if not directory or not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith(PROFILE_SUFFIX):
+            continue
+        created_ms, pid, profile_endpoint = name[:-len(PROFILE_SUFFIX)].split('_', 2)
+        if endpoint and profile_endpoint != endpoint:
+            continue
+        profiles.append({
+            'name': name,
+            'endpoint': profile_endpoint,
+            'pid': int(pid),
+            'size': os.path.getsize(os.path.join(directory, name)),
+            'created_at': int(created_ms) / 1000,
+        })
+    profiles.sort(key=lambda p: p['created_at'], reverse=True)
+    return profiles
+
+
+def profiles_dir():
+    return _settings.get('dir')
+
+
+def _trim_ring(directory, max_files):
+    with _ring_lock:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(PROFILE_SUFFIX))
+        for name in names[:max(0, len(names) - max_files)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def _start_profile():
+    # Não perfila as próprias rotas de consulta de perfis
+    if request.blueprint == 'profiles':
+        return
+    if not (is_privileged(request) or random.random() < _settings['sample_rate']):
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Outro profiler já está ativo nesta thread
+        return
+    g._profile = profile
+
+
+def _finish_profile(response):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+
+    endpoint = _UNSAFE_CHARS.sub('-', request.endpoint or 'unmatched')
+    # Nome ordenável: timestamp em ms, pid e endpoint
+    name = f'{int(time.time() * 1000):013d}_{os.getpid()}_{endpoint}{PROFILE_SUFFIX}'
+    directory = _settings['dir']
+    profile.dump_stats(os.path.join(directory, name))
+    _trim_ring(directory, _settings['max_files'])
+    response.headers['X-Profile-Id'] = name
+    return response
+
+
+def _discard_profile(exc):
+    # after_request não roda quando a view levanta exceção não tratada; um perfil
+    # deixado ativo faria todo enable() seguinte nesta thread falhar
+    profile = g.pop('_profile', None)
+    if profile is not None:
+        profile.disable()
+
+
+def init_profiler(app):
+    """Perfila uma amostra das requisições (ou as que trazem o token) com cProfile"""
+    app.config.setdefault('PROFILER_ENABLED', False)
+    app.config.setdefault('PROFILER_SAMPLE_RATE', 0.0)
+    app.config.setdefault('PROFILER_TOKEN', None)
+    app.config.setdefault('PROFILER_HEADER', 'X-Profile')
+    app.config.setdefault('PROFILER_DIR', 'profiles')
+    app.config.setdefault('PROFILER_MAX_FILES', 200)
+    if not app.config['PROFILER_ENABLED']:
+        return
+
+    _settings.update(
+        sample_rate=app.config['PROFILER_SAMPLE_RATE'],
+        token=app.config['PROFILER_TOKEN'],
+        header=app.config['PROFILER_HEADER'],
+        dir=app.config['PROFILER_DIR'],
+        max_files=app.config['PROFILER_MAX_FILES'],
+    )
+    os.makedirs(_settings['dir'], exist_ok=True)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_discard_profile)
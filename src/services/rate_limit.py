@@ -0,0 +1,259 @@
+import functools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app, jsonify, make_response
+
+from src.services.background import start_periodic
+from src.services.metrics import registry
+from src.services.sessions import client_identity
+
+logger = logging.getLogger(__name__)
+
+rate_limit_rejections_total = registry.counter(
+    'rate_limit_rejections_total', 'Requisições recusadas pelo controle de admissão', ('limit', 'reason')
+)
+
+# Limites padrão por grupo de rotas. rate em requisições/segundo, burst em requisições;
+# concurrency limita quantas execuções simultâneas do grupo o host aceita.
+DEFAULT_LIMITS = {
+    'generate': {'rate': 50, 'burst': 100, 'user_rate': 1, 'user_burst': 5,
+                 'concurrency': 8, 'user_concurrency': 2},
+    'sign': {'rate': 20, 'burst': 40, 'user_rate': 0.2, 'user_burst': 3,
+             'concurrency': 4, 'user_concurrency': 1},
+    'govbr_auth': {'rate': 50, 'burst': 100, 'user_rate': 1, 'user_burst': 10},
+    'export': {'rate': 5, 'burst': 10, 'user_rate': 0.05, 'user_burst': 2,
+               'concurrency': 2, 'user_concurrency': 1},
+}
+
+# Vagas de concorrência de um processo que morreu expiram depois deste tempo
+SLOT_TTL = 300
+
+# Espera máxima (s) pelo lock do arquivo compartilhado; as transações do limitador são curtas
+BUSY_TIMEOUT = 1.0
+
+
+def _refill(row, rate, burst, now):
+    tokens, updated_at = row if row else (burst, now)
+    return min(burst, tokens + (now - updated_at) * rate)
+
+
+class MemoryLimiterStore:
+    """Estado do limitador em memória (vale apenas para um processo)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = {}
+
+    def admit(self, buckets, slots, now):
+        """Confere todos os baldes e vagas e só debita se a requisição for admitida.
+
+        buckets: [(motivo, chave, rate, burst)]; slots: [(chave, limite)].
+        Devolve (motivo da recusa ou None, retry_after, holder das vagas ou None).
+        """
+        with self._lock:
+            refilled = []
+            for reason, key, rate, burst in buckets:
+                tokens = _refill(self._buckets.get(key), rate, burst, now)
+                if tokens < 1:
+                    return reason, (1 - tokens) / rate, None
+                refilled.append((key, tokens))
+            for key, limit in slots:
+                holders = self._slots.get(key, {})
+                for holder, expires_at in list(holders.items()):
+                    if expires_at <= now:
+                        del holders[holder]
+                if len(holders) >= limit:
+                    return 'concurrency', 1, None
+            for key, tokens in refilled:
+                self._buckets[key] = (tokens - 1, now)
+            if not slots:
+                return None, 0.0, None
+            holder = uuid.uuid4().hex
+            for key, _ in slots:
+                self._slots.setdefault(key, {})[holder] = now + SLOT_TTL
+            return None, 0.0, holder
+
+    def release(self, holder):
+        with self._lock:
+            for holders in self._slots.values():
+                holders.pop(holder, None)
+
+    def prune(self, now, max_window):
+        """Descarta baldes parados há mais que max_window (já estariam cheios) e vagas vencidas"""
+        with self._lock:
+            self._buckets = {key: value for key, value in self._buckets.items()
+                             if now - value[1] < max_window}
+            for key in list(self._slots):
+                holders = {holder: expires_at for holder, expires_at in self._slots[key].items()
+                           if expires_at > now}
+                if holders:
+                    self._slots[key] = holders
+                else:
+                    del self._slots[key]
+
+
+class SQLiteLimiterStore:
+    """Estado do limitador num arquivo SQLite compartilhado pelos workers do host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS buckets ('
+                     'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_buckets_updated_at ON buckets (updated_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS slots ('
+                     'holder TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, '
+                     'PRIMARY KEY (key, holder))')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_slots_holder ON slots (holder)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def admit(self, buckets, slots, now):
+        """Mesmo contrato de MemoryLimiterStore.admit, numa única transação"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            refilled = []
+            for reason, key, rate, burst in buckets:
+                row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = _refill(row, rate, burst, now)
+                if tokens < 1:
+                    conn.execute('ROLLBACK')
+                    return reason, (1 - tokens) / rate, None
+                refilled.append((key, tokens - 1, now))
+            for key, limit in slots:
+                conn.execute('DELETE FROM slots WHERE key = ? AND expires_at <= ?', (key, now))
+                count = conn.execute('SELECT count(*) FROM slots WHERE key = ?', (key,)).fetchone()[0]
+                if count >= limit:
+                    conn.execute('ROLLBACK')
+                    return 'concurrency', 1, None
+            conn.executemany('INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                             refilled)
+            holder = None
+            if slots:
+                holder = uuid.uuid4().hex
+                conn.executemany('INSERT INTO slots (holder, key, expires_at) VALUES (?, ?, ?)',
+                                 [(holder, key, now + SLOT_TTL) for key, _ in slots])
+            conn.execute('COMMIT')
+            return None, 0.0, holder
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release(self, holder):
+        self._connect().execute('DELETE FROM slots WHERE holder = ?', (holder,))
+
+    def prune(self, now, max_window):
+        conn = self._connect()
+        conn.execute('DELETE FROM buckets WHERE updated_at <= ?', (now - max_window,))
+        conn.execute('DELETE FROM slots WHERE expires_at <= ?', (now,))
+
+
+def _too_many(name, reason, retry_after):
+    rate_limit_rejections_total.inc(limit=name, reason=reason)
+    response = jsonify({
+        'success': False,
+        'error': 'Muitas requisições, tente novamente em instantes'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limited(name):
+    """Aplica os limites de taxa e de concorrência do grupo `name` à rota"""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            store = current_app.extensions.get('rate_limiter')
+            limits = current_app.config['RATE_LIMITS'].get(name)
+            if store is None or not limits:
+                return view(*args, **kwargs)
+
+            user = client_identity()
+            buckets = []
+            if limits.get('user_rate'):
+                buckets.append(('user_rate', f'{name}:{user}', limits['user_rate'],
+                                limits.get('user_burst') or limits['user_rate']))
+            if limits.get('rate'):
+                buckets.append(('global_rate', name, limits['rate'], limits.get('burst') or limits['rate']))
+            slots = []
+            if limits.get('concurrency'):
+                slots.append((name, limits['concurrency']))
+            if limits.get('user_concurrency'):
+                slots.append((f'{name}:{user}', limits['user_concurrency']))
+            try:
+                reason, retry_after, holder = store.admit(buckets, slots, time.time())
+            except sqlite3.OperationalError:
+                # Estado do limitador indisponível: recusa em vez de admitir sem controle
+                logger.warning('Limitador %s indisponível, requisição recusada', name)
+                return _too_many(name, 'unavailable', 1)
+            if reason is not None:
+                return _too_many(name, reason, retry_after)
+
+            if holder is None:
+                return view(*args, **kwargs)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                store.release(holder)
+                raise
+            # Respostas em streaming só liberam a vaga quando terminam de ser enviadas
+            if response.is_streamed:
+                response.call_on_close(lambda: store.release(holder))
+            else:
+                store.release(holder)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def init_rate_limits(app):
+    """Configura o armazenamento do limitador conforme RATE_LIMIT_BACKEND"""
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMIT_BACKEND', 'memory')
+    app.config.setdefault('RATE_LIMIT_SQLITE_PATH', 'ratelimit.db')
+    app.config.setdefault('RATE_LIMITS', {})
+    app.config.setdefault('RATE_LIMIT_SWEEP_INTERVAL', 300)
+    app.config['RATE_LIMITS'] = {**DEFAULT_LIMITS, **app.config['RATE_LIMITS']}
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return None
+
+    backend = app.config['RATE_LIMIT_BACKEND']
+    if backend == 'memory':
+        store = MemoryLimiterStore()
+    elif backend == 'sqlite':
+        store = SQLiteLimiterStore(app.config['RATE_LIMIT_SQLITE_PATH'])
+    else:
+        raise ValueError(f'RATE_LIMIT_BACKEND inválido: {backend}')
+    app.extensions['rate_limiter'] = store
+    if app.config['RATE_LIMIT_SWEEP_INTERVAL']:
+        # Um balde parado por mais que burst/rate já está cheio e equivale a não existir
+        max_window = max(
+            (limits.get(burst) or limits[rate]) / limits[rate]
+            for limits in app.config['RATE_LIMITS'].values()
+            for rate, burst in (('rate', 'burst'), ('user_rate', 'user_burst'))
+            if limits.get(rate)
+        )
+        start_periodic('rate-limit-sweeper', app.config['RATE_LIMIT_SWEEP_INTERVAL'],
+                       lambda: store.prune(time.time(), max_window))
+    return store
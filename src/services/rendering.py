@@ -0,0 +1,121 @@
+import functools
+import hashlib
+import re
+
+# Placeholder do template -> (seção de dados_contrato, campo)
+FIELD_PLACEHOLDERS = {
+    'CONTRATANTE_NOME': ('contratante', 'nome_completo'),
+    'CONTRATANTE_CPF': ('contratante', 'cpf'),
+    'CONTRATANTE_RG': ('contratante', 'rg'),
+    'CONTRATANTE_ENDERECO': ('contratante', 'endereco'),
+    'CONTRATANTE_TELEFONE': ('contratante', 'telefone'),
+    'CONTRATANTE_EMAIL': ('contratante', 'email'),
+
+    'CONTRATADO_NOME': ('contratado', 'nome_completo'),
+    'CONTRATADO_CPF': ('contratado', 'cpf'),
+    'CONTRATADO_RG': ('contratado', 'rg'),
+    'CONTRATADO_ENDERECO': ('contratado', 'endereco'),
+    'CONTRATADO_TELEFONE': ('contratado', 'telefone'),
+    'CONTRATADO_EMAIL': ('contratado', 'email'),
+    'CONTRATADO_PROFISSAO': ('contratado', 'profissao'),
+
+    'DATA_INICIO': ('contrato', 'data_inicio'),
+    'DATA_FIM': ('contrato', 'data_fim'),
+    'VALOR': ('contrato', 'valor'),
+    'DESCRICAO_SERVICO': ('contrato', 'descricao_servico'),
+    'FORMA_PAGAMENTO': ('contrato', 'forma_pagamento'),
+    'CLAUSULAS_ESPECIAIS': ('contrato', 'clausulas_especiais'),
+}
+
+# Placeholders preenchidos com a data/hora da geração
+CLOCK_PLACEHOLDERS = {
+    'DATA_ATUAL': '%d/%m/%Y',
+    'HORA_ATUAL': '%H:%M:%S',
+}
+
+_PLACEHOLDER = re.compile(r'\{\{(' + '|'.join((*FIELD_PLACEHOLDERS, *CLOCK_PLACEHOLDERS)) + r')\}\}')
+
+
+def placeholder_values(dados, agora):
+    """Texto de cada placeholder para os dados do contrato e a data/hora informados"""
+    values = {
+        name: str(dados.get(section, {}).get(field, ''))
+        for name, (section, field) in FIELD_PLACEHOLDERS.items()
+    }
+    for name, formato in CLOCK_PLACEHOLDERS.items():
+        values[name] = agora.strftime(formato)
+    return values
+
+
+class CompiledTemplate:
+    """Template quebrado em segmentos (linhas) de texto fixo e placeholders.
+
+    dependencies diz em quais segmentos cada placeholder aparece, para
+    recalcular só esses quando um valor muda. Linhas sem placeholder são
+    texto fixo e nunca são recalculadas.
+    """
+
+    __slots__ = ('versao', 'segments', 'dependencies')
+
+    def __init__(self, conteudo):
+        self.versao = hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+        self.segments = []
+        self.dependencies = {}
+        for indice, line in enumerate(conteudo.splitlines(keepends=True)):
+            # split com grupo alterna texto fixo (posições pares) e nome do placeholder (ímpares)
+            parts = tuple(_PLACEHOLDER.split(line))
+            self.segments.append(parts)
+            for name in parts[1::2]:
+                self.dependencies.setdefault(name, []).append(indice)
+        self.segments = tuple(self.segments)
+
+    def render_segment(self, indice, values):
+        parts = self.segments[indice]
+        if len(parts) == 1:
+            return parts[0]
+        return ''.join(values[part] if position % 2 else part for position, part in enumerate(parts))
+
+    def render_segments(self, values):
+        return [self.render_segment(indice, values) for indice in range(len(self.segments))]
+
+    def render(self, values):
+        return ''.join(self.render_segments(values))
+
+    def affected_segments(self, names):
+        """Índices, em ordem, dos segmentos que usam algum dos placeholders"""
+        return sorted({indice for name in names for indice in self.dependencies.get(name, ())})
+
+
+@functools.lru_cache(maxsize=128)
+def compile_template(conteudo):
+    """Template compilado, reaproveitado enquanto o conteúdo for o mesmo"""
+    return CompiledTemplate(conteudo)
+
+
+def preview_diff(conteudo, dados, agora, anterior=None, versao=None, agora_anterior=None):
+    """Segmentos do preview que mudaram em relação aos dados anteriores.
+
+    Sem anterior, ou com versao de outro conteúdo do template, devolve todos
+    os segmentos (completo=True). agora_anterior é a data/hora do preview
+    anterior; sem ela os segmentos com data/hora contam como alterados. O
+    cliente substitui os segmentos pelo índice; a concatenação de todos é o
+    texto do contrato.
+    """
+    template = compile_template(conteudo)
+    values = placeholder_values(dados, agora)
+    if anterior is None or versao != template.versao:
+        indices = range(len(template.segments))
+        completo = True
+    else:
+        previous = placeholder_values(anterior, agora_anterior or agora)
+        changed = [name for name, value in values.items() if previous[name] != value]
+        if agora_anterior is None:
+            changed.extend(CLOCK_PLACEHOLDERS)
+        indices = template.affected_segments(changed)
+        completo = False
+    return {
+        'versao': template.versao,
+        'completo': completo,
+        'segmentos': len(template.segments),
+        'alterados': [{'indice': indice, 'texto': template.render_segment(indice, values)} for indice in indices],
+    }
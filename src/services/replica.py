@@ -0,0 +1,201 @@
+import functools
+import sqlite3
+import time
+
+import click
+from flask import current_app, g, has_request_context, request
+from flask.cli import AppGroup, with_appcontext
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from src.models.user import SESSION_FACTORY, db
+from src.services.metrics import registry
+from src.services.sharding import ShardRoutingSession
+
+# Métodos cujas leituras podem ir para a réplica
+READ_METHODS = ('GET', 'HEAD')
+
+db_reads_total = registry.counter(
+    'db_reads_total', 'Leituras de requisições GET/HEAD por banco escolhido', ('target',)
+)
+
+
+class ReplicaRouter:
+    """Decide, a cada leitura, entre o banco principal e a réplica somente leitura"""
+
+    def __init__(self, primary, replica, sticky_seconds, cookie_name):
+        self.primary = primary
+        self.replica = replica
+        self.sticky_seconds = sticky_seconds
+        self.cookie_name = cookie_name
+
+    def sticky(self):
+        """True se o cliente escreveu há menos de sticky_seconds (cookie) ou nesta mesma requisição"""
+        if g.get('_db_wrote') or g.get('_db_primary'):
+            return True
+        try:
+            return float(request.cookies.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def use_replica(self, session, clause):
+        if not has_request_context() or request.method not in READ_METHODS or session._flushing:
+            return False
+        if clause is not None and getattr(clause, 'is_dml', False):
+            return False
+        use = not self.sticky()
+        db_reads_total.inc(target='replica' if use else 'primary')
+        return use
+
+
+class ReplicaRoutingMixin:
+    """Troca o banco principal pela réplica nas leituras de requisições GET/HEAD sem escrita recente"""
+
+    def __init__(self, *args, replica_router, **kwargs):
+        self.replica_router = replica_router
+        super().__init__(*args, **kwargs)
+
+    def get_bind(self, mapper=None, **kwargs):
+        engine = super().get_bind(mapper, **kwargs)
+        router = self.replica_router
+        if engine is router.primary and router.use_replica(self, kwargs.get('clause')):
+            return router.replica
+        return engine
+
+
+class ReplicaSession(ReplicaRoutingMixin, FlaskSession):
+    pass
+
+
+class ShardedReplicaSession(ReplicaRoutingMixin, ShardRoutingSession):
+    """Com sharding só o banco global tem réplica; as tabelas dos shards são lidas nos próprios shards"""
+
+
+def read_from_primary():
+    """As leituras restantes desta requisição vão para o banco principal"""
+    g._db_primary = True
+
+
+def replica_engines(app):
+    router = app.extensions.get('replica')
+    return [router.replica] if router is not None else []
+
+
+def _mark_write():
+    if has_request_context():
+        g._db_wrote = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_flush(session, flush_context):
+    _mark_write()
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _mark_write()
+
+
+def _stick_to_primary(response):
+    # Quem acabou de escrever lê do principal até a réplica ter tempo de alcançá-lo
+    if g.get('_db_wrote'):
+        router = current_app.extensions['replica']
+        response.set_cookie(
+            router.cookie_name, f'{time.time() + router.sticky_seconds:.3f}',
+            max_age=int(router.sticky_seconds) + 1, httponly=True, samesite='Lax'
+        )
+    return response
+
+
+def _sqlite_path(url):
+    url = make_url(url)
+    if not url.drivername.startswith('sqlite') or not url.database or url.database == ':memory:':
+        return None
+    return url.database
+
+
+def sync_sqlite_replica(primary_url, replica_url):
+    """Copia o banco principal para a réplica com a API de backup do SQLite; devolve as páginas copiadas.
+
+    A cópia é consistente mesmo com escritas em andamento e, com a réplica em
+    WAL, quem está lendo a réplica continua vendo a versão anterior até o fim.
+    """
+    primary_path, replica_path = _sqlite_path(primary_url), _sqlite_path(replica_url)
+    if primary_path is None or replica_path is None:
+        raise ValueError('sync só funciona entre arquivos SQLite; use a replicação do próprio banco')
+    source = sqlite3.connect(primary_path, timeout=30)
+    target = sqlite3.connect(replica_path, timeout=30)
+    try:
+        pages = []
+        source.backup(target, pages=1024, progress=lambda status, remaining, total: pages.append(total))
+        return pages[-1] if pages else 0
+    finally:
+        target.close()
+        source.close()
+
+
+def _create_replica_engine(url):
+    engine = create_engine(url, connect_args={'timeout': 30} if url.startswith('sqlite') else {})
+    if url.startswith('sqlite'):
+        @event.listens_for(engine, 'connect')
+        def _read_only(dbapi_connection, connection_record):
+            # Uma escrita roteada por engano falha em vez de divergir da réplica
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA query_only=ON')
+            cursor.close()
+    return engine
+
+
+def init_replica(app):
+    """Com REPLICA_URL, lê da réplica nas requisições GET/HEAD e grava o cookie de aderência após escritas.
+
+    Chamar depois de init_sharding: a sessão roteada por shard ganha a réplica
+    para o banco global.
+    """
+    app.config.setdefault('REPLICA_URL', None)
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+    app.config.setdefault('REPLICA_STICKY_COOKIE', 'db_primary_until')
+    if not app.config['REPLICA_URL']:
+        return None
+
+    with app.app_context():
+        primary = db.engine
+    router = ReplicaRouter(
+        primary, _create_replica_engine(app.config['REPLICA_URL']),
+        app.config['REPLICA_STICKY_SECONDS'], app.config['REPLICA_STICKY_COOKIE']
+    )
+    sharding = app.extensions.get('sharding')
+    if sharding is not None:
+        factory = functools.partial(ShardedReplicaSession, router=sharding, replica_router=router)
+    else:
+        factory = functools.partial(ReplicaSession, replica_router=router)
+    app.extensions[SESSION_FACTORY] = factory
+    app.after_request(_stick_to_primary)
+    app.extensions['replica'] = router
+    return router
+
+
+replica_cli = AppGroup('replica', help='Réplica de leitura')
+
+
+@replica_cli.command('sync')
+@click.option('--interval', type=float, default=None, help='Repete a cópia a cada N segundos')
+@with_appcontext
+def sync_command(interval):
+    """Copia o banco principal SQLite para REPLICA_URL (réplica local para testes)"""
+    replica_url = current_app.config.get('REPLICA_URL')
+    if not replica_url:
+        raise click.ClickException('Réplica desligada: defina REPLICA_URL')
+    while True:
+        started = time.monotonic()
+        try:
+            pages = sync_sqlite_replica(current_app.config['SQLALCHEMY_DATABASE_URI'], replica_url)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'{pages} páginas copiadas em {time.monotonic() - started:.2f} s')
+        if not interval:
+            break
+        time.sleep(interval)
@@ -0,0 +1,314 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context, request
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from src.models.user import db, Contract, ContractParty, DigitalSignature
+from src.services.background import start_periodic
+from src.services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Chave em session.info com os contratos alterados na transação, invalidados no commit
+PENDING_KEY = 'detail_cache_contracts'
+
+
+class CachedResponse:
+    __slots__ = ('etag', 'body')
+
+    def __init__(self, etag, body):
+        self.etag = etag
+        self.body = body
+
+
+class MemoryTier:
+    """LRU por contrato limitado em quantidade de entradas e em bytes"""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self._entries[key] = entry
+            self.size += len(entry.body)
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= len(entry.body)
+
+
+class SQLiteSharedTier:
+    """Respostas e gerações por contrato num arquivo SQLite compartilhado pelos workers do host.
+
+    A invalidação incrementa a geração e apaga o corpo; uma resposta só é
+    gravada se a geração ainda é a lida antes de consultar o banco, então uma
+    montagem concorrente com o commit nunca deixa a versão antiga no cache.
+    """
+
+    def __init__(self, path, identity=None):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS detail_cache ('
+            'contract_id INTEGER PRIMARY KEY, geracao INTEGER NOT NULL, etag TEXT, body BLOB, '
+            'gravado_em REAL NOT NULL)'
+        )
+        conn.execute('CREATE TABLE IF NOT EXISTS detail_cache_meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)')
+        if identity is not None:
+            self._claim(identity)
+
+    def _claim(self, identity):
+        """Esvazia o cache se ele foi preenchido a partir de outro banco (ou do mesmo, recriado)"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT valor FROM detail_cache_meta WHERE chave = 'banco'").fetchone()
+            if row is None or row[0] != identity:
+                conn.execute('DELETE FROM detail_cache')
+                conn.execute("INSERT OR REPLACE INTO detail_cache_meta (chave, valor) VALUES ('banco', ?)",
+                             (identity,))
+                if row is not None:
+                    logger.info('Cache de contratos esvaziado: o banco de dados mudou')
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, contract_id):
+        row = self._connect().execute(
+            'SELECT geracao, etag FROM detail_cache WHERE contract_id = ?', (contract_id,)
+        ).fetchone()
+        return row if row else (0, None)
+
+    def body(self, contract_id, etag):
+        row = self._connect().execute(
+            'SELECT body FROM detail_cache WHERE contract_id = ? AND etag = ?', (contract_id, etag)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, contract_id, geracao, etag, body):
+        cursor = self._connect().execute(
+            'INSERT INTO detail_cache (contract_id, geracao, etag, body, gravado_em) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (contract_id) DO UPDATE SET etag = excluded.etag, body = excluded.body, '
+            'gravado_em = excluded.gravado_em WHERE detail_cache.geracao = excluded.geracao',
+            (contract_id, geracao, etag, body, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def invalidate(self, contract_ids):
+        self._connect().executemany(
+            'INSERT INTO detail_cache (contract_id, geracao, gravado_em) VALUES (?, 1, ?) '
+            'ON CONFLICT (contract_id) DO UPDATE SET geracao = geracao + 1, etag = NULL, body = NULL, '
+            'gravado_em = excluded.gravado_em',
+            [(contract_id, time.time()) for contract_id in contract_ids]
+        )
+
+    def prune(self, max_age):
+        """Remove entradas gravadas ou invalidadas há mais de max_age segundos"""
+        return self._connect().execute(
+            'DELETE FROM detail_cache WHERE gravado_em < ?', (time.time() - max_age,)
+        ).rowcount
+
+
+class DetailCache:
+    """Cache das respostas de GET /contracts/<id>: LRU em memória e, opcionalmente, camada compartilhada.
+
+    lookup() devolve a entrada ou, na falta, um token da geração atual; store()
+    só guarda a resposta montada se nenhuma invalidação chegou nesse meio tempo.
+    Sem a camada compartilhada as invalidações valem só para este processo.
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=32 * 1024 * 1024, shared=None):
+        self.memory = MemoryTier(max_entries, max_bytes)
+        self.shared = shared
+        self._generations = {}
+        self._floor = 0
+        self._max_generations = max_entries * 4
+
+    def _token(self, contract_id):
+        return (self._floor, self._generations.get(contract_id, 0))
+
+    def lookup(self, contract_id):
+        if self.shared is None:
+            entry = self.memory.get(contract_id)
+            record_cache('contract_detail', entry is not None)
+            return entry, self._token(contract_id)
+
+        geracao, etag = self.shared.get(contract_id)
+        entry = None
+        if etag is not None:
+            entry = self.memory.get(contract_id)
+            if entry is None or entry.etag != etag:
+                body = self.shared.body(contract_id, etag)
+                entry = CachedResponse(etag, body) if body is not None else None
+                if entry is not None:
+                    self.memory.put(contract_id, entry)
+        record_cache('contract_detail', entry is not None)
+        return entry, geracao
+
+    def store(self, contract_id, token, body):
+        entry = CachedResponse(hashlib.blake2b(body, digest_size=16).hexdigest(), body)
+        if self.shared is None:
+            if token == self._token(contract_id):
+                self.memory.put(contract_id, entry)
+        elif self.shared.put(contract_id, token, entry.etag, body):
+            self.memory.put(contract_id, entry)
+        return entry
+
+    def invalidate(self, contract_ids):
+        for contract_id in contract_ids:
+            self.memory.pop(contract_id)
+        if self.shared is not None:
+            self.shared.invalidate(contract_ids)
+            return
+        for contract_id in contract_ids:
+            self._generations[contract_id] = self._generations.get(contract_id, 0) + 1
+        if len(self._generations) > self._max_generations:
+            # Esquece as gerações e invalida de uma vez as montagens em andamento
+            self._generations = {}
+            self._floor += 1
+
+
+def respond(entry):
+    """Resposta JSON da entrada com ETag; 304 quando o cliente já tem essa versão"""
+    if request.if_none_match.contains_weak(entry.etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def mark_contracts_changed(session, contract_ids):
+    """Agenda a invalidação de contratos alterados fora do ORM (UPDATE direto) para o commit da sessão"""
+    session.info.setdefault(PENDING_KEY, set()).update(contract_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_contracts(session, flush_context):
+    changed = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Contract):
+            contract_id = obj.id
+        elif isinstance(obj, (ContractParty, DigitalSignature)):
+            contract_id = obj.contract_id
+        else:
+            continue
+        if contract_id is not None and (obj not in session.dirty or session.is_modified(obj)):
+            changed.add(contract_id)
+    if changed:
+        mark_contracts_changed(session, changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_contracts(session):
+    contract_ids = session.info.pop(PENDING_KEY, None)
+    if not contract_ids or not has_app_context():
+        return
+    cache = current_app.extensions.get('detail_cache')
+    if cache is not None:
+        try:
+            cache.invalidate(contract_ids)
+        except sqlite3.Error:
+            logger.exception('Falha ao invalidar o cache de %d contratos', len(contract_ids))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_contracts(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def database_identity(app):
+    """(hash da URL do banco, identidade do banco) para separar caches de bancos diferentes.
+
+    Num arquivo SQLite a identidade inclui o inode e o schema_version, que
+    mudam quando o banco é apagado e recriado ou tem as tabelas refeitas.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    rendered = url.render_as_string(hide_password=False)
+    parts = [rendered]
+    if url.drivername.startswith('sqlite') and url.database and url.database != ':memory:':
+        try:
+            stat = os.stat(url.database)
+            parts += [stat.st_dev, stat.st_ino]
+        except OSError:
+            pass
+        with app.app_context(), db.engine.connect() as conn:
+            parts.append(conn.execute(text('PRAGMA schema_version')).scalar())
+    url_hash = hashlib.sha256(rendered.encode('utf-8')).hexdigest()[:12]
+    identity = hashlib.sha256('\0'.join(map(str, parts)).encode('utf-8')).hexdigest()
+    return url_hash, identity
+
+
+def _namespaced_path(path, url_hash):
+    root, ext = os.path.splitext(path)
+    return f'{root}-{url_hash}{ext or ".db"}'
+
+
+def init_detail_cache(app):
+    """Configura o cache de GET /contracts/<id> conforme DETAIL_CACHE_BACKEND (memory ou sqlite).
+
+    Chamar depois de criar as tabelas: a identidade do banco usa o schema_version.
+    """
+    app.config.setdefault('DETAIL_CACHE_ENABLED', True)
+    app.config.setdefault('DETAIL_CACHE_BACKEND', 'memory')
+    app.config.setdefault('DETAIL_CACHE_SQLITE_PATH', 'detail_cache.db')
+    app.config.setdefault('DETAIL_CACHE_MAX_ENTRIES', 2048)
+    app.config.setdefault('DETAIL_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    app.config.setdefault('DETAIL_CACHE_SHARED_TTL', 3600)
+    if not app.config['DETAIL_CACHE_ENABLED']:
+        return None
+
+    backend = app.config['DETAIL_CACHE_BACKEND']
+    if backend == 'memory':
+        shared = None
+    elif backend == 'sqlite':
+        # Um arquivo por banco e, dentro dele, a identidade do banco que preencheu o cache
+        url_hash, identity = database_identity(app)
+        shared = SQLiteSharedTier(_namespaced_path(app.config['DETAIL_CACHE_SQLITE_PATH'], url_hash), identity)
+        ttl = app.config['DETAIL_CACHE_SHARED_TTL']
+        start_periodic('detail-cache-prune', max(ttl / 4, 1), lambda: shared.prune(ttl))
+    else:
+        raise ValueError(f'DETAIL_CACHE_BACKEND inválido: {backend}')
+    cache = DetailCache(app.config['DETAIL_CACHE_MAX_ENTRIES'], app.config['DETAIL_CACHE_MAX_BYTES'], shared)
+    app.extensions['detail_cache'] = cache
+    return cache
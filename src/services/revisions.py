@@ -0,0 +1,156 @@
+import difflib
+import json
+import zlib
+from datetime import datetime
+
+from sqlalchemy import event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from src.models.user import Contract, ContractRevision
+from src.services.sharding import bind_arguments_for
+
+# A cada SNAPSHOT_INTERVAL revisões grava-se uma cópia completa; reconstruir
+# qualquer versão aplica no máximo SNAPSHOT_INTERVAL - 1 deltas
+SNAPSHOT_INTERVAL = 10
+TRACKED_FIELDS = ('dados_contrato', 'conteudo_final', 'status')
+
+revisions = ContractRevision.__table__
+
+
+def _dados_text(dados_contrato):
+    # JSON canônico com um campo por linha para que os deltas fiquem pequenos
+    try:
+        dados = json.loads(dados_contrato) if dados_contrato else {}
+    except ValueError:
+        return dados_contrato
+    return json.dumps(dados, indent=1, sort_keys=True, ensure_ascii=False)
+
+
+def diff_lines(old, new):
+    """Delta linha a linha: [início, fim] copia linhas da versão anterior, lista de textos insere"""
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(new[j1:j2])
+    return ops
+
+
+def apply_delta(old, ops):
+    lines = []
+    for op in ops:
+        if op and isinstance(op[0], int):
+            lines.extend(old[op[0]:op[1]])
+        else:
+            lines.extend(op)
+    return lines
+
+
+def _encode(document):
+    return zlib.compress(json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+
+
+def _decode(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def _apply(base, row):
+    document = _decode(row.payload)
+    if row.snapshot:
+        return document
+    result = {}
+    for field in ('dados_contrato', 'conteudo_final'):
+        ops = document[field]
+        if ops is None:
+            result[field] = None
+        else:
+            previous = (base[field] or '').splitlines(keepends=True)
+            result[field] = ''.join(apply_delta(previous, ops))
+    return result
+
+
+def _chain(conn, contract_id, numero=None):
+    """Linhas da revisão `numero` (ou da última) até o snapshot mais próximo anterior.
+
+    `conn` é uma conexão ou a sessão (que encaminha ao shard do contrato).
+    """
+    snapshot_filter = [revisions.c.contract_id == contract_id, revisions.c.snapshot.is_(True)]
+    if numero is not None:
+        snapshot_filter.append(revisions.c.numero <= numero)
+    base = select(func.max(revisions.c.numero)).where(*snapshot_filter).scalar_subquery()
+    query = (
+        select(revisions.c.numero, revisions.c.snapshot, revisions.c.payload)
+        .where(revisions.c.contract_id == contract_id, revisions.c.numero >= base)
+        .order_by(revisions.c.numero)
+    )
+    if numero is not None:
+        query = query.where(revisions.c.numero <= numero)
+    return conn.execute(query).all()
+
+
+def reconstruct(conn, contract_id, numero=None):
+    """Reconstrói dados_contrato (texto JSON) e conteudo_final de uma revisão; None se não existir"""
+    document = None
+    last = None
+    for row in _chain(conn, contract_id, numero):
+        document = _apply(document, row)
+        last = row.numero
+    if document is None or (numero is not None and last != numero):
+        return None
+    return document
+
+
+def record_revision(conn, contract):
+    """Grava a revisão atual do contrato como delta da anterior ou como snapshot"""
+    chain = _chain(conn, contract.id)
+    numero = chain[-1].numero + 1 if chain else 1
+    current = {
+        'dados_contrato': _dados_text(contract.dados_contrato),
+        'conteudo_final': contract.conteudo_final,
+    }
+
+    if not chain or len(chain) >= SNAPSHOT_INTERVAL:
+        snapshot, document = True, current
+    else:
+        previous = None
+        for row in chain:
+            previous = _apply(previous, row)
+        snapshot = False
+        document = {}
+        for field, text in current.items():
+            if text is None:
+                document[field] = None
+            else:
+                document[field] = diff_lines((previous[field] or '').splitlines(keepends=True),
+                                             text.splitlines(keepends=True))
+
+    conn.execute(insert(revisions).values(
+        contract_id=contract.id,
+        numero=numero,
+        snapshot=snapshot,
+        payload=_encode(document),
+        status=contract.status,
+        hash_documento=contract.hash_documento,
+        created_at=datetime.utcnow(),
+    ))
+    return numero
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_contract_revisions(session, flush_context):
+    """Registra uma revisão para cada contrato criado ou com dados, conteúdo ou status alterados"""
+    changed = []
+    for obj in session.new:
+        if isinstance(obj, Contract):
+            changed.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Contract):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in TRACKED_FIELDS):
+                changed.append(obj)
+    if not changed:
+        return
+    for contract in changed:
+        record_revision(session.connection(bind_arguments=bind_arguments_for(session, contract)), contract)
@@ -0,0 +1,237 @@
+import hashlib
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from src.services.background import start_periodic
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Sessão cujos dados ficam no servidor; o cookie guarda apenas o id"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Troca o id da sessão mantendo os dados; o registro antigo é apagado ao salvar"""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(24)
+        self.modified = True
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class MemorySessionStore:
+    """Armazena sessões em memória com despejo LRU (apenas um processo)"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            payload, expires_at = item
+            if expires_at <= time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return payload
+
+    def set(self, sid, payload, expires_at):
+        with self._lock:
+            self._data[sid] = (payload, expires_at)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at <= now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore:
+    """Armazena sessões num arquivo SQLite compartilhado entre processos"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'sid TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sid):
+        row = self._connect().execute(
+            'SELECT payload FROM sessions WHERE sid = ? AND expires_at > ?',
+            (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, sid, payload, expires_at):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO sessions (sid, payload, expires_at) VALUES (?, ?, ?)',
+            (sid, payload, expires_at)
+        )
+
+    def delete(self, sid):
+        self._connect().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def sweep(self):
+        cursor = self._connect().execute('DELETE FROM sessions WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Interface de sessão que mantém apenas um id compacto no cookie"""
+
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSideSession
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            payload = self.store.get(sid)
+            if payload is not None:
+                return self.session_class(self.serializer.loads(payload), sid=sid)
+        return self.session_class(sid=secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+
+        # Sessão esvaziada: remove do armazenamento e apaga o cookie
+        if not session:
+            if session.modified:
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure,
+                    samesite=samesite, httponly=httponly
+                )
+                response.vary.add('Cookie')
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        expires = self.get_expiration_time(app, session)
+        expires_at = time.time() + app.permanent_session_lifetime.total_seconds()
+        self.store.set(session.sid, self.serializer.dumps(dict(session)), expires_at)
+        response.set_cookie(
+            name, session.sid, expires=expires, httponly=httponly, domain=domain,
+            path=path, secure=secure, samesite=samesite
+        )
+        response.vary.add('Cookie')
+
+
+def client_identity():
+    """Identidade de quem faz a requisição, tirada apenas do que o servidor autenticou.
+
+    Usuário Gov.br da sessão (sub), senão um hash do token de acesso, senão o IP.
+    """
+    userinfo = session.get('govbr_userinfo')
+    if isinstance(userinfo, dict) and userinfo.get('sub'):
+        return f"govbr:{userinfo['sub']}"
+    token = session.get('govbr_access_token')
+    if token:
+        return 'token:' + hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]
+    return f'ip:{request.remote_addr}'
+
+
+def regenerate_session(session):
+    """Troca o id da sessão server-side (proteção contra fixação de sessão ao autenticar).
+
+    Na sessão em cookie assinado o conteúdo inteiro é regravado pelo servidor,
+    então não há id a trocar.
+    """
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+
+
+def init_sessions(app):
+    """Configura o backend de sessão conforme SESSION_BACKEND"""
+    app.config.setdefault('SESSION_BACKEND', 'cookie')
+    app.config.setdefault('SESSION_SQLITE_PATH', 'sessions.db')
+    app.config.setdefault('SESSION_MAX_ENTRIES', 10000)
+    app.config.setdefault('SESSION_SWEEP_INTERVAL', 300)
+
+    backend = app.config['SESSION_BACKEND']
+    if backend == 'cookie':
+        return None
+    if backend == 'memory':
+        store = MemorySessionStore(app.config['SESSION_MAX_ENTRIES'])
+    elif backend == 'sqlite':
+        store = SQLiteSessionStore(app.config['SESSION_SQLITE_PATH'])
+    else:
+        raise ValueError(f'SESSION_BACKEND inválido: {backend}')
+
+    app.session_interface = ServerSideSessionInterface(store)
+    if app.config['SESSION_SWEEP_INTERVAL']:
+        start_periodic('session-sweeper', app.config['SESSION_SWEEP_INTERVAL'], store.sweep)
+    return store
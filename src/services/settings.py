@@ -0,0 +1,104 @@
+import logging
+import threading
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from src.models.user import db, SystemSetting
+from src.services.background import start_periodic
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsCache:
+    """Cópia em memória da tabela system_settings com os valores já convertidos pelo tipo.
+
+    As leituras são um acesso a dicionário. Alterações feitas neste processo
+    recarregam o cache no próximo acesso; as feitas em outros workers são
+    detectadas pela verificação periódica da versão (quantidade de linhas e
+    maior updated_at), então propagam em até SETTINGS_REFRESH_INTERVAL segundos.
+    Valores do tipo json são compartilhados: não devem ser modificados.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._version = None
+        self._stale = True
+        self._lock = threading.Lock()
+        self._engine = None
+
+    def bind(self, engine):
+        self._engine = engine
+        self._stale = True
+
+    def _current_version(self, conn):
+        return tuple(conn.execute(
+            select(func.count(SystemSetting.id), func.max(SystemSetting.updated_at))
+        ).one())
+
+    def reload(self):
+        """Recarrega todas as configurações numa única query"""
+        with self._lock, self._engine.connect() as conn:
+            version = self._current_version(conn)
+            rows = conn.execute(select(SystemSetting.chave, SystemSetting.valor, SystemSetting.tipo)).all()
+            values = {}
+            for chave, valor, tipo in rows:
+                try:
+                    values[chave] = SystemSetting(valor=valor, tipo=tipo).get_valor()
+                except (ValueError, TypeError):
+                    logger.exception('Configuração %s com valor inválido para o tipo %s', chave, tipo)
+            self._values = values
+            self._version = version
+            self._stale = False
+
+    def check_version(self):
+        """Recarrega se outra instância alterou a tabela desde a última carga"""
+        with self._engine.connect() as conn:
+            version = self._current_version(conn)
+        if version != self._version:
+            self.reload()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def get(self, chave, default=None):
+        if self._stale:
+            self.reload()
+        return self._values.get(chave, default)
+
+    def all(self):
+        if self._stale:
+            self.reload()
+        return dict(self._values)
+
+
+settings = SettingsCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_setting_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SystemSetting):
+            session.info['settings_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_setting_changes(session):
+    if session.info.pop('settings_changed', False):
+        settings.mark_stale()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_setting_changes(session):
+    session.info.pop('settings_changed', None)
+
+
+def init_settings(app):
+    """Liga o cache ao banco do app e agenda a verificação de versão"""
+    app.config.setdefault('SETTINGS_REFRESH_INTERVAL', 5)
+    with app.app_context():
+        settings.bind(db.engine)
+    if app.config['SETTINGS_REFRESH_INTERVAL']:
+        start_periodic('settings-refresh', app.config['SETTINGS_REFRESH_INTERVAL'], settings.check_version)
+    return settings
@@ -0,0 +1,473 @@
+import functools
+import logging
+import zlib
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, delete, event, func, insert, select, update
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+from sqlalchemy.sql.selectable import Select, Subquery
+from sqlalchemy.sql.util import find_tables
+
+from src.models.user import (
+    SESSION_FACTORY, db,
+    ActivityLog, Contract, ContractParty, ContractRevision, ContractSignatureStats, DigitalSignature, OutboxEvent
+)
+
+logger = logging.getLogger(__name__)
+
+shards_cli = AppGroup('shards', help='Distribuição dos dados dos usuários entre shards SQLite')
+
+# Os usuários são espalhados em BUCKETS grupos fixos; cada bucket mora em um shard.
+# Adicionar shards só muda o mapa bucket -> shard, nunca o bucket de um usuário.
+BUCKETS = 1024
+GLOBAL = 'global'
+
+# Tabelas com dados de usuário, na ordem de cópia do rebalanceamento; as demais
+# (users, catálogo de contratos, configurações, chaves de idempotência) ficam no banco global
+SHARDED_MODELS = (
+    Contract, ContractParty, DigitalSignature, ContractSignatureStats, ContractRevision, OutboxEvent, ActivityLog
+)
+SHARDED_TABLES = tuple(model.__tablename__ for model in SHARDED_MODELS)
+# Nessas tabelas o id carrega o bucket (id = sequência * BUCKETS + bucket), então
+# buscar por id vai direto ao shard; nas outras o id é local a cada shard
+ENCODED_ID_TABLES = ('contracts', 'contract_parties', 'digital_signatures')
+
+shard_metadata = MetaData()
+# Banco global: em qual shard está cada bucket
+shard_buckets = Table(
+    'shard_buckets', shard_metadata,
+    Column('bucket', Integer, primary_key=True),
+    Column('shard', String(50), nullable=False),
+)
+# Cada shard: próxima sequência dos ids codificados
+shard_sequences = Table(
+    'shard_sequences', shard_metadata,
+    Column('tabela', String(50), primary_key=True),
+    Column('proximo', Integer, nullable=False),
+)
+# Cada shard: o nome com que foi criado, para não trocar os dados de shard se SHARD_URLS mudar de ordem
+shard_info = Table(
+    'shard_info', shard_metadata,
+    Column('nome', String(50), primary_key=True),
+)
+
+
+def user_bucket(user_id):
+    """Bucket estável do usuário: crc32 do id, igual em todos os processos e versões do Python"""
+    return zlib.crc32(str(int(user_id)).encode('ascii')) % BUCKETS
+
+
+def id_bucket(value):
+    return int(value) % BUCKETS
+
+
+# Colunas que, comparadas com um valor, determinam o bucket das linhas de cada tabela
+ROUTING_COLUMNS = {
+    'contracts': {'id': id_bucket, 'user_id': user_bucket},
+    'contract_parties': {'id': id_bucket, 'contract_id': id_bucket},
+    'digital_signatures': {'id': id_bucket, 'contract_id': id_bucket},
+    'contract_signature_stats': {'contract_id': id_bucket},
+    'contract_revisions': {'contract_id': id_bucket},
+    'outbox_events': {'contract_id': id_bucket},
+    # O log fica com o contrato; sem contrato, com o usuário (por isso user_id não restringe)
+    'activity_logs': {'contract_id': id_bucket},
+}
+
+
+def _contract_bucket(obj):
+    contract_id = obj.contract_id
+    if contract_id is None:
+        contract = getattr(obj, 'contract', None)
+        contract_id = contract.id if contract is not None else None
+    if contract_id is None:
+        raise ValueError(f'{type(obj).__name__} sem contrato: não é possível escolher o shard')
+    return id_bucket(contract_id)
+
+
+def instance_bucket(obj):
+    """Bucket de um objeto das tabelas particionadas"""
+    if isinstance(obj, Contract):
+        if obj.id is not None:
+            return id_bucket(obj.id)
+        return user_bucket(obj.user_id)
+    if isinstance(obj, (ContractParty, DigitalSignature)) and obj.id is not None:
+        return id_bucket(obj.id)
+    if isinstance(obj, ActivityLog) and obj.contract_id is None and obj.contract is None:
+        return user_bucket(obj.user_id or 0)
+    return _contract_bucket(obj)
+
+
+def _conjuncts(clause):
+    if clause is None:
+        return
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        for element in clause.clauses:
+            yield from _conjuncts(element)
+    else:
+        yield clause
+
+
+def _criteria(statement):
+    """Condições ligadas por AND no WHERE, incluindo as de subqueries usadas como FROM (ex.: COUNT da paginação)"""
+    yield from _conjuncts(getattr(statement, 'whereclause', None))
+    if isinstance(statement, Select):
+        for from_ in statement.get_final_froms():
+            if isinstance(from_, Subquery) and isinstance(from_.element, Select):
+                yield from _criteria(from_.element)
+
+
+class ShardRouter:
+    """Escolhe o shard de objetos, buscas por id e statements a partir do mapa bucket -> shard"""
+
+    def __init__(self, global_engine, engines, bucket_map, retiring=()):
+        self.engines = engines
+        self.shards = tuple(engines)
+        # Shards que recebem buckets no rebalanceamento; os demais estão sendo retirados
+        self.active = tuple(name for name in self.shards if name not in retiring)
+        self.bucket_map = bucket_map
+        self.binds = dict(engines, **{GLOBAL: global_engine})
+
+    def shard_for_bucket(self, bucket):
+        return self.bucket_map[bucket]
+
+    def shard_for_user(self, user_id):
+        return self.bucket_map[user_bucket(user_id)]
+
+    def shard_for_instance(self, obj):
+        if obj.__table__.name not in SHARDED_TABLES:
+            return GLOBAL
+        return self.bucket_map[instance_bucket(obj)]
+
+    def shard_chooser(self, mapper, instance, clause=None, **kw):
+        if instance is not None:
+            return self.shard_for_instance(instance)
+        if mapper is not None and mapper.persist_selectable.name in SHARDED_TABLES:
+            raise ValueError(f'{mapper.class_.__name__}: informe o objeto ou o shard_id para escolher o shard')
+        return GLOBAL
+
+    def identity_chooser(self, mapper, primary_key, *, lazy_loaded_from=None, **kw):
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token is not None:
+            return [lazy_loaded_from.identity_token]
+        tabela = mapper.persist_selectable.name
+        if tabela in ENCODED_ID_TABLES:
+            return [self.bucket_map[id_bucket(primary_key[0])]]
+        if tabela in SHARDED_TABLES:
+            return list(self.shards)
+        return [GLOBAL]
+
+    def _shards_for(self, criterion, params):
+        if not isinstance(criterion, BinaryExpression) or not isinstance(criterion.right, BindParameter):
+            return None
+        if criterion.operator not in (operators.eq, operators.in_op):
+            return None
+        column = criterion.left
+        table = getattr(column, 'table', None)
+        route = ROUTING_COLUMNS.get(getattr(table, 'name', None), {}).get(getattr(column, 'name', None))
+        if route is None:
+            return None
+        bind = criterion.right
+        value = params[bind.key] if isinstance(params, dict) and bind.key in params else bind.effective_value
+        values = value if criterion.operator is operators.in_op else [value]
+        try:
+            return {self.bucket_map[route(v)] for v in values if v is not None}
+        except (TypeError, ValueError):
+            return None
+
+    def execute_chooser(self, context):
+        """Shards de um statement.
+
+        Sem tabelas particionadas vai ao banco global. Com elas, cada condição
+        por id codificado, user_id ou contract_id restringe os shards; sem
+        nenhuma, a consulta roda em todos e as linhas são concatenadas (uma
+        agregação devolve então uma linha por shard).
+        """
+        statement = context.statement
+        tables = {
+            table.name for table in find_tables(statement, check_columns=True, include_crud=True) if table is not None
+        }
+        if not tables.intersection(SHARDED_TABLES):
+            return [GLOBAL]
+        chosen = None
+        for criterion in _criteria(statement):
+            shards = self._shards_for(criterion, context.parameters)
+            if shards is not None:
+                chosen = shards if chosen is None else chosen & shards
+        if chosen is None:
+            return list(self.shards)
+        # Condições sem linhas possíveis: basta um shard para devolver o resultado vazio
+        return [shard for shard in self.shards if shard in chosen] or [self.shards[0]]
+
+
+class ShardRoutingSession(ShardedSession):
+    """Sessão do Flask-SQLAlchemy que encaminha cada objeto e consulta ao seu shard"""
+
+    def __init__(self, db, router, **kwargs):
+        self.router = router
+        super().__init__(
+            shard_chooser=router.shard_chooser,
+            identity_chooser=router.identity_chooser,
+            execute_chooser=router.execute_chooser,
+            shards=router.binds,
+            **kwargs,
+        )
+
+
+@event.listens_for(ShardRoutingSession, 'before_flush')
+def _assign_encoded_ids(session, flush_context, instances):
+    """Reserva, na conexão do próprio shard, os ids dos contratos, partes e assinaturas novos"""
+    for tabela in ENCODED_ID_TABLES:
+        # Contratos primeiro: partes e assinaturas do mesmo flush usam o id do contrato
+        groups = {}
+        for obj in session.new:
+            if obj.__table__.name == tabela and obj.id is None:
+                groups.setdefault(session.router.shard_for_instance(obj), []).append(obj)
+        for shard, group in groups.items():
+            conn = session.connection(bind_arguments={'shard_id': shard})
+            proximo = conn.execute(
+                update(shard_sequences)
+                .where(shard_sequences.c.tabela == tabela)
+                .values(proximo=shard_sequences.c.proximo + len(group))
+                .returning(shard_sequences.c.proximo)
+            ).scalar_one()
+            for sequence, obj in enumerate(group, start=proximo - len(group)):
+                obj.id = sequence * BUCKETS + instance_bucket(obj)
+
+
+def _unscoped(session):
+    return session() if isinstance(session, scoped_session) else session
+
+
+def bind_arguments_for(session, obj):
+    """bind_arguments que levam uma escrita ao shard do objeto; vazio sem sharding"""
+    session = _unscoped(session)
+    if isinstance(session, ShardRoutingSession):
+        return {'shard_id': session.router.shard_for_instance(obj)}
+    return {}
+
+
+def shard_bind_arguments(session):
+    """Um bind_arguments por shard (um só, vazio, sem sharding) para percorrer as tabelas shard a shard"""
+    session = _unscoped(session)
+    if isinstance(session, ShardRoutingSession):
+        return [{'shard_id': shard} for shard in session.router.shards]
+    return [{}]
+
+
+def shard_engines(app):
+    router = app.extensions.get('sharding')
+    return list(router.engines.values()) if router is not None else []
+
+
+def _create_engine(url):
+    engine = create_engine(url, connect_args={'timeout': 30} if url.startswith('sqlite') else {})
+    if url.startswith('sqlite'):
+        @event.listens_for(engine, 'connect')
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.close()
+    return engine
+
+
+def create_shard_schema(engine, name=None):
+    """Cria as tabelas particionadas e as sequências num shard (idempotente)
+
+    Com `name`, grava o nome do shard na primeira vez e recusa um banco que
+    foi criado com outro nome (SHARD_URLS reordenado ou com um shard do meio removido).
+    """
+    tables = [model.__table__ for model in SHARDED_MODELS]
+    db.metadata.create_all(engine, tables=tables)
+    shard_metadata.create_all(engine, tables=[shard_sequences, shard_info])
+    with engine.begin() as conn:
+        if name is not None:
+            recorded = conn.execute(select(shard_info.c.nome)).scalar()
+            if recorded is None:
+                conn.execute(insert(shard_info).values(nome=name))
+            elif recorded != name:
+                raise RuntimeError(f'O banco de {name} foi criado como {recorded}: a ordem dos shards mudou')
+        existing = set(conn.execute(select(shard_sequences.c.tabela)).scalars())
+        missing = [{'tabela': tabela, 'proximo': 1} for tabela in ENCODED_ID_TABLES if tabela not in existing]
+        if missing:
+            conn.execute(insert(shard_sequences), missing)
+
+
+def default_shard(bucket, shard_names):
+    return shard_names[bucket % len(shard_names)]
+
+
+def _load_bucket_map(global_engine, shard_names, active_names):
+    shard_metadata.create_all(global_engine, tables=[shard_buckets])
+    with global_engine.begin() as conn:
+        rows = dict(conn.execute(select(shard_buckets.c.bucket, shard_buckets.c.shard)).all())
+        if not rows:
+            rows = {bucket: default_shard(bucket, active_names) for bucket in range(BUCKETS)}
+            conn.execute(insert(shard_buckets), [{'bucket': b, 'shard': s} for b, s in rows.items()])
+    unknown = set(rows.values()) - set(shard_names)
+    if unknown or len(rows) != BUCKETS:
+        raise RuntimeError(
+            'Mapa de buckets inconsistente com SHARD_URLS e SHARD_RETIRING_URLS '
+            f"(shards ausentes: {', '.join(sorted(unknown))}); para remover um shard, "
+            'mova a URL dele para SHARD_RETIRING_URLS e rode `flask shards rebalance`'
+        )
+    return [rows[bucket] for bucket in range(BUCKETS)]
+
+
+def init_sharding(app):
+    """Com SHARD_URLS, espalha as tabelas dos usuários pelos shards e usa a sessão roteada neste app.
+
+    Os shards se chamam shard0..shardN-1 na ordem de SHARD_URLS; o mapa
+    bucket -> shard fica no banco global e só muda com `flask shards rebalance`.
+    SHARD_RETIRING_URLS lista, na ordem antiga, os últimos shards que estão
+    saindo: eles continuam com os nomes shardN.. e atendendo os seus buckets
+    até o rebalanceamento movê-los para os shards de SHARD_URLS.
+    """
+    app.config.setdefault('SHARD_URLS', [])
+    app.config.setdefault('SHARD_RETIRING_URLS', [])
+    if not app.config['SHARD_URLS']:
+        return None
+
+    with app.app_context():
+        global_engine = db.engine
+    urls = [*app.config['SHARD_URLS'], *app.config['SHARD_RETIRING_URLS']]
+    engines = {f'shard{i}': _create_engine(url) for i, url in enumerate(urls)}
+    for name, engine in engines.items():
+        create_shard_schema(engine, name)
+    shard_names = list(engines)
+    active_names = shard_names[:len(app.config['SHARD_URLS'])]
+    bucket_map = _load_bucket_map(global_engine, shard_names, active_names)
+    router = ShardRouter(global_engine, engines, bucket_map, retiring=shard_names[len(active_names):])
+
+    app.extensions[SESSION_FACTORY] = functools.partial(ShardRoutingSession, router=router)
+    app.extensions['sharding'] = router
+    return router
+
+
+def _bucket_filter(table, buckets):
+    column = table.c.id if table.name == 'contracts' else table.c.contract_id
+    return (column % BUCKETS).in_(buckets)
+
+
+def _move_table(table, buckets, source, target, batch_size):
+    """Copia as linhas dos buckets de source para target; devolve quantas e o maior id codificado"""
+    encoded = table.name in ENCODED_ID_TABLES
+    columns = [column for column in table.c if encoded or column.name != 'id']
+    filters = [_bucket_filter(table, buckets)]
+    if table.name == 'activity_logs':
+        filters = [_bucket_filter(table, buckets) | table.c.contract_id.is_(None)]
+    # Restos de uma execução interrompida antes da troca do mapa
+    _delete_moved(target, table, buckets)
+
+    moved, max_id = 0, 0
+    result = source.execute(select(table).where(*filters).order_by(*table.primary_key.columns))
+    while True:
+        rows = result.mappings().fetchmany(batch_size)
+        if not rows:
+            break
+        if table.name == 'activity_logs':
+            # Sem contrato, o log segue o bucket do usuário
+            rows = [row for row in rows if row['contract_id'] is not None or user_bucket(row['user_id'] or 0) in buckets]
+        if not rows:
+            continue
+        target.execute(insert(table), [{column.name: row[column.name] for column in columns} for row in rows])
+        moved += len(rows)
+        if encoded:
+            max_id = max(max_id, rows[-1]['id'])
+    return moved, max_id
+
+
+def _delete_moved(conn, table, buckets):
+    conn.execute(delete(table).where(_bucket_filter(table, buckets)))
+    if table.name == 'activity_logs':
+        orphan_ids = [
+            row.id for row in conn.execute(
+                select(table.c.id, table.c.user_id).where(table.c.contract_id.is_(None))
+            ) if user_bucket(row.user_id or 0) in buckets
+        ]
+        for start in range(0, len(orphan_ids), 500):
+            conn.execute(delete(table).where(table.c.id.in_(orphan_ids[start:start + 500])))
+
+
+def rebalance(router, batch_size=1000, dry_run=False, log=print):
+    """Move cada bucket para o shard padrão da configuração atual (bucket % número de shards ativos).
+
+    Para cada par (origem, destino): copia as linhas e ajusta as sequências do
+    destino numa transação, troca o mapa no banco global e só então apaga da
+    origem. Deve rodar com os workers parados; eles leem o mapa ao iniciar.
+    """
+    moves = {}
+    for bucket, current in enumerate(router.bucket_map):
+        target = default_shard(bucket, router.active)
+        if target != current:
+            moves.setdefault((current, target), []).append(bucket)
+    for (source_name, target_name), buckets in sorted(moves.items()):
+        log(f'{source_name} -> {target_name}: {len(buckets)} buckets')
+        if dry_run:
+            continue
+        source_engine, target_engine = router.engines[source_name], router.engines[target_name]
+        with source_engine.connect() as source, target_engine.begin() as target:
+            for table in (model.__table__ for model in SHARDED_MODELS):
+                moved, max_id = _move_table(table, buckets, source, target, batch_size)
+                if moved and table.name in ENCODED_ID_TABLES:
+                    target.execute(
+                        update(shard_sequences)
+                        .where(shard_sequences.c.tabela == table.name)
+                        .values(proximo=func.max(shard_sequences.c.proximo, max_id // BUCKETS + 1))
+                    )
+                log(f'  {table.name}: {moved} linhas copiadas')
+        with router.binds[GLOBAL].begin() as conn:
+            conn.execute(update(shard_buckets).where(shard_buckets.c.bucket.in_(buckets)).values(shard=target_name))
+        for bucket in buckets:
+            router.bucket_map[bucket] = target_name
+        with source_engine.begin() as source:
+            for table in (model.__table__ for model in reversed(SHARDED_MODELS)):
+                _delete_moved(source, table, buckets)
+    return moves
+
+
+def per_shard(session, statement):
+    """Executa o statement em cada shard separadamente, para agregações administrativas: [(shard, linhas)]"""
+    return [
+        (bind_arguments.get('shard_id'), session.execute(statement, bind_arguments=bind_arguments).all())
+        for bind_arguments in shard_bind_arguments(session)
+    ]
+
+
+def shard_stats(router):
+    """Buckets e linhas por tabela em cada shard"""
+    stats = {shard: {'buckets': router.bucket_map.count(shard)} for shard in router.shards}
+    for table in SHARDED_TABLES:
+        for shard, rows in per_shard(db.session, select(func.count()).select_from(db.metadata.tables[table])):
+            stats[shard][table] = rows[0][0]
+    return stats
+
+
+def _require_router():
+    router = current_app.extensions.get('sharding')
+    if router is None:
+        raise click.ClickException('Sharding desligado: defina SHARD_URLS')
+    return router
+
+
+@shards_cli.command('rebalance')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Só mostra quais buckets mudariam de shard')
+@with_appcontext
+def rebalance_command(batch_size, dry_run):
+    """Redistribui os buckets depois de adicionar shards em SHARD_URLS ou de movê-los para SHARD_RETIRING_URLS"""
+    moves = rebalance(_require_router(), batch_size=batch_size, dry_run=dry_run, log=click.echo)
+    total = sum(len(buckets) for buckets in moves.values())
+    click.echo(f"{total} buckets {'a mover' if dry_run else 'movidos'}")
+
+
+@shards_cli.command('stats')
+@with_appcontext
+def stats_command():
+    """Mostra buckets e quantidade de linhas de cada shard"""
+    for name, counts in shard_stats(_require_router()).items():
+        click.echo(f'{name}: ' + ', '.join(f'{key}={value}' for key, value in counts.items()))
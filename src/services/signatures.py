@@ -0,0 +1,189 @@
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from src.models.user import db, ContractSignatureStats, DigitalSignature
+from src.services.background import start_periodic
+from src.services.metrics import registry
+from src.services.response_cache import mark_contracts_changed
+from src.services.sharding import bind_arguments_for, shard_bind_arguments, shard_engines
+
+logger = logging.getLogger(__name__)
+
+signatures = DigitalSignature.__table__
+stats = ContractSignatureStats.__table__
+
+# Status da assinatura -> coluna do contador em contract_signature_stats
+STATUS_COLUMNS = {'pendente': 'pendentes', 'assinado': 'assinadas', 'rejeitado': 'rejeitadas', 'expirado': 'expiradas'}
+
+signatures_expired_total = registry.counter(
+    'signatures_expired_total', 'Assinaturas pendentes marcadas como expiradas'
+)
+
+
+def apply_status_deltas(conn, deltas):
+    """Soma as variações {contract_id: Counter(status)} aos contadores de cada contrato.
+
+    Contrato sem linha de contadores ganha uma contada direto das assinaturas,
+    que na mesma transação já incluem as mudanças.
+    """
+    deltas = {contract_id: delta for contract_id, delta in deltas.items() if any(delta.values())}
+    if not deltas:
+        return
+    agora = datetime.utcnow()
+    existing = set(conn.execute(
+        select(stats.c.contract_id).where(stats.c.contract_id.in_(list(deltas)))
+    ).scalars())
+
+    if existing:
+        conn.execute(
+            update(stats).where(stats.c.contract_id == bindparam('b_contract_id')).values(
+                updated_at=agora,
+                **{column: getattr(stats.c, column) + bindparam(f'b_{column}') for column in STATUS_COLUMNS.values()}
+            ),
+            [
+                {'b_contract_id': contract_id,
+                 **{f'b_{column}': deltas[contract_id][status] for status, column in STATUS_COLUMNS.items()}}
+                for contract_id in existing
+            ]
+        )
+
+    missing = [contract_id for contract_id in deltas if contract_id not in existing]
+    if missing:
+        conn.execute(insert(stats), list(count_statuses(conn, missing, agora).values()))
+
+
+def count_statuses(conn, contract_ids, updated_at=None):
+    """Linhas de contract_signature_stats contadas direto das assinaturas: {contract_id: colunas}"""
+    rows = {
+        contract_id: {'contract_id': contract_id, 'updated_at': updated_at, **dict.fromkeys(STATUS_COLUMNS.values(), 0)}
+        for contract_id in contract_ids
+    }
+    counts = conn.execute(
+        select(signatures.c.contract_id, signatures.c.status, func.count())
+        .where(signatures.c.contract_id.in_(list(contract_ids)))
+        .group_by(signatures.c.contract_id, signatures.c.status)
+    )
+    for contract_id, status, count in counts:
+        if status in STATUS_COLUMNS:
+            rows[contract_id][STATUS_COLUMNS[status]] = count
+    return rows
+
+
+def signature_stats(session, contract_id):
+    """Contadores de assinaturas do contrato.
+
+    Contratos cujas assinaturas são anteriores à tabela de contadores não têm
+    linha nela; para eles a contagem é feita na hora, sem gravar (a leitura
+    pode estar numa réplica). A primeira mudança de assinatura grava a linha.
+    """
+    row = session.get(ContractSignatureStats, contract_id)
+    if row is None:
+        row = ContractSignatureStats(**count_statuses(session, [contract_id])[contract_id])
+    return row
+
+
+@event.listens_for(DigitalSignature.status, 'set', active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    # Carrega o status anterior mesmo com o atributo expirado, para o contador sair da coluna certa
+    return value
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_signature_statuses(session, flush_context):
+    """Atualiza os contadores por contrato na mesma transação que criou ou mudou a assinatura"""
+    deltas = {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, DigitalSignature):
+            continue
+        if obj in session.new:
+            changes = [(obj.status or 'pendente', 1)]
+        elif obj in session.deleted:
+            changes = [(inspect(obj).attrs.status.loaded_value, -1)]
+        else:
+            history = inspect(obj).attrs.status.history
+            if not history.has_changes():
+                continue
+            changes = [(status, -1) for status in history.deleted] + [(status, 1) for status in history.added]
+        delta = deltas.setdefault(obj, Counter())
+        for status, amount in changes:
+            if status in STATUS_COLUMNS:
+                delta[status] += amount
+
+    by_shard = {}
+    for obj, delta in deltas.items():
+        bind_arguments = bind_arguments_for(session, obj)
+        contract_deltas = by_shard.setdefault(bind_arguments.get('shard_id'), (bind_arguments, {}))[1]
+        contract_deltas.setdefault(obj.contract_id, Counter()).update(delta)
+    for bind_arguments, contract_deltas in by_shard.values():
+        apply_status_deltas(session.connection(bind_arguments=bind_arguments), contract_deltas)
+
+
+def expire_overdue_signatures(app, max_age, batch_size=500, pause=0.0):
+    """Marca como expiradas as assinaturas pendentes criadas antes de agora - max_age.
+
+    Cada lote é um UPDATE de até batch_size linhas, escolhidas pelo índice
+    (status, created_at), numa transação curta junto com os contadores dos
+    contratos; o custo acompanha o número de assinaturas expiradas, não o
+    tamanho da tabela. Devolve quantas foram expiradas.
+    """
+    cutoff = datetime.utcnow() - max_age
+    expired = 0
+    with app.app_context():
+        for bind_arguments in shard_bind_arguments(db.session):
+            while True:
+                overdue = (
+                    select(signatures.c.id)
+                    .where(signatures.c.status == 'pendente', signatures.c.created_at < cutoff)
+                    .order_by(signatures.c.status, signatures.c.created_at)
+                    .limit(batch_size)
+                )
+                contract_ids = db.session.execute(
+                    update(signatures)
+                    .where(signatures.c.id.in_(overdue), signatures.c.status == 'pendente')
+                    .values(status='expirado')
+                    .returning(signatures.c.contract_id),
+                    bind_arguments=bind_arguments
+                ).scalars().all()
+                if contract_ids:
+                    deltas = {}
+                    for contract_id, count in Counter(contract_ids).items():
+                        deltas[contract_id] = Counter({'pendente': -count, 'expirado': count})
+                    apply_status_deltas(db.session.connection(bind_arguments=bind_arguments), deltas)
+                    mark_contracts_changed(db.session, deltas)
+                db.session.commit()
+                expired += len(contract_ids)
+                if len(contract_ids) < batch_size:
+                    break
+                # Libera o lock de escrita entre lotes para as requisições
+                if pause:
+                    time.sleep(pause)
+    if expired:
+        signatures_expired_total.inc(expired)
+        logger.info('%d assinaturas pendentes expiradas', expired)
+    return expired
+
+
+def init_signature_expiry(app):
+    """Garante os índices de assinaturas e agenda o sweeper das pendentes"""
+    app.config.setdefault('SIGNATURE_EXPIRY_SECONDS', 7 * 24 * 3600)
+    app.config.setdefault('SIGNATURE_SWEEP_INTERVAL', 300)
+    app.config.setdefault('SIGNATURE_SWEEP_BATCH_SIZE', 500)
+    app.config.setdefault('SIGNATURE_SWEEP_PAUSE', 0.01)
+
+    # create_all não cria índices em tabelas que já existem
+    with app.app_context():
+        engines = [db.engine, *shard_engines(app)]
+    for engine in engines:
+        for index in signatures.indexes:
+            index.create(engine, checkfirst=True)
+
+    if app.config['SIGNATURE_EXPIRY_SECONDS'] and app.config['SIGNATURE_SWEEP_INTERVAL']:
+        start_periodic('signature-expiry', app.config['SIGNATURE_SWEEP_INTERVAL'], lambda: expire_overdue_signatures(
+            app, timedelta(seconds=app.config['SIGNATURE_EXPIRY_SECONDS']),
+            batch_size=app.config['SIGNATURE_SWEEP_BATCH_SIZE'], pause=app.config['SIGNATURE_SWEEP_PAUSE']
+        ))
@@ -0,0 +1,179 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import Response, send_file
+from flask.cli import AppGroup
+
+static_cli = AppGroup('static', help='Arquivos estáticos do frontend')
+
+# Nomes com hash hexadecimal de conteúdo (app.3f9a1c2b.js) nunca mudam de conteúdo
+HASHED_NAME = re.compile(r'[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$')
+# Manifesto do build do Vite: lista os arquivos gerados com hash (index-BkX9a2Qd.css)
+BUILD_MANIFESTS = ('.vite/manifest.json', 'manifest.json')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'application/xml', 'application/wasm')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+
+class StaticAsset:
+    __slots__ = ('path', 'mimetype', 'etag', 'cache_control', 'variants', 'data')
+
+    def __init__(self, path, mimetype, etag, cache_control, variants, data=None):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.cache_control = cache_control
+        self.variants = variants
+        self.data = data
+
+
+def _build_hashed_files(root):
+    """Caminhos (relativos a root) que o manifesto do build declara como saída com hash"""
+    for name in BUILD_MANIFESTS:
+        try:
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        files = set()
+        for chunk in manifest.values() if isinstance(manifest, dict) else ():
+            if isinstance(chunk, dict):
+                files.update(
+                    path for path in (chunk.get('file'), *chunk.get('css', ()), *chunk.get('assets', ()))
+                    if isinstance(path, str)
+                )
+        return files
+    return set()
+
+
+def _file_etag(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+class StaticManifest:
+    """Índice em memória da pasta static/ montado na inicialização.
+
+    Resolve cada requisição sem tocar no sistema de arquivos para decidir o
+    que servir: escolhe a variante pré-comprimida (.br/.gz) conforme o
+    Accept-Encoding, responde 304 a requisições condicionais e serve o
+    index.html do SPA a partir da memória.
+    """
+
+    def __init__(self, root, index_name='index.html'):
+        self.root = root
+        self.index_name = index_name
+        self.assets = {}
+        self.index = None
+        self.build()
+
+    def build(self):
+        assets = {}
+        hashed_files = _build_hashed_files(self.root)
+        for dirpath, _, filenames in os.walk(self.root):
+            names = set(filenames)
+            for name in filenames:
+                if name.endswith(('.gz', '.br')) and name[:-3] in names:
+                    continue
+                full_path = os.path.join(dirpath, name)
+                rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                etag = _file_etag(full_path)
+                variants = {
+                    encoding: full_path + suffix
+                    for encoding, suffix in ENCODINGS
+                    if name + suffix in names
+                }
+                immutable = rel_path in hashed_files or HASHED_NAME.search(name)
+                cache_control = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+                assets[rel_path] = StaticAsset(full_path, mimetype, etag, cache_control, variants)
+
+        index = assets.get(self.index_name)
+        if index is not None:
+            with open(index.path, 'rb') as f:
+                index.data = f.read()
+        self.assets = assets
+        self.index = index
+
+    def _pick_encoding(self, asset, request):
+        for encoding, _ in ENCODINGS:
+            if encoding in asset.variants and request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def serve(self, path, request):
+        asset = self.assets.get(path) if path else None
+        if asset is None:
+            asset = self.index
+            if asset is None:
+                return "index.html not found", 404
+
+        encoding = self._pick_encoding(asset, request)
+        etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif asset.data is not None and encoding is None:
+            response = Response(asset.data, mimetype=asset.mimetype)
+        else:
+            response = send_file(asset.variants[encoding] if encoding else asset.path,
+                                 mimetype=asset.mimetype, conditional=False, etag=False)
+            if encoding:
+                # O nome do arquivo .gz/.br não deve aparecer para o cliente
+                response.headers.pop('Content-Disposition', None)
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = asset.cache_control
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        return response
+
+
+def precompress(root, min_size=1024, level=9):
+    """Gera as variantes .gz (e .br, se o pacote brotli estiver instalado) dos arquivos compressíveis"""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    created = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(('.gz', '.br')):
+                continue
+            mimetype = mimetypes.guess_type(name)[0] or ''
+            full_path = os.path.join(dirpath, name)
+            if not mimetype.startswith(COMPRESSIBLE_TYPES) or os.path.getsize(full_path) < min_size:
+                continue
+            with open(full_path, 'rb') as f:
+                data = f.read()
+            with open(full_path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=level, mtime=0))
+            created.append(full_path + '.gz')
+            if brotli is not None:
+                with open(full_path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+                created.append(full_path + '.br')
+    return created
+
+
+@static_cli.command('compress')
+@click.option('--min-size', default=1024, show_default=True, help='Tamanho mínimo em bytes')
+def compress_command(min_size):
+    """Pré-comprime os arquivos de static/ para servir .gz/.br"""
+    from flask import current_app
+
+    for path in precompress(current_app.static_folder, min_size=min_size):
+        click.echo(path)
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert, select, text
+
+from src.models.user import (
+    db, User, ContractTemplate, Contract, ContractParty, DigitalSignature, ActivityLog
+)
+from src.routes.contracts import generate_contract_content
+from src.services.signatures import count_statuses, stats
+from src.utils.cpf import cpf_from_number, is_valid_cpf
+
+# Data base fixa para que a mesma semente gere sempre os mesmos dados
+BASE_DATE = datetime(2024, 1, 1)
+PERIOD_DAYS = 730
+
+# Hash fixo: os usuários sintéticos não precisam de senha utilizável
+SYNTHETIC_PASSWORD_HASH = 'synthetic$' + hashlib.sha256(b'synthetic').hexdigest()
+
+# Multiplicador coprimo com 10^9: mapeia índices em CPFs distintos
+CPF_MULTIPLIER = 387_420_489
+
+FIRST_NAMES = [
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique',
+    'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael',
+    'Sofia', 'Thiago', 'Vitória', 'William'
+]
+LAST_NAMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+    'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes'
+]
+CITIES = ['São Paulo - SP', 'Rio de Janeiro - RJ', 'Belo Horizonte - MG', 'Curitiba - PR',
+          'Porto Alegre - RS', 'Salvador - BA', 'Recife - PE', 'Brasília - DF']
+PROFESSIONS = ['Pintor', 'Pedreiro', 'Eletricista', 'Cuidador de animais', 'Designer',
+               'Desenvolvedor', 'Consultor', 'Professor']
+SERVICES = ['Pintura de apartamento de 2 quartos', 'Reforma de banheiro',
+            'Instalação elétrica da cozinha', 'Passeios diários com cachorro',
+            'Desenvolvimento de site institucional', 'Aulas particulares de matemática']
+PAYMENT_METHODS = ['PIX à vista', '50% na assinatura e 50% na entrega', 'Boleto em 3 parcelas']
+STATUS_WEIGHTS = [('rascunho', 20), ('gerado', 50), ('assinado', 25), ('cancelado', 5)]
+
+# As partes dos contratos são sorteadas de um conjunto pré-gerado de pessoas
+PARTY_POOL_SIZE = 5000
+
+USER_SCOPED_TABLES = ['users', 'contracts', 'contract_parties', 'digital_signatures', 'activity_logs']
+
+# Contratos por consulta ao recontar as assinaturas (abaixo do limite de variáveis do SQLite)
+STATS_BATCH_SIZE = 500
+
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _person(rng, cpf_number):
+    nome = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}'
+    slug = nome.lower().replace(' ', '.')
+    return {
+        'nome_completo': nome,
+        'cpf': cpf_from_number(cpf_number),
+        'rg': f'{rng.randrange(10_000_000, 99_999_999)}',
+        'endereco': f'Rua {rng.choice(LAST_NAMES)}, {rng.randrange(1, 3000)} - {rng.choice(CITIES)}',
+        'telefone': f'(11) 9{rng.randrange(1000, 9999)}-{rng.randrange(1000, 9999)}',
+        'email': f'{slug}{rng.randrange(1000)}@example.com',
+        'profissao': rng.choice(PROFESSIONS),
+    }
+
+
+def _contract_data(rng, inicio):
+    return {
+        'data_inicio': inicio.strftime('%d/%m/%Y'),
+        'data_fim': (inicio + timedelta(days=rng.randrange(7, 365))).strftime('%d/%m/%Y'),
+        'valor': f'R$ {rng.randrange(200, 50_000)},00',
+        'descricao_servico': rng.choice(SERVICES),
+        'forma_pagamento': rng.choice(PAYMENT_METHODS),
+        'clausulas_especiais': 'Não há.',
+    }
+
+
+def _ts(value):
+    """Formata datas como o tipo DateTime do SQLAlchemy grava no SQLite"""
+    return value.isoformat(' ', 'microseconds')
+
+
+def _pick_status(rng):
+    return rng.choices([s for s, _ in STATUS_WEIGHTS], weights=[w for _, w in STATUS_WEIGHTS])[0]
+
+
+def _drop_indexes(conn, tables):
+    """Remove os índices secundários das tabelas e devolve o SQL para recriá-los"""
+    placeholders = ', '.join(f':t{i}' for i in range(len(tables)))
+    rows = conn.execute(
+        text(f"SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+             f"AND sql IS NOT NULL AND tbl_name IN ({placeholders})"),
+        {f't{i}': table for i, table in enumerate(tables)}
+    ).all()
+    for name, _ in rows:
+        conn.execute(text(f'DROP INDEX "{name}"'))
+    return [sql for _, sql in rows]
+
+
+class _BatchWriter:
+    """Acumula linhas por tabela e grava com executemany direto no driver"""
+
+    def __init__(self, conn, batch_size):
+        self.cursor = conn.connection.cursor()
+        self.batch_size = batch_size
+        self.pending = {}
+        self.counts = {}
+        self.statements = {}
+
+    def _statement(self, model):
+        if model not in self.statements:
+            columns = [c.name for c in model.__table__.columns]
+            self.statements[model] = (
+                f'INSERT INTO {model.__tablename__} ({", ".join(columns)}) '
+                f'VALUES ({", ".join(":" + c for c in columns)})'
+            )
+        return self.statements[model]
+
+    def add(self, model, row):
+        rows = self.pending.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        models = [model] if model is not None else list(self.pending)
+        for m in models:
+            rows = self.pending.get(m)
+            if rows:
+                self.cursor.executemany(self._statement(m), rows)
+                self.counts[m.__tablename__] = self.counts.get(m.__tablename__, 0) + len(rows)
+                self.pending[m] = []
+
+
+def generate_synthetic_data(users=1000, contracts_per_user=5, seed=42, batch_size=5000,
+                            defer_indexes=True, log=print):
+    """Gera usuários, contratos, partes, assinaturas e logs sintéticos.
+
+    Os dados são determinísticos para uma mesma semente e base vazia. Os
+    registros são inseridos em lote numa única conexão; com defer_indexes
+    os índices secundários são recriados só ao final da carga. Como o lote
+    não passa pelos eventos do ORM, os contadores de assinaturas são
+    recontados no fim; os contratos gerados não têm revisões, e o histórico
+    começa na primeira alteração.
+    """
+    if current_app.extensions.get('sharding') is not None:
+        # Os INSERTs diretos iriam todos para o banco global, fora dos shards e sem ids codificados
+        raise RuntimeError('A carga sintética grava direto no banco global; rode-a sem SHARD_URLS')
+
+    rng = random.Random(seed)
+    templates = db.session.execute(
+        select(ContractTemplate.id, ContractTemplate.contract_type_id, ContractTemplate.conteudo_template)
+        .order_by(ContractTemplate.id)
+    ).all()
+    if not templates:
+        raise RuntimeError('Nenhum template cadastrado; rode a carga inicial antes')
+
+    next_user_id = _next_id(User)
+    next_contract_id = first_contract_id = _next_id(Contract)
+    next_party_id = _next_id(ContractParty)
+    next_signature_id = _next_id(DigitalSignature)
+    next_log_id = _next_id(ActivityLog)
+    db.session.rollback()
+
+    started = time.monotonic()
+    people = [_person(rng, rng.randrange(1_000_000_000)) for _ in range(PARTY_POOL_SIZE)]
+    with db.engine.begin() as conn:
+        conn.execute(text('PRAGMA synchronous=OFF'))
+        conn.execute(text('PRAGMA cache_size=-262144'))
+        index_sql = _drop_indexes(conn, USER_SCOPED_TABLES) if defer_indexes else []
+        writer = _BatchWriter(conn, batch_size)
+
+        for u in range(users):
+            user_id = next_user_id + u
+            cpf = cpf_from_number((user_id * CPF_MULTIPLIER) % 1_000_000_000)
+            person = rng.choice(people)
+            user_created = BASE_DATE + timedelta(seconds=rng.randrange(PERIOD_DAYS * 86400))
+            writer.add(User, {
+                'id': user_id,
+                'email': f'usuario{user_id}@example.com',
+                'password_hash': SYNTHETIC_PASSWORD_HASH,
+                'nome_completo': person['nome_completo'],
+                'cpf': cpf if is_valid_cpf(cpf) else None,
+                'telefone': person['telefone'],
+                'created_at': _ts(user_created),
+                'updated_at': _ts(user_created),
+                'is_active': True,
+            })
+
+            for _ in range(rng.randrange(contracts_per_user * 2 + 1)):
+                contract_id = next_contract_id
+                next_contract_id += 1
+                template_id, contract_type_id, conteudo_template = rng.choice(templates)
+                created = user_created + timedelta(seconds=rng.randrange(90 * 86400))
+                contratante = rng.choice(people)
+                contratado = rng.choice(people)
+                dados = {
+                    'contratante': contratante,
+                    'contratado': contratado,
+                    'contrato': _contract_data(rng, created),
+                }
+                status = _pick_status(rng)
+                conteudo_final = hash_documento = None
+                if status in ('gerado', 'assinado'):
+                    conteudo_final = generate_contract_content(conteudo_template, dados, agora=created)
+                    hash_documento = hashlib.sha256(conteudo_final.encode('utf-8')).hexdigest()
+
+                writer.add(Contract, {
+                    'id': contract_id,
+                    'user_id': user_id,
+                    'contract_type_id': contract_type_id,
+                    'template_id': template_id,
+                    'titulo': f"{dados['contrato']['descricao_servico']} - {contratado['nome_completo']}",
+                    'dados_contrato': json.dumps(dados),
+                    'conteudo_final': conteudo_final,
+                    'status': status,
+                    'hash_documento': hash_documento,
+                    'url_documento': None,
+                    'created_at': _ts(created),
+                    'updated_at': _ts(created),
+                })
+
+                for tipo_parte, parte in (('contratante', contratante), ('contratado', contratado)):
+                    writer.add(ContractParty, dict(parte, id=next_party_id, contract_id=contract_id,
+                                                   tipo_parte=tipo_parte, created_at=_ts(created)))
+                    next_party_id += 1
+
+                actions = ['contrato_criado']
+                if status in ('gerado', 'assinado'):
+                    actions.append('contrato_gerado')
+                    signature_status = 'assinado' if status == 'assinado' else (
+                        'pendente' if rng.random() < 0.5 else None)
+                    if signature_status:
+                        signed_at = created + timedelta(hours=rng.randrange(1, 72))
+                        writer.add(DigitalSignature, {
+                            'id': next_signature_id,
+                            'contract_id': contract_id,
+                            'user_id': user_id,
+                            'tipo_assinatura': 'govbr',
+                            'hash_assinatura': hashlib.sha256(
+                                f'{hash_documento}:{next_signature_id}'.encode()).hexdigest()
+                                if signature_status == 'assinado' else None,
+                            'certificado_info': json.dumps({'hash_documento': hash_documento}),
+                            'timestamp_assinatura': _ts(signed_at) if signature_status == 'assinado' else None,
+                            'ip_address': f'10.0.{rng.randrange(256)}.{rng.randrange(256)}',
+                            'user_agent': 'ContratoSmart/1.0 (synthetic)',
+                            'status': signature_status,
+                            'created_at': _ts(created),
+                        })
+                        next_signature_id += 1
+                        if signature_status == 'assinado':
+                            actions.append('contrato_assinado')
+
+                for acao in actions:
+                    writer.add(ActivityLog, {
+                        'id': next_log_id,
+                        'user_id': user_id,
+                        'contract_id': contract_id,
+                        'acao': acao,
+                        'detalhes': json.dumps({'status': status}),
+                        'ip_address': None,
+                        'user_agent': None,
+                        'created_at': _ts(created),
+                    })
+                    next_log_id += 1
+
+            if (u + 1) % 10000 == 0:
+                log(f'{u + 1} usuários gerados ({time.monotonic() - started:.1f}s)')
+
+        writer.flush()
+        if index_sql:
+            log('Recriando índices...')
+            for sql in index_sql:
+                conn.execute(text(sql))
+
+        log('Recontando as assinaturas...')
+        agora = datetime.utcnow()
+        for start in range(first_contract_id, next_contract_id, STATS_BATCH_SIZE):
+            contract_ids = range(start, min(start + STATS_BATCH_SIZE, next_contract_id))
+            conn.execute(insert(stats), list(count_statuses(conn, contract_ids, agora).values()))
+        writer.counts[stats.name] = next_contract_id - first_contract_id
+
+    elapsed = time.monotonic() - started
+    total = sum(writer.counts.values())
+    log(f'{total} linhas inseridas em {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} linhas/s)')
+    return writer.counts
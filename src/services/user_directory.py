@@ -0,0 +1,238 @@
+import base64
+import json
+import string
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from werkzeug.security import generate_password_hash
+
+from src.models.user import db, User
+from src.services.validation import FIELD_CHECKS
+from src.utils.cpf import normalize_cpf
+
+users = User.__table__
+
+# Usuários importados sem senha não conseguem entrar até definirem uma
+UNUSABLE_PASSWORD = '!'
+
+MAX_PAGE_SIZE = 200
+
+# lower() do SQLite só converte A-Z; a busca aplica a mesma regra para usar ix_users_nome_lower
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+nome_key = func.lower(User.nome_completo)
+
+
+class UserDataError(ValueError):
+    """Dados de usuário inválidos; a mensagem vai para o cliente"""
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise UserDataError('cursor inválido')
+    if not isinstance(values, list) or len(values) != size:
+        raise UserDataError('cursor inválido')
+    return values
+
+
+def _prefix_range(column, prefix):
+    # Todas as strings que começam com prefix estão em [prefix, prefix com o último caractere + 1)
+    return (column >= prefix, column < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+def list_users(limit=50, cursor=None, email=None, nome=None):
+    """Página de usuários por keyset; devolve (usuários, cursor da próxima página ou None).
+
+    Sem filtro a ordem é por id; com email, prefixo do e-mail em ordem de
+    e-mail (índice único); com nome, prefixo do nome sem diferenciar A-Z de
+    a-z, em ordem de (lower(nome), id) pelo índice ix_users_nome_lower.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    email = (email or '').strip().lower()
+    nome = (nome or '').strip().translate(_ASCII_LOWER)
+
+    query = select(User)
+    if email:
+        query = query.where(*_prefix_range(User.email, email)).order_by(User.email)
+        if cursor:
+            query = query.where(User.email > decode_cursor(cursor, 1)[0])
+        key = lambda user: [user.email]
+    elif nome:
+        query = query.where(*_prefix_range(nome_key, nome)).order_by(nome_key, User.id)
+        if cursor:
+            after_nome, after_id = decode_cursor(cursor, 2)
+            # Forma que o SQLite usa como início da busca no índice (a comparação de tuplas não é)
+            query = query.where(nome_key >= after_nome, or_(nome_key > after_nome, User.id > after_id))
+        key = lambda user: [user.nome_completo.translate(_ASCII_LOWER), user.id]
+    else:
+        query = query.order_by(User.id)
+        if cursor:
+            query = query.where(User.id > decode_cursor(cursor, 1)[0])
+        key = lambda user: [user.id]
+
+    page = db.session.execute(query.limit(limit + 1)).scalars().all()
+    next_cursor = encode_cursor(key(page[limit - 1])) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def find_by_cpf(cpf):
+    """Usuário pelo CPF, aceito com ou sem pontuação"""
+    normalized = normalize_cpf(cpf)
+    if normalized is None:
+        raise UserDataError('CPF inválido')
+    return db.session.execute(select(User).where(User.cpf == normalized)).scalar_one_or_none()
+
+
+def user_values(data, partial=False):
+    """Valida e normaliza os campos de usuário de uma requisição; devolve o dict das colunas.
+
+    Com partial=True só os campos presentes são validados, como numa atualização.
+    """
+    if not isinstance(data, dict):
+        raise UserDataError('dados do usuário devem ser um objeto')
+    values = {}
+    for field in ('nome_completo', 'email'):
+        if field in data or not partial:
+            valor = data.get(field)
+            if not isinstance(valor, str) or not valor.strip():
+                raise UserDataError(f'{field}: deve ser um texto não vazio')
+            values[field] = valor.strip()
+    if 'email' in values:
+        values['email'] = values['email'].lower()
+        erro = FIELD_CHECKS['email'](values['email'])
+        if erro:
+            raise UserDataError(f'email: {erro}')
+    if data.get('cpf'):
+        values['cpf'] = normalize_cpf(data['cpf'])
+        if values['cpf'] is None:
+            raise UserDataError('cpf: CPF inválido')
+    elif 'cpf' in data or not partial:
+        values['cpf'] = None
+    if data.get('telefone'):
+        erro = FIELD_CHECKS['telefone'](data['telefone'])
+        if erro:
+            raise UserDataError(f'telefone: {erro}')
+        values['telefone'] = data['telefone']
+    elif 'telefone' in data or not partial:
+        values['telefone'] = None
+    if 'is_active' in data:
+        if not isinstance(data['is_active'], bool):
+            raise UserDataError('is_active: deve ser true ou false')
+        values['is_active'] = data['is_active']
+    elif not partial:
+        values['is_active'] = True
+    if data.get('senha') is not None:
+        if not isinstance(data['senha'], str) or len(data['senha']) < 8:
+            raise UserDataError('senha: mínimo de 8 caracteres')
+        values['password_hash'] = generate_password_hash(data['senha'])
+    elif not partial:
+        values['password_hash'] = UNUSABLE_PASSWORD
+    return values
+
+
+def _existing(column, values):
+    if not values:
+        return set()
+    return set(db.session.execute(select(column).where(column.in_(values))).scalars())
+
+
+def import_users(rows, batch_size=1000):
+    """Valida e insere usuários em lotes de batch_size, um commit por lote.
+
+    Linhas inválidas ou com e-mail/CPF já cadastrados (no banco ou antes no
+    mesmo envio) são puladas. Devolve (quantidade criada, [{'indice', 'erro'}]).
+    """
+    created, errors = 0, []
+    seen_emails, seen_cpfs = set(), set()
+    batch = []
+
+    def flush():
+        nonlocal created
+        emails = _existing(User.email, [values['email'] for _, values in batch])
+        cpfs = _existing(User.cpf, [values['cpf'] for _, values in batch if values.get('cpf')])
+        pending = []
+        for indice, values in batch:
+            if values['email'] in emails:
+                errors.append({'indice': indice, 'erro': 'e-mail já cadastrado'})
+            elif values.get('cpf') in cpfs:
+                errors.append({'indice': indice, 'erro': 'CPF já cadastrado'})
+            else:
+                pending.append((indice, values))
+        if pending:
+            try:
+                db.session.execute(insert(users), [values for _, values in pending])
+                db.session.commit()
+                created += len(pending)
+            except IntegrityError:
+                # Cadastro concorrente entre a verificação e o INSERT: insere um a um
+                db.session.rollback()
+                for indice, values in pending:
+                    try:
+                        with db.session.begin_nested():
+                            db.session.execute(insert(users), values)
+                        created += 1
+                    except IntegrityError:
+                        errors.append({'indice': indice, 'erro': 'e-mail ou CPF já cadastrado'})
+                db.session.commit()
+        batch.clear()
+
+    for indice, data in enumerate(rows):
+        try:
+            values = user_values(data)
+        except UserDataError as e:
+            errors.append({'indice': indice, 'erro': str(e)})
+            continue
+        if values['email'] in seen_emails:
+            errors.append({'indice': indice, 'erro': 'e-mail repetido no envio'})
+            continue
+        if values.get('cpf') and values['cpf'] in seen_cpfs:
+            errors.append({'indice': indice, 'erro': 'CPF repetido no envio'})
+            continue
+        seen_emails.add(values['email'])
+        if values.get('cpf'):
+            seen_cpfs.add(values['cpf'])
+        batch.append((indice, values))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    errors.sort(key=lambda erro: erro['indice'])
+    return created, errors
+
+
+def init_user_directory(app):
+    """Garante os índices de busca de usuários"""
+    app.config.setdefault('USER_IMPORT_MAX_ROWS', 5000)
+    # create_all não cria índices em tabelas que já existem, e o checkfirst não enxerga índices de expressão
+    with app.app_context(), db.engine.begin() as conn:
+        for index in users.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+users_cli = AppGroup('users', help='Cadastro de usuários')
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True)
+def import_command(path, batch_size):
+    """Importa usuários de um arquivo JSON Lines (um objeto por linha, campos como em POST /users)"""
+    def rows():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    created, errors = import_users(rows(), batch_size=batch_size)
+    for erro in errors[:20]:
+        click.echo(f"linha {erro['indice'] + 1}: {erro['erro']}")
+    click.echo(f'{created} usuários criados, {len(errors)} linhas rejeitadas')
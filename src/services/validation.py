@@ -0,0 +1,158 @@
+import re
+from datetime import date
+
+from src.utils.cpf import is_valid_cpf
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_DATA_BR = re.compile(r'^(\d{2})/(\d{2})/(\d{4})$')
+_DATA_ISO = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+_TELEFONE = re.compile(r'^[\d\s()+-]{8,20}$')
+
+TIPOS_PARTE = ('contratante', 'contratado', 'testemunha')
+CAMPOS_PARTE = ('nome_completo', 'cpf', 'rg', 'endereco', 'telefone', 'email', 'profissao')
+
+
+def _check_text(valor):
+    if not isinstance(valor, str) or not valor.strip():
+        return 'deve ser um texto não vazio'
+    return None
+
+
+def _check_cpf(valor):
+    if not isinstance(valor, str) or not is_valid_cpf(valor):
+        return 'CPF inválido'
+    return None
+
+
+def _check_email(valor):
+    if not isinstance(valor, str) or not _EMAIL.match(valor):
+        return 'e-mail inválido'
+    return None
+
+
+def _check_telefone(valor):
+    if not isinstance(valor, str) or not _TELEFONE.match(valor):
+        return 'telefone inválido'
+    return None
+
+
+def _check_data(valor):
+    if isinstance(valor, str):
+        match = _DATA_BR.match(valor)
+        if match:
+            dia, mes, ano = match.groups()
+        else:
+            match = _DATA_ISO.match(valor)
+            ano, mes, dia = match.groups() if match else (None, None, None)
+        if match:
+            try:
+                date(int(ano), int(mes), int(dia))
+                return None
+            except ValueError:
+                pass
+    return 'data inválida (use DD/MM/AAAA)'
+
+
+def _check_valor(valor):
+    if isinstance(valor, bool):
+        return 'valor inválido'
+    if isinstance(valor, (int, float)):
+        return None if valor >= 0 else 'valor não pode ser negativo'
+    return _check_text(valor)
+
+
+# Regra de formato por nome de campo; campos sem regra própria exigem texto não vazio
+FIELD_CHECKS = {
+    'cpf': _check_cpf,
+    'email': _check_email,
+    'telefone': _check_telefone,
+    'data_inicio': _check_data,
+    'data_fim': _check_data,
+    'valor': _check_valor,
+}
+
+
+class TemplateValidator:
+    """Regras de um template compiladas numa lista plana de (seção, campo, obrigatório, verificação)"""
+
+    __slots__ = ('sections', 'rules')
+
+    def __init__(self, campos_obrigatorios, campos_opcionais):
+        rules = []
+        sections = []
+        for campos, required in ((campos_obrigatorios, True), (campos_opcionais, False)):
+            for section, fields in (campos or {}).items():
+                if section not in sections:
+                    sections.append(section)
+                for field in fields:
+                    rules.append((section, field, required, FIELD_CHECKS.get(field, _check_text)))
+        self.sections = tuple(sections)
+        self.rules = tuple(rules)
+
+    def validate(self, dados, partes=None):
+        """Retorna a lista com todos os erros de dados_contrato e partes (vazia se válidos)"""
+        errors = []
+        if not isinstance(dados, dict):
+            return [{'campo': 'dados_contrato', 'erro': 'deve ser um objeto'}]
+
+        section_data = {}
+        for section in self.sections:
+            valores = dados.get(section)
+            if valores is None:
+                valores = {}
+            elif not isinstance(valores, dict):
+                errors.append({'campo': f'dados_contrato.{section}', 'erro': 'deve ser um objeto'})
+                valores = {}
+            section_data[section] = valores
+
+        for section, field, required, check in self.rules:
+            valor = section_data[section].get(field)
+            if valor is None or valor == '':
+                if required:
+                    errors.append({'campo': f'dados_contrato.{section}.{field}', 'erro': 'campo obrigatório'})
+                continue
+            message = check(valor)
+            if message:
+                errors.append({'campo': f'dados_contrato.{section}.{field}', 'erro': message})
+
+        if partes is not None:
+            errors.extend(validate_partes(partes))
+        return errors
+
+
+def validate_partes(partes):
+    """Valida a lista de partes enviada na criação do contrato"""
+    if not isinstance(partes, list):
+        return [{'campo': 'partes', 'erro': 'deve ser uma lista'}]
+    errors = []
+    for i, parte in enumerate(partes):
+        if not isinstance(parte, dict):
+            errors.append({'campo': f'partes[{i}]', 'erro': 'deve ser um objeto'})
+            continue
+        if parte.get('tipo_parte') not in TIPOS_PARTE:
+            errors.append({'campo': f'partes[{i}].tipo_parte',
+                           'erro': f"deve ser um de: {', '.join(TIPOS_PARTE)}"})
+        if parte.get('nome_completo') in (None, ''):
+            errors.append({'campo': f'partes[{i}].nome_completo', 'erro': 'campo obrigatório'})
+        for field in CAMPOS_PARTE:
+            valor = parte.get(field)
+            if valor is None or valor == '':
+                continue
+            message = FIELD_CHECKS.get(field, _check_text)(valor)
+            if message:
+                errors.append({'campo': f'partes[{i}].{field}', 'erro': message})
+    return errors
+
+
+_validators = {}
+
+
+def get_validator(template):
+    """Validador do template, compilado uma vez por versão (id, versao, updated_at)"""
+    version = (template.versao, template.updated_at)
+    cached = _validators.get(template.id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    validator = TemplateValidator(template.get_campos_obrigatorios(), template.get_campos_opcionais())
+    _validators[template.id] = (version, validator)
+    return validator
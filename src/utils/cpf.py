@@ -0,0 +1,48 @@
+import functools
+import re
+
+_NAO_DIGITOS = re.compile(r'[^0-9]')
+
+
+def _digito_verificador(digitos):
+    pesos = range(len(digitos) + 1, 1, -1)
+    soma = sum(int(digito) * peso for digito, peso in zip(digitos, pesos))
+    resto = soma % 11
+    return '0' if resto < 2 else str(11 - resto)
+
+
+def format_cpf(digitos):
+    """Formata 11 dígitos no padrão 000.000.000-00"""
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+def normalize_cpf(cpf):
+    """Retorna o CPF formatado ou None se não tiver 11 dígitos válidos"""
+    if not cpf:
+        return None
+    digitos = _NAO_DIGITOS.sub('', str(cpf))
+    if not is_valid_cpf(digitos):
+        return None
+    return format_cpf(digitos)
+
+
+@functools.lru_cache(maxsize=65536)
+def _digitos_validos(digitos):
+    # Só recebe os 11 dígitos já normalizados, então o cache não cresce com variações de formatação
+    if digitos == digitos[0] * 11:
+        return False
+    return (_digito_verificador(digitos[:9]) == digitos[9]
+            and _digito_verificador(digitos[:10]) == digitos[10])
+
+
+def is_valid_cpf(cpf):
+    """Valida os dígitos verificadores de um CPF (formatado ou não)"""
+    digitos = _NAO_DIGITOS.sub('', str(cpf or ''))
+    return len(digitos) == 11 and _digitos_validos(digitos)
+
+
+def cpf_from_number(numero):
+    """Gera um CPF válido e formatado a partir de um número base de até 9 dígitos"""
+    base = f'{numero % 1_000_000_000:09d}'
+    base = base + _digito_verificador(base)
+    return format_cpf(base + _digito_verificador(base))
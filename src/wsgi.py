@@ -0,0 +1,23 @@
+"""Ponto de entrada WSGI para produção.
+
+    gunicorn -c gunicorn.conf.py src.wsgi:app
+"""
+from src.main import app
+from src.models.user import db
+from src.services import background
+from src.services.replica import replica_engines
+from src.services.sharding import shard_engines
+
+
+def on_worker_start():
+    """Prepara um worker recém-criado pelo fork do processo mestre"""
+    # Conexões abertas no mestre (preload) não podem ser compartilhadas entre processos
+    with app.app_context():
+        for engine in (*db.engines.values(), *shard_engines(app), *replica_engines(app)):
+            engine.dispose(close=False)
+    background.restart_after_fork()
+
+
+def on_worker_exit():
+    """Encerra as tarefas de segundo plano e esvazia as filas antes de sair"""
+    background.shutdown(timeout=app.config.get('SHUTDOWN_DRAIN_TIMEOUT', 10))
@@ -0,0 +1,48 @@
+import pytest
+from flask import Flask
+
+from src.models.user import db, Contract, ContractParty, ContractTemplate, ContractType, User
+
+
+def create_app(tmp_path, **config):
+    """App mínimo com o db num arquivo SQLite temporário e as tarefas periódicas desligadas"""
+    app = Flask('contratosmart-tests')
+    app.config.update(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}",
+        IDEMPOTENCY_SWEEP_INTERVAL=0,
+        RATE_LIMIT_ENABLED=False,
+        SESSION_SWEEP_INTERVAL=0,
+    )
+    app.config.update(config)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def add_contract(user_id, titulo='Contrato de teste', partes=('Ana', 'Bruno')):
+    """Cria usuário (se preciso), tipo, template e um contrato com partes; devolve o contrato"""
+    if db.session.get(User, user_id) is None:
+        db.session.add(User(id=user_id, email=f'user{user_id}@example.com', password_hash='!',
+                            nome_completo=f'Usuário {user_id}'))
+    contract_type = db.session.get(ContractType, 1)
+    if contract_type is None:
+        contract_type = ContractType(id=1, nome='Serviço', categoria='servico')
+        db.session.add(contract_type)
+        db.session.add(ContractTemplate(id=1, contract_type_id=1, nome='Padrão',
+                                        conteudo_template='Contratante: {{CONTRATANTE_NOME}}'))
+    contract = Contract(user_id=user_id, contract_type_id=1, template_id=1, titulo=titulo,
+                        dados_contrato='{"contratante": {"nome_completo": "Ana"}}')
+    contract.parties = [
+        ContractParty(tipo_parte=tipo, nome_completo=nome)
+        for tipo, nome in zip(('contratante', 'contratado'), partes)
+    ]
+    db.session.add(contract)
+    db.session.commit()
+    return contract
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app(tmp_path)
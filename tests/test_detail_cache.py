@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import update
+
+from src.models.user import db, Contract, ContractParty
+from src.routes.contracts import contracts_bp
+from src.services.response_cache import init_detail_cache, mark_contracts_changed
+from tests.conftest import add_contract, create_app
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache_app(request, tmp_path):
+    app = create_app(tmp_path, DETAIL_CACHE_BACKEND=request.param,
+                     DETAIL_CACHE_SQLITE_PATH=str(tmp_path / 'detailcache.db'))
+    init_detail_cache(app)
+    app.register_blueprint(contracts_bp, url_prefix='/api')
+    with app.app_context():
+        app.contract_id = add_contract(1, titulo='Original').id
+    return app
+
+
+def get_detail(client, contract_id, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(f'/api/contracts/{contract_id}', headers=headers)
+
+
+def test_unchanged_contract_answers_304(cache_app):
+    client = cache_app.test_client()
+    first = get_detail(client, cache_app.contract_id)
+    assert first.status_code == 200
+    assert first.get_json()['data']['titulo'] == 'Original'
+
+    second = get_detail(client, cache_app.contract_id, first.headers['ETag'])
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_commit_invalidates_the_cached_response(cache_app):
+    client = cache_app.test_client()
+    etag = get_detail(client, cache_app.contract_id).headers['ETag']
+    with cache_app.app_context():
+        db.session.get(Contract, cache_app.contract_id).titulo = 'Alterado'
+        db.session.commit()
+
+    response = get_detail(client, cache_app.contract_id, etag)
+    assert response.status_code == 200
+    assert response.get_json()['data']['titulo'] == 'Alterado'
+    assert response.headers['ETag'] != etag
+
+
+def test_party_change_invalidates_its_contract(cache_app):
+    client = cache_app.test_client()
+    etag = get_detail(client, cache_app.contract_id).headers['ETag']
+    with cache_app.app_context():
+        party = ContractParty.query.filter_by(contract_id=cache_app.contract_id).first()
+        party.nome_completo = 'Carla'
+        db.session.commit()
+
+    response = get_detail(client, cache_app.contract_id, etag)
+    assert response.status_code == 200
+    assert 'Carla' in [parte['nome_completo'] for parte in response.get_json()['data']['partes']]
+
+
+def test_direct_update_invalidates_when_marked(cache_app):
+    client = cache_app.test_client()
+    etag = get_detail(client, cache_app.contract_id).headers['ETag']
+    with cache_app.app_context():
+        db.session.execute(update(Contract).where(Contract.id == cache_app.contract_id).values(titulo='Em lote'))
+        mark_contracts_changed(db.session, [cache_app.contract_id])
+        db.session.commit()
+
+    assert get_detail(client, cache_app.contract_id, etag).get_json()['data']['titulo'] == 'Em lote'
+
+
+def test_rollback_keeps_the_cached_response(cache_app):
+    client = cache_app.test_client()
+    etag = get_detail(client, cache_app.contract_id).headers['ETag']
+    with cache_app.app_context():
+        db.session.get(Contract, cache_app.contract_id).titulo = 'Descartado'
+        db.session.flush()
+        db.session.rollback()
+
+    assert get_detail(client, cache_app.contract_id, etag).status_code == 304
+
+
+
+def _seeded_cache_app(db_dir, cache_path, titulo):
+    # Semeia antes de ligar o cache, como um reset feito por fora da aplicação
+    app = create_app(db_dir, DETAIL_CACHE_BACKEND='sqlite', DETAIL_CACHE_SQLITE_PATH=str(cache_path))
+    with app.app_context():
+        contract_id = add_contract(1, titulo=titulo).id
+    init_detail_cache(app)
+    app.register_blueprint(contracts_bp, url_prefix='/api')
+    return get_detail(app.test_client(), contract_id)
+
+
+def test_shared_tier_misses_on_another_database(tmp_path):
+    cache_path = tmp_path / 'detailcache.db'
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    first = _seeded_cache_app(tmp_path / 'a', cache_path, 'Banco A')
+    assert first.get_json()['data']['titulo'] == 'Banco A'
+
+    # Mesmo id de contrato, outro banco: não pode vir a resposta do banco A
+    second = _seeded_cache_app(tmp_path / 'b', cache_path, 'Banco B')
+    assert second.get_json()['data']['titulo'] == 'Banco B'
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_shared_tier_misses_after_database_is_recreated(tmp_path):
+    cache_path = tmp_path / 'detailcache.db'
+    db_dir = tmp_path / 'db'
+    db_dir.mkdir()
+    first = _seeded_cache_app(db_dir, cache_path, 'Antes do reset')
+    assert first.get_json()['data']['titulo'] == 'Antes do reset'
+
+    # Mesma URL, banco apagado e semeado de novo
+    (db_dir / 'app.db').unlink()
+    second = _seeded_cache_app(db_dir, cache_path, 'Depois do reset')
+    assert second.get_json()['data']['titulo'] == 'Depois do reset'
@@ -0,0 +1,80 @@
+import pytest
+from flask import jsonify, request
+
+from src.routes.govbr import govbr_bp
+from src.services.idempotency import init_idempotency, idempotent
+from src.services.rate_limit import init_rate_limits
+from tests.conftest import create_app
+
+
+@pytest.fixture
+def idem_app(tmp_path):
+    app = create_app(tmp_path)
+    init_idempotency(app)
+    init_rate_limits(app)
+    app.register_blueprint(govbr_bp, url_prefix='/api/govbr')
+    app.calls = []
+
+    @app.route('/charges', methods=['POST'])
+    @idempotent
+    def create_charge():
+        app.calls.append(request.get_json())
+        return jsonify({'success': True, 'data': {'numero': len(app.calls)}}), 201
+
+    return app
+
+
+def login(client, sub):
+    with client.session_transaction() as session:
+        session['govbr_access_token'] = f'token-{sub}'
+        session['govbr_userinfo'] = {'sub': sub}
+
+
+def test_repeated_key_replays_the_stored_response(idem_app):
+    client = idem_app.test_client()
+    headers = {'Idempotency-Key': 'k1'}
+    first = client.post('/charges', json={'valor': 10}, headers=headers)
+    second = client.post('/charges', json={'valor': 10}, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.get_json() == first.get_json()
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert len(idem_app.calls) == 1
+
+
+def test_same_key_with_another_body_is_rejected(idem_app):
+    client = idem_app.test_client()
+    client.post('/charges', json={'valor': 10}, headers={'Idempotency-Key': 'k1'})
+    response = client.post('/charges', json={'valor': 99}, headers={'Idempotency-Key': 'k1'})
+
+    assert response.status_code == 422
+    assert len(idem_app.calls) == 1
+
+
+def test_keys_are_scoped_per_client(idem_app):
+    alice, bob = idem_app.test_client(), idem_app.test_client()
+    login(alice, 'alice')
+    login(bob, 'bob')
+    headers = {'Idempotency-Key': 'shared'}
+    alice.post('/charges', json={'valor': 10}, headers=headers)
+    response = bob.post('/charges', json={'valor': 10}, headers=headers)
+
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert response.get_json()['data']['numero'] == 2
+
+
+def test_sign_checks_authentication_before_replaying(idem_app):
+    client = idem_app.test_client()
+    login(client, 'alice')
+    headers = {'Idempotency-Key': 'sign-1'}
+    # Resposta 400 (campos ausentes) fica gravada para a chave
+    stored = client.post('/api/govbr/sign', json={'contract_id': 1}, headers=headers)
+    assert stored.status_code == 400
+    assert client.post('/api/govbr/sign', json={'contract_id': 1}, headers=headers).headers['Idempotent-Replayed']
+
+    with client.session_transaction() as session:
+        session.clear()
+    response = client.post('/api/govbr/sign', json={'contract_id': 1}, headers=headers)
+    assert response.status_code == 401
+    assert 'Idempotent-Replayed' not in response.headers
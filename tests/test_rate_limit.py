@@ -0,0 +1,47 @@
+import pytest
+
+from src.services.rate_limit import MemoryLimiterStore, SQLiteLimiterStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryLimiterStore()
+    return SQLiteLimiterStore(str(tmp_path / 'ratelimit.db'))
+
+
+def test_rejection_does_not_debit_the_user_bucket(store):
+    user = ('user_rate', 'sign:ip:1', 1, 1)
+    busy = [('sign', 1)]
+    reason, _, holder = store.admit([user], busy, 0.0)
+    assert reason is None
+
+    # A vaga global está ocupada: a recusa não pode gastar a ficha do usuário
+    other = ('user_rate', 'sign:ip:2', 1, 1)
+    assert store.admit([other], busy, 0.0)[0] == 'concurrency'
+    store.release(holder)
+    assert store.admit([other], busy, 0.0)[0] is None
+
+
+def test_global_rejection_does_not_debit_the_user_bucket(store):
+    global_bucket = ('global_rate', 'sign', 1, 1)
+    assert store.admit([('user_rate', 'sign:ip:1', 1, 1), global_bucket], [], 0.0)[0] is None
+
+    user = ('user_rate', 'sign:ip:2', 1, 1)
+    reason, retry_after, _ = store.admit([user, global_bucket], [], 0.0)
+    assert (reason, retry_after) == ('global_rate', 1.0)
+    assert store.admit([user], [], 0.0)[0] is None
+
+
+def _bucket_count(store):
+    if isinstance(store, MemoryLimiterStore):
+        return len(store._buckets)
+    return store._connect().execute('SELECT count(*) FROM buckets').fetchone()[0]
+
+
+def test_prune_forgets_idle_buckets(store):
+    assert store.admit([('user_rate', 'export:ip:1', 0.5, 1)], [], 0.0)[0] is None
+    assert store.admit([('user_rate', 'export:ip:2', 0.5, 1)], [], 9.0)[0] is None
+
+    store.prune(10.0, max_window=2)
+    assert _bucket_count(store) == 1
@@ -0,0 +1,47 @@
+import pytest
+from flask import jsonify
+
+from src.models.user import db, User
+from src.services.replica import ReplicaSession, init_replica, sync_sqlite_replica
+from tests.conftest import create_app
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    app = create_app(tmp_path, REPLICA_URL=f"sqlite:///{tmp_path / 'replica.db'}", REPLICA_STICKY_SECONDS=60)
+
+    @app.route('/users/count', methods=['GET'])
+    def count_users():
+        return jsonify({'count': User.query.count()})
+
+    @app.route('/users', methods=['POST'])
+    def add_user():
+        db.session.add(User(email='novo@example.com', password_hash='!', nome_completo='Novo'))
+        db.session.commit()
+        return jsonify({'success': True}), 201
+
+    init_replica(app)
+    sync_sqlite_replica(app.config['SQLALCHEMY_DATABASE_URI'], app.config['REPLICA_URL'])
+    return app
+
+
+def test_get_reads_from_the_replica_until_the_client_writes(replica_app):
+    with replica_app.app_context():
+        assert isinstance(db.session(), ReplicaSession)
+    client = replica_app.test_client()
+    other = replica_app.test_client()
+    assert client.get('/users/count').get_json() == {'count': 0}
+
+    assert client.post('/users').status_code == 201
+    # Quem escreveu lê do principal; os demais continuam na réplica até a próxima sincronização
+    assert client.get('/users/count').get_json() == {'count': 1}
+    assert other.get('/users/count').get_json() == {'count': 0}
+
+    sync_sqlite_replica(replica_app.config['SQLALCHEMY_DATABASE_URI'], replica_app.config['REPLICA_URL'])
+    assert other.get('/users/count').get_json() == {'count': 1}
+
+
+def test_app_without_replica_keeps_the_default_session(replica_app, tmp_path_factory):
+    plain = create_app(tmp_path_factory.mktemp('plain'))
+    with plain.app_context():
+        assert not isinstance(db.session(), ReplicaSession)
@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import text
+
+from src.models.user import db, Contract, ContractParty
+from src.services.sharding import GLOBAL, BUCKETS, ShardRoutingSession, id_bucket, init_sharding, rebalance
+from tests.conftest import add_contract, create_app
+
+
+def shard_urls(tmp_path, count):
+    return [f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(count)]
+
+
+@pytest.fixture
+def sharded_app(tmp_path):
+    app = create_app(tmp_path, SHARD_URLS=shard_urls(tmp_path, 2))
+    init_sharding(app)
+    return app
+
+
+def users_on_each_shard(router):
+    """Um user_id por shard"""
+    found = {}
+    user_id = 1
+    while len(found) < len(router.shards):
+        found.setdefault(router.shard_for_user(user_id), user_id)
+        user_id += 1
+    return found
+
+
+def count_rows(engine, table, **where):
+    condition = ' AND '.join(f'{column} = :{column}' for column in where) or '1 = 1'
+    with engine.connect() as conn:
+        return conn.execute(text(f'SELECT count(*) FROM {table} WHERE {condition}'), where).scalar()
+
+
+def test_contracts_are_written_to_the_users_shard(sharded_app):
+    router = sharded_app.extensions['sharding']
+    with sharded_app.app_context():
+        assert isinstance(db.session(), ShardRoutingSession)
+        for shard, user_id in users_on_each_shard(router).items():
+            contract = add_contract(user_id)
+            other = next(name for name in router.shards if name != shard)
+
+            assert router.shard_for_bucket(id_bucket(contract.id)) == shard
+            assert count_rows(router.engines[shard], 'contracts', id=contract.id) == 1
+            assert count_rows(router.engines[shard], 'contract_parties', contract_id=contract.id) == 2
+            assert count_rows(router.engines[other], 'contracts', id=contract.id) == 0
+            assert count_rows(router.binds[GLOBAL], 'contracts', id=contract.id) == 0
+
+
+def test_reads_are_routed_by_id_and_user(sharded_app):
+    router = sharded_app.extensions['sharding']
+    with sharded_app.app_context():
+        ids = {user_id: add_contract(user_id).id for user_id in users_on_each_shard(router).values()}
+        db.session.expunge_all()
+
+        for user_id, contract_id in ids.items():
+            contract = db.session.get(Contract, contract_id)
+            assert contract.user_id == user_id
+            assert len(contract.parties) == 2
+            assert [c.id for c in Contract.query.filter_by(user_id=user_id)] == [contract_id]
+
+        # Sem condição de roteamento a consulta percorre todos os shards
+        assert sorted(c.id for c in Contract.query.all()) == sorted(ids.values())
+        assert len(ContractParty.query.all()) == 4
+
+
+def test_encoded_ids_keep_the_bucket(sharded_app):
+    with sharded_app.app_context():
+        first = add_contract(7)
+        second = add_contract(7)
+        assert first.id % BUCKETS == second.id % BUCKETS
+        assert second.id - first.id == BUCKETS
+
+
+def test_app_without_shards_keeps_the_default_session(sharded_app, tmp_path_factory):
+    plain = create_app(tmp_path_factory.mktemp('plain'))
+    with plain.app_context():
+        assert not isinstance(db.session(), ShardRoutingSession)
+        contract = add_contract(1)
+        assert count_rows(db.engine, 'contracts', id=contract.id) == 1
+    with sharded_app.app_context():
+        assert isinstance(db.session(), ShardRoutingSession)
+
+
+def test_removing_a_shard_through_rebalance(tmp_path):
+    urls = shard_urls(tmp_path, 3)
+    app = create_app(tmp_path, SHARD_URLS=urls)
+    init_sharding(app)
+    with app.app_context():
+        ids = {user_id: add_contract(user_id).id for user_id in users_on_each_shard(app.extensions['sharding']).values()}
+
+    # Sem o shard2 o mapa ainda aponta para ele: o app não sobe
+    with pytest.raises(RuntimeError, match='SHARD_RETIRING_URLS'):
+        init_sharding(create_app(tmp_path, SHARD_URLS=urls[:2]))
+
+    retiring = create_app(tmp_path, SHARD_URLS=urls[:2], SHARD_RETIRING_URLS=urls[2:])
+    router = init_sharding(retiring)
+    assert router.active == ('shard0', 'shard1')
+    with retiring.app_context():
+        rebalance(router, log=lambda message: None)
+    assert 'shard2' not in router.bucket_map
+    assert count_rows(router.engines['shard2'], 'contracts') == 0
+
+    shrunk = create_app(tmp_path, SHARD_URLS=urls[:2])
+    init_sharding(shrunk)
+    with shrunk.app_context():
+        for user_id, contract_id in ids.items():
+            contract = db.session.get(Contract, contract_id)
+            assert contract.user_id == user_id
+            assert len(contract.parties) == 2
+
+
+def test_reordered_shard_urls_are_refused(tmp_path):
+    urls = shard_urls(tmp_path, 2)
+    init_sharding(create_app(tmp_path, SHARD_URLS=urls))
+    with pytest.raises(RuntimeError, match='ordem dos shards'):
+        init_sharding(create_app(tmp_path, SHARD_URLS=urls[::-1]))
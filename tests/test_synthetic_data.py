@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import func, select
+
+from src.models.user import db, ContractSignatureStats, DigitalSignature
+from src.routes.seed import create_initial_data
+from src.services.sharding import init_sharding
+from src.services.synthetic_data import generate_synthetic_data
+from tests.conftest import create_app
+
+
+def test_signature_stats_match_the_generated_signatures(tmp_path):
+    app = create_app(tmp_path)
+    with app.app_context():
+        create_initial_data()
+        counts = generate_synthetic_data(users=20, log=lambda message: None)
+
+        assert counts['contract_signature_stats'] == counts['contracts']
+        for status, column in (('pendente', 'pendentes'), ('assinado', 'assinadas')):
+            expected = db.session.scalar(select(func.count()).where(DigitalSignature.status == status))
+            assert db.session.scalar(select(func.sum(getattr(ContractSignatureStats, column)))) == expected
+
+
+def test_refuses_to_run_with_shards(tmp_path):
+    app = create_app(tmp_path, SHARD_URLS=[f"sqlite:///{tmp_path / 'shard0.db'}"])
+    init_sharding(app)
+    with app.app_context(), pytest.raises(RuntimeError, match='SHARD_URLS'):
+        generate_synthetic_data(users=1, log=lambda message: None)
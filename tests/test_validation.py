@@ -0,0 +1,33 @@
+import pytest
+
+from src.routes.contracts import contracts_bp
+from src.utils.cpf import cpf_from_number, is_valid_cpf, normalize_cpf
+from tests.conftest import add_contract, create_app
+
+
+def test_cpf_check_digits():
+    assert is_valid_cpf('529.982.247-25')
+    assert is_valid_cpf('52998224725')
+    assert not is_valid_cpf('529.982.247-26')
+    assert not is_valid_cpf('111.111.111-11')
+    assert normalize_cpf(cpf_from_number(123)) == '000.000.123-60'
+
+
+def test_cpf_only_accepts_ascii_digits():
+    # Dígitos árabe-índicos e de largura total passam por \D, mas não são um CPF
+    assert not is_valid_cpf('٥٢٩٩٨٢٢٤٧٢٥')
+    assert not is_valid_cpf('５２９９８２２４７２５')
+    assert normalize_cpf('٥٢٩٩٨٢٢٤٧٢٥') is None
+
+
+@pytest.mark.parametrize('template_id', [[1], {'id': 1}, '1', True])
+def test_validate_rejects_non_integer_template_id(tmp_path, template_id):
+    app = create_app(tmp_path)
+    app.register_blueprint(contracts_bp, url_prefix='/api')
+    with app.app_context():
+        add_contract(1)
+
+    response = app.test_client().post('/api/contracts/validate',
+                                      json=[{'template_id': template_id, 'dados_contrato': {}}])
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False